@@ -23,16 +23,33 @@ along with this program; if not, write to the Free Software
 Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 """
 
-import os, sys, getopt, time, re, warnings
+import os, sys, getopt, time, re, warnings, tempfile, struct, zlib
+from array import array
+from cStringIO import StringIO
 try: import cPickle as pickle
 except ImportError: import pickle
+try: import multiprocessing
+except ImportError: multiprocessing = None
+try: import threading, Queue
+except ImportError: threading = None
+try: import json
+except ImportError:
+    try: import simplejson as json
+    except ImportError: json = None
+try: import resource
+except ImportError: resource = None
+try: import sqlite3
+except ImportError:
+    try: from pysqlite2 import dbapi2 as sqlite3
+    except ImportError: sqlite3 = None
 try: from hashlib import md5
 except ImportError: from md5 import md5
 from gzip import GzipFile
 from types import UnicodeType
 
 from imdb.parser.sql.dbschema import *
-from imdb.parser.sql import get_movie_data, soundex
+from imdb.parser.sql import get_movie_data, soundex, soundexes, md5sums, \
+                            trigrams
 from imdb.utils import analyze_title, analyze_name, date_and_notes, \
         build_name, build_title, normalizeName, normalizeTitle, _articles, \
         build_company_name, analyze_company_name, canonicalTitle
@@ -40,7 +57,7 @@ from imdb._exceptions import IMDbParserError, IMDbError
 
 
 HELP = """imdbpy2sql.py usage:
-    %s -d /directory/with/PlainTextDataFiles/ -u URI [-c /directory/for/CSV_files] [-o sqlobject,sqlalchemy] [--CSV-OPTIONS] [--COMPATIBILITY-OPTIONS]
+    %s -d /directory/with/PlainTextDataFiles/ -u URI [-c /directory/for/CSV_files] [-o sqlobject,sqlalchemy] [--CSV-OPTIONS] [--COMPATIBILITY-OPTIONS] [--PERFORMANCE-OPTIONS]
 
         # NOTE: URI is something along the line:
                 scheme://[user[:password]@]host[:port]/database[?parameters]
@@ -55,6 +72,9 @@ HELP = """imdbpy2sql.py usage:
             --csv-ext STRING        files extension (.csv)
             --csv-only-write        exit after the CSV files are written.
             --csv-only-load         load an existing set of CSV files.
+            --csv-gzip              write gzip-compressed CSV files.
+            --csv-load-jobs N       load N CSV files at once, over
+                                    separate connections.
 
         # NOTE: --COMPATIBILITY-OPTIONS can be one of:
             --mysql-innodb          insert data into a MySQL MyISAM db,
@@ -63,6 +83,55 @@ HELP = """imdbpy2sql.py usage:
             --ms-sqlserver          compatibility mode for Microsoft SQL Server
                                     and SQL Express.
             --sqlite-transactions   uses transactions, to speed-up SQLite.
+            --sqlite-fast           write to SQLite with the sqlite3 module,
+                                    in a transaction for every stage and
+                                    without a journal (implies the above).
+
+        # NOTE: --PERFORMANCE-OPTIONS can be:
+            --jobs N                parse independent files using N processes.
+            --cache-backend NAME    storage of the ID caches: "dict" (default),
+                                    "compact" (less memory, a bit slower) or
+                                    "disk" (stored in the --cache-dir).
+            --cache-dir DIR         directory for the "disk" cache backend.
+            --cache-size N          entries kept in memory by every "disk"
+                                    cache (200000).
+            --checkpoint FILE       save the state of the import in FILE
+                                    after every completed stage.
+            --resume                resume an interrupted import from the
+                                    state saved with --checkpoint.
+            --incremental DIR       update the database, storing only the
+                                    changes between the data files in DIR
+                                    (used to create it) and the new ones.
+            --split-cast            parse every cast list in shards, using
+                                    the processes of the --jobs option.
+            --batch-bytes N         max size of the data written at once
+                                    to a table (default: half of the
+                                    max_allowed_packet of MySQL, 16 MB
+                                    for other databases).
+            --batch-time SECS       target time to write a batch of rows
+                                    to a table (2.0 seconds).
+            --index-jobs N          create indexes and foreign keys of
+                                    N tables at once (not with SQLite).
+            --stats-file FILE       append to FILE the metrics of every
+                                    stage of the import (JSON lines).
+            --decompress NAME       how the data files are decompressed:
+                                    "zlib" (default), "thread" (zlib, in
+                                    a background thread) or an external
+                                    command like "pigz" or "gzip".
+            --only FAMILIES         read only the data files of the given
+                                    comma-separated families (or files):
+                                    movies, akas, cast, companies,
+                                    ratings, biographies, plot, trivia,
+                                    business, info, keywords, links,
+                                    complete.  Movies are always read.
+            --exclude FAMILIES      don't read the data files of the
+                                    given families (or files).
+            --progress SECS         every SECS seconds, print how much of
+                                    the current file (and of the whole
+                                    set) was read, and the estimated
+                                    time remaining.
+            --trigrams              store the trigrams of titles and names,
+                                    to speed up the searches.
 
 
                 See README.sqldb for more information.
@@ -77,13 +146,27 @@ USE_ORM = None
 USED_ORM = None
 # List of tables of the database.
 DB_TABLES = []
-# Max allowed recursion, inserting data.
-MAX_RECURSION = 10
+# Limits for the number of rows written to a table at once: every batch
+# is adapted to take less than BATCH_BYTES bytes (by default, half
+# of the max_allowed_packet of MySQL) and BATCH_TIME seconds.
+BATCH_BYTES = None
+BATCH_TIME = 2.0
+BATCH_MIN_ROWS = 100
+BATCH_MAX_ROWS = 200000
+# If set, the metrics of every stage are appended to this file.
+STATS_FILE = None
+# Number of tables whose indexes and foreign keys are created at once.
+INDEX_JOBS = 1
 # If set, this directory is used to output CSV files.
 CSV_DIR = None
 CSV_CURS = None
 CSV_ONLY_WRITE = False
 CSV_ONLY_LOAD = False
+# Number of CSV files loaded at once.
+CSV_LOAD_JOBS = 1
+# Write gzip-compressed CSV files, and size of the buffer of the files.
+CSV_GZIP = False
+CSV_BUFFER_SIZE = 1024 * 1024
 CSV_EXT = '.csv'
 CSV_EOL = '\n'
 CSV_DELIMITER = ','
@@ -96,6 +179,77 @@ CSV_MYSQL = "LOAD DATA LOCAL INFILE '%(file)s' INTO TABLE `%(table)s` FIELDS TER
 CSV_PGSQL = "COPY %(table)s FROM '%(file)s' WITH DELIMITER AS '%(delimiter)s' NULL AS '%(null)s' QUOTE AS '%(quote)s' ESCAPE AS '%(escape)s' CSV"
 CSV_DB2 = "CALL SYSPROC.ADMIN_CMD('LOAD FROM %(file)s OF del MODIFIED BY lobsinfile INSERT INTO %(table)s')"
 
+# Number of processes used to parse the plain text data files.
+JOBS = 1
+# Storage used by the caches of IDs.
+CACHE_BACKEND = 'dict'
+CACHE_BACKENDS = ('dict', 'compact', 'disk')
+# Directory of the file used by the "disk" cache backend, and number
+# of entries that every cache keeps in memory.
+CACHE_DIR = None
+CACHE_SIZE = 200000
+# File used to save the state of the import after every stage, and
+# whether an interrupted import must be resumed.
+CHECKPOINT_FILE = None
+RESUME = False
+# Directory with the data files used to create the current database;
+# if set, only the differences with the new files are stored.
+INCREMENTAL_DIR = None
+# How the plain text data files are decompressed: 'zlib', 'thread' (zlib,
+# in a background thread) or the name of an external command (run with
+# the -dc arguments); and size of the blocks read from the files.
+DECOMPRESS = 'zlib'
+READ_BLOCK_SIZE = 1024 * 1024
+# If set, the cast lists are split in shards of about this size (in
+# bytes) and parsed by a pool of processes.
+SPLIT_CAST = False
+CAST_SHARD_SIZE = 16 * 1024 * 1024
+# Families of data files (names without the .list.gz extension), that
+# can be selected with the --only and --exclude options, and data files
+# that will not be read.
+FILE_FAMILIES = {
+    'movies': ['movies'],
+    'akas': ['aka-titles', 'italian-aka-titles', 'german-aka-titles',
+            'iso-aka-titles', 'hungarian-aka-titles',
+            'norwegian-aka-titles', 'aka-names'],
+    'cast': ['actors', 'actresses', 'producers', 'writers',
+            'cinematographers', 'composers', 'costume-designers',
+            'directors', 'editors', 'miscellaneous', 'production-designers'],
+    'companies': ['distributors', 'miscellaneous-companies',
+            'production-companies', 'special-effects-companies'],
+    'ratings': ['ratings'],
+    'biographies': ['biographies'],
+    'plot': ['plot', 'taglines'],
+    'trivia': ['alternate-versions', 'goofs', 'crazy-credits', 'quotes',
+            'soundtracks', 'trivia'],
+    'business': ['business', 'laserdisc', 'literature',
+            'mpaa-ratings-reasons'],
+    'info': ['certificates', 'color-info', 'countries', 'genres',
+            'language', 'locations', 'running-times', 'sound-mix',
+            'technical', 'release-dates'],
+    'keywords': ['keywords'],
+    'links': ['movie-links'],
+    'complete': ['complete-cast', 'complete-crew']}
+ONLY_FILES = None
+EXCLUDE_FILES = None
+SKIPPED_FILES = set()
+# If set, the progress of the data files read is printed every
+# PROGRESS seconds.
+PROGRESS = None
+# If set, the data are written to SQLite through a connection of the
+# sqlite3 module, with a transaction for every stage; pragmas executed
+# on that connection.
+SQLITE_FAST = False
+SQLITE_FAST_PRAGMAS = ['PRAGMA journal_mode = OFF;',
+        'PRAGMA synchronous = OFF;',
+        'PRAGMA cache_size = -262144;',
+        'PRAGMA temp_store = MEMORY;']
+# If set, the trigrams of titles and names are stored, to pre-rank
+# the candidates of a search; range of IDs of the titles or names
+# read at once.
+TRIGRAMS = False
+TRIGRAMS_RANGE = 10000
+
 # Temporary fix for old style titles.
 #FIX_OLD_STYLE_TITLES = True
 
@@ -135,7 +289,8 @@ if '--mysql-force-myisam' in sys.argv[1:]:
     sys.argv += MYSQLFORCEMYISAM_OPTS
 if '--ms-sqlserver' in sys.argv[1:]:
     sys.argv += SQLSERVER_OPTS
-if '--sqlite-transactions' in sys.argv[1:]:
+if '--sqlite-transactions' in sys.argv[1:] and \
+        '--sqlite-fast' not in sys.argv[1:]:
     sys.argv += SQLITE_OPTS
 
 # Manage arguments list.
@@ -144,11 +299,22 @@ try:
                                                 ['uri=', 'data=', 'execute=',
                                                 'mysql-innodb', 'ms-sqlserver',
                                                 'sqlite-transactions',
+                                                'sqlite-fast',
                                                 'fix-old-style-titles',
                                                 'mysql-force-myisam', 'orm',
                                                 'csv-only-write',
                                                 'csv-only-load',
-                                                'csv=', 'csv-ext=', 'help'])
+                                                'csv-load-jobs=', 'csv-gzip',
+                                                'csv=', 'csv-ext=', 'jobs=',
+                                                'cache-backend=', 'cache-dir=',
+                                                'cache-size=', 'checkpoint=',
+                                                'resume', 'incremental=',
+                                                'decompress=', 'split-cast',
+                                                'batch-bytes=', 'batch-time=',
+                                                'stats-file=', 'index-jobs=',
+                                                'only=', 'exclude=',
+                                                'progress=', 'trigrams',
+                                                'help'])
 except getopt.error, e:
     print 'Troubles with arguments.'
     print HELP
@@ -191,6 +357,70 @@ for opt in optlist:
         CSV_ONLY_WRITE = True
     elif opt[0] == '--csv-only-load':
         CSV_ONLY_LOAD = True
+    elif opt[0] == '--csv-gzip':
+        CSV_GZIP = True
+    elif opt[0] == '--csv-load-jobs':
+        try:
+            CSV_LOAD_JOBS = int(opt[1])
+        except ValueError:
+            print 'WARNING: wrong number of load jobs: "%s"' % opt[1]
+    elif opt[0] == '--jobs':
+        try:
+            JOBS = int(opt[1])
+        except ValueError:
+            print 'WARNING: wrong number of jobs: "%s"' % opt[1]
+    elif opt[0] == '--cache-backend':
+        CACHE_BACKEND = opt[1].lower()
+    elif opt[0] == '--cache-dir':
+        CACHE_DIR = opt[1]
+    elif opt[0] == '--cache-size':
+        try:
+            CACHE_SIZE = int(opt[1])
+        except ValueError:
+            print 'WARNING: wrong cache size: "%s"' % opt[1]
+    elif opt[0] == '--checkpoint':
+        CHECKPOINT_FILE = os.path.abspath(opt[1])
+    elif opt[0] == '--resume':
+        RESUME = True
+    elif opt[0] == '--incremental':
+        INCREMENTAL_DIR = os.path.abspath(opt[1])
+    elif opt[0] == '--decompress':
+        DECOMPRESS = opt[1]
+    elif opt[0] == '--split-cast':
+        SPLIT_CAST = True
+    elif opt[0] == '--batch-bytes':
+        try:
+            BATCH_BYTES = int(opt[1])
+        except ValueError:
+            print 'WARNING: wrong batch size: "%s"' % opt[1]
+    elif opt[0] == '--stats-file':
+        STATS_FILE = opt[1]
+    elif opt[0] == '--index-jobs':
+        try:
+            INDEX_JOBS = int(opt[1])
+        except ValueError:
+            print 'WARNING: wrong number of index jobs: "%s"' % opt[1]
+    elif opt[0] == '--batch-time':
+        try:
+            BATCH_TIME = float(opt[1])
+        except ValueError:
+            print 'WARNING: wrong batch time: "%s"' % opt[1]
+    elif opt[0] == '--only':
+        ONLY_FILES = [x.strip() for x in opt[1].split(',') if x.strip()]
+    elif opt[0] == '--exclude':
+        EXCLUDE_FILES = [x.strip() for x in opt[1].split(',') if x.strip()]
+    elif opt[0] == '--progress':
+        try:
+            PROGRESS = float(opt[1])
+        except ValueError:
+            print 'WARNING: wrong progress interval: "%s"' % opt[1]
+        else:
+            if PROGRESS <= 0:
+                PROGRESS = None
+    elif opt[0] == '--sqlite-fast':
+        SQLITE_FAST = True
+    elif opt[0] == '--trigrams':
+        TRIGRAMS = True
     elif opt[0] in ('-h', '--help'):
         print HELP
         sys.exit(0)
@@ -210,6 +440,113 @@ if (CSV_ONLY_WRITE or CSV_ONLY_LOAD) and not CSV_DIR:
     print HELP
     sys.exit(3)
 
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    print 'The cache backend must be one of: %s' % ', '.join(CACHE_BACKENDS)
+    print HELP
+    sys.exit(2)
+
+if RESUME and not CHECKPOINT_FILE:
+    print 'You must specify the checkpoint file with the --checkpoint argument'
+    print HELP
+    sys.exit(3)
+
+if CSV_GZIP and CHECKPOINT_FILE:
+    print 'The --csv-gzip argument can\'t be used with the --checkpoint argument'
+    print HELP
+    sys.exit(3)
+
+if INCREMENTAL_DIR:
+    if CSV_DIR or CHECKPOINT_FILE:
+        print 'The --incremental argument can\'t be used with CSV files'
+        print 'or with the --checkpoint argument'
+        print HELP
+        sys.exit(3)
+    if not os.path.isdir(INCREMENTAL_DIR):
+        print 'The directory "%s" does not exist' % INCREMENTAL_DIR
+        sys.exit(3)
+
+if CACHE_BACKEND == 'disk':
+    if not CACHE_DIR:
+        print 'You must specify the cache directory with the --cache-dir argument'
+        print HELP
+        sys.exit(3)
+    if sqlite3 is None:
+        print 'The "disk" cache backend requires the sqlite3 module'
+        sys.exit(3)
+
+if DECOMPRESS == 'thread':
+    if threading is None:
+        print '\nWARNING: the "thread" decompression requires the threading\n'\
+                'module: the files will be decompressed by the main thread.\n'
+        DECOMPRESS = 'zlib'
+elif DECOMPRESS != 'zlib':
+    from distutils.spawn import find_executable
+    if find_executable(DECOMPRESS) is None:
+        print 'Unable to find the "%s" command' % DECOMPRESS
+        sys.exit(3)
+
+if SQLITE_FAST:
+    if not URI.lower().startswith('sqlite'):
+        print '\nWARNING: the --sqlite-fast command line option is ignored,\n'\
+                'since you\'re not using SQLite.\n'
+        SQLITE_FAST = False
+    elif sqlite3 is None:
+        print 'The --sqlite-fast argument requires the sqlite3 module'
+        sys.exit(3)
+    elif CSV_DIR or INCREMENTAL_DIR:
+        print 'The --sqlite-fast argument can\'t be used with CSV files'
+        print 'or with the --incremental argument'
+        print HELP
+        sys.exit(3)
+
+if INDEX_JOBS > 1 and URI.lower().startswith('sqlite'):
+    print '\nWARNING: SQLite can\'t create indexes in parallel: the\n'\
+            '--index-jobs command line option will be ignored.\n'
+    INDEX_JOBS = 1
+
+if STATS_FILE and json is None:
+    print 'The --stats-file argument requires the json (or simplejson) module'
+    sys.exit(3)
+
+def _familiesFiles(names):
+    """Return the set of data files of the given families (or files)."""
+    allFiles = {}
+    for family in FILE_FAMILIES.values():
+        for fname in family:
+            allFiles[fname] = None
+    files = set()
+    for name in names:
+        if name in FILE_FAMILIES:
+            files.update(FILE_FAMILIES[name])
+        elif name in allFiles:
+            files.add(name)
+        else:
+            print 'Unknown family of data files: "%s"' % name
+            print 'Families: %s' % ', '.join(sorted(FILE_FAMILIES))
+            sys.exit(3)
+    return files, set(allFiles)
+
+if ONLY_FILES is not None or EXCLUDE_FILES is not None:
+    if ONLY_FILES is not None:
+        _selected, _allFiles = _familiesFiles(ONLY_FILES)
+        SKIPPED_FILES = _allFiles - _selected
+    if EXCLUDE_FILES is not None:
+        SKIPPED_FILES |= _familiesFiles(EXCLUDE_FILES)[0]
+    # The movies are needed to assign consistent IDs to the titles.
+    SKIPPED_FILES.discard('movies')
+
+if JOBS > 1 and (multiprocessing is None or not hasattr(os, 'fork')):
+    print '\nWARNING: the --jobs command line option requires the\n'\
+            'multiprocessing module and a system with fork(): the files\n'\
+            'will be parsed by a single process.\n'
+    JOBS = 1
+
+if SPLIT_CAST and JOBS < 2:
+    print '\nWARNING: the --split-cast command line option requires\n'\
+            'at least two processes (see the --jobs option): the cast\n'\
+            'lists will be parsed by a single process.\n'
+    SPLIT_CAST = False
+
 
 # Some warnings and notices.
 URIlower = URI.lower()
@@ -241,7 +578,7 @@ elif URIlower.startswith('mssql') and \
         '--ms-sqlserver' not in sys.argv[1:]:
     print "\nWARNING: you're using MS SQLServer without the --ms-sqlserver\n"\
             "command line option: if something goes wrong, try using it.\n"
-elif URIlower.startswith('sqlite') and \
+elif URIlower.startswith('sqlite') and not SQLITE_FAST and \
         '--sqlite-transactions' not in sys.argv[1:]:
     print "\nWARNING: you're using SQLite without the --sqlite-transactions\n"\
             "command line option: you'll have very poor performances!  Try\n"\
@@ -281,10 +618,10 @@ for idx, mod in enumerate(USE_ORM):
     try:
         if mod == 'sqlalchemy':
             from imdb.parser.sql.alchemyadapter import getDBTables, \
-                    NotFoundError, setConnection, ISNOTNULL
+                    setConnection, ISNOTNULL
         elif mod == 'sqlobject':
             from imdb.parser.sql.objectadapter import getDBTables, \
-                    NotFoundError, setConnection, ISNOTNULL
+                    setConnection, ISNOTNULL
         else:
             warnings.warn('unknown module "%s".' % mod)
             continue
@@ -316,9 +653,9 @@ class CSVCursor(object):
     of CSV files."""
     def __init__(self, csvDir, csvExt=CSV_EXT, csvEOL=CSV_EOL,
             delimeter=CSV_DELIMITER, quote=CSV_QUOTE, escape=CSV_ESCAPE,
-            null=CSV_NULL, quoteInteger=CSV_QUOTEINT):
+            null=CSV_NULL, quoteInteger=CSV_QUOTEINT, gzipped=CSV_GZIP):
         """Initialize a CSVCursor object; csvDir is the directory where the
-        CSV files will be stored."""
+        CSV files will be stored (compressed, if gzipped is True)."""
         self.csvDir = csvDir
         self.csvExt = csvExt
         self.csvEOL = csvEOL
@@ -328,9 +665,14 @@ class CSVCursor(object):
         self.escaped = '%s%s' % (escape, quote)
         self.null = null
         self.quoteInteger = quoteInteger
+        self.gzipped = gzipped
         self._fdPool = {}
         self._lobFDPool = {}
         self._counters = {}
+        # Information about the query, and row formatter, for every
+        # SQL string.
+        self._formatters = {}
+        self._convert = self._valueConverter()
 
     def buildLine(self, items, tableToAddID=False, rawValues=(),
                     lobFD=None, lobFN=None):
@@ -384,57 +726,158 @@ class CSVCursor(object):
         # Build the line and add the end-of-line.
         return '%s%s' % (self.delimeter.join(r), self.csvEOL)
 
-    def executemany(self, sqlstr, items):
-        """Emulate the executemany method of a cursor, but writes the
-        data in a set of CSV files."""
+    def _valueConverter(self):
+        """Return a function that converts a value to a string,
+        as done by buildLine."""
+        quote = self.quote
+        escaped = self.escaped
+        null = self.null
+        if quote:
+            def default(val):
+                return '%s%s%s' % (quote, str(val).replace(quote, escaped),
+                                    quote)
+        else:
+            default = str
+        converters = {type(None): lambda val: null}
+        if not self.quoteInteger:
+            converters[int] = converters[long] = converters[bool] = str
+        getConverter = converters.get
+        def convert(val):
+            return getConverter(type(val), default)(val)
+        return convert
+
+    def _formatter(self, sqlstr):
+        """Return a (table name, tableToAddID, rawValues, doLOB, template,
+        number of parameters) tuple for a query, computing it only
+        the first time; template is a string that builds a line, given
+        the converted values of a row (and its ID, if required)."""
+        info = self._formatters.get(sqlstr)
+        if info is not None:
+            return info
         # XXX: find a safer way to get the table/file name!
         tName = sqlstr.split()[2]
-        lobFD = None
-        lobFN = None
         doLOB = False
         # XXX: ugly special case, to create the LOB file.
         if URIlower.startswith('ibm') and tName == 'person_info':
             doLOB = True
-        # Open the file descriptor or get it from the pool.
-        if tName in self._fdPool:
-            tFD = self._fdPool[tName]
-            lobFD = self._lobFDPool.get(tName)
-            lobFN = getattr(lobFD, 'name', None)
-            if lobFN:
-                lobFN = os.path.basename(lobFN)
-        else:
-            tFD = open(os.path.join(CSV_DIR, tName + self.csvExt), 'wb')
-            self._fdPool[tName] = tFD
-            if doLOB:
-                lobFN = '%s.lob' % tName
-                lobFD = open(os.path.join(CSV_DIR, lobFN), 'wb')
-                self._lobFDPool[tName] = lobFD
-        buildLine = self.buildLine
         tableToAddID = False
         if tName in ('cast_info', 'movie_info', 'person_info',
                     'movie_companies', 'movie_link', 'aka_name',
                     'complete_cast', 'movie_info_idx', 'movie_keyword'):
             tableToAddID = tName
-            if tName not in self._counters:
-                self._counters[tName] = 1
         # Identify if there are RawValue in the VALUES (...) portion of
         # the query.
         parIdx = sqlstr.rfind('(')
         rawValues = []
-        vals = sqlstr[parIdx+1:-1]
+        fields = []
+        if tableToAddID:
+            fields.append('%s')
+        nrParams = 0
         if parIdx != 0:
             vals = sqlstr[parIdx+1:-1]
             for idx, item in enumerate(vals.split(', ')):
                 if item[0] in ('%', '?', ':'):
+                    fields.append('%s')
+                    nrParams += 1
                     continue
                 rawValues.append((idx, item))
-        # Write these lines.
-        tFD.writelines(buildLine(i, tableToAddID=tableToAddID,
-                        rawValues=rawValues, lobFD=lobFD, lobFN=lobFN)
-                        for i in items)
-        # Flush to disk, so that no truncaded entries are ever left.
-        # XXX: is this a good idea?
-        tFD.flush()
+                fields.append(item.replace('%', '%%'))
+        template = '%s%s' % (self.delimeter.replace('%', '%%').join(fields),
+                            self.csvEOL.replace('%', '%%'))
+        info = (tName, tableToAddID, rawValues, doLOB, template, nrParams)
+        self._formatters[sqlstr] = info
+        return info
+
+    def _open(self, fname):
+        """Open a file of the CSV directory, for writing."""
+        fname = os.path.join(self.csvDir, fname)
+        if self.gzipped:
+            # Compression is fast, at the lowest level.
+            return GzipFile(fname + '.gz', 'wb', 1)
+        return open(fname, 'wb', CSV_BUFFER_SIZE)
+
+    def executemany(self, sqlstr, items):
+        """Emulate the executemany method of a cursor, but writes the
+        data in a set of CSV files."""
+        tName, tableToAddID, rawValues, doLOB, template, nrParams = \
+                self._formatter(sqlstr)
+        lobFD = None
+        lobFN = None
+        # Open the file descriptor or get it from the pool.
+        if tName in self._fdPool:
+            tFD = self._fdPool[tName]
+            lobFD = self._lobFDPool.get(tName)
+            lobFN = getattr(lobFD, 'name', None)
+            if lobFN:
+                lobFN = os.path.basename(lobFN)
+        else:
+            tFD = self._open(tName + self.csvExt)
+            self._fdPool[tName] = tFD
+            if doLOB:
+                lobFN = '%s.lob' % tName
+                lobFD = open(os.path.join(CSV_DIR, lobFN), 'wb')
+                self._lobFDPool[tName] = lobFD
+        if tableToAddID and tName not in self._counters:
+            self._counters[tName] = 1
+        if doLOB:
+            tFD.write(''.join([self.buildLine(i, tableToAddID=tableToAddID,
+                                rawValues=rawValues, lobFD=lobFD, lobFN=lobFN)
+                                for i in items]))
+            return
+        convert = self._convert
+        lines = []
+        lappend = lines.append
+        if tableToAddID:
+            counter = self._counters[tName]
+            for item in items:
+                if len(item) != nrParams:
+                    self._counters[tName] = counter
+                    lappend(self.buildLine(item, tableToAddID=tableToAddID,
+                                            rawValues=rawValues))
+                    counter = self._counters[tName]
+                    continue
+                lappend(template % tuple(map(convert, (counter,) +
+                                                    tuple(item))))
+                counter += 1
+            self._counters[tName] = counter
+        else:
+            for item in items:
+                if len(item) != nrParams:
+                    lappend(self.buildLine(item, rawValues=rawValues))
+                    continue
+                lappend(template % tuple(map(convert, item)))
+        # Lines are buffered, and written at once.
+        tFD.write(''.join(lines))
+
+    def getState(self):
+        """Return the information needed to resume writing the files."""
+        sizes = {}
+        lobSizes = {}
+        for pool, sizesDict in ((self._fdPool, sizes),
+                                (self._lobFDPool, lobSizes)):
+            for tName, fd in pool.items():
+                if fd.closed:
+                    sizesDict[tName] = os.path.getsize(fd.name)
+                    continue
+                fd.flush()
+                sizesDict[tName] = fd.tell()
+        return {'sizes': sizes, 'lobSizes': lobSizes,
+                'counters': self._counters.copy()}
+
+    def resume(self, state):
+        """Reopen the files written by a previous run, discarding
+        the data written after the state was saved by getState."""
+        for tName, size in state['sizes'].items():
+            fd = open(os.path.join(self.csvDir, tName + self.csvExt), 'r+b')
+            fd.truncate(size)
+            fd.seek(size)
+            self._fdPool[tName] = fd
+        for tName, size in state['lobSizes'].items():
+            fd = open(os.path.join(self.csvDir, '%s.lob' % tName), 'r+b')
+            fd.truncate(size)
+            fd.seek(size)
+            self._lobFDPool[tName] = fd
+        self._counters.update(state['counters'])
 
     def fileNames(self):
         """Return the list of file names."""
@@ -444,15 +887,18 @@ class CSVCursor(object):
         """Populate the self._fdPool dictionary with fake objects
         taking file names from the content of the self.csvDir directory."""
         class _FakeFD(object): pass
+        ext = self.csvExt
+        if self.gzipped:
+            ext += '.gz'
         for fname in os.listdir(self.csvDir):
-            if not fname.endswith(CSV_EXT):
+            if not fname.endswith(ext):
                 continue
             fpath = os.path.join(self.csvDir, fname)
             if not os.path.isfile(fpath):
                 continue
             fd = _FakeFD()
             fd.name = fname
-            self._fdPool[fname[:-len(CSV_EXT)]] = fd
+            self._fdPool[fname[:-len(ext)]] = fd
 
     def close(self, tName):
         """Close a given table/file."""
@@ -467,33 +913,109 @@ class CSVCursor(object):
             fd.close()
 
 
-def loadCSVFiles():
-    """Load every CSV file into the database."""
+def _gunzipCSVFile(cfName):
+    """Decompress a gzipped CSV file; return the name of the new file."""
+    print ' * DECOMPRESSING CSV FILE %s...' % cfName
+    sys.stdout.flush()
+    inFD = open(cfName, 'rb')
+    outFD = open(cfName[:-3], 'wb')
+    for block in zlibBlocks(inFD):
+        outFD.write(block)
+    outFD.close()
+    inFD.close()
+    return cfName[:-3]
+
+
+def _loadCSVFile(connection, cfName, tName, timeit=True):
+    """Load a CSV file into the tName table, using the given connection;
+    gzipped files are decompressed, and the copy removed after the load."""
+    if cfName.endswith('.gz'):
+        cfName = _gunzipCSVFile(cfName)
+        try:
+            _loadCSVFile(connection, cfName, tName, timeit)
+        finally:
+            os.remove(cfName)
+        return
     CSV_REPL = {'quote': CSV_QUOTE, 'delimiter': CSV_DELIMITER,
-                'escape': CSV_ESCAPE, 'null': CSV_NULL, 'eol': CSV_EOL}
+                'escape': CSV_ESCAPE, 'null': CSV_NULL, 'eol': CSV_EOL,
+                'file': cfName, 'table': tName}
+    sqlStr = CSV_LOAD_SQL % CSV_REPL
+    cursor = connection.cursor()
+    keys = {'table': tName}
+    print ' * LOADING CSV FILE %s...' % cfName
+    sys.stdout.flush()
+    executeCustomQueries('BEFORE_CSV_TODB', _keys=keys, _timeit=timeit,
+                        _cursor=cursor)
+    try:
+        cursor.execute(sqlStr)
+        try:
+            res = cursor.fetchall()
+            if res:
+                print 'LOADING OUTPUT:', res
+        except:
+            pass
+    except Exception, e:
+        print 'ERROR: unable to import CSV file %s: %s' % (cfName, str(e))
+        return
+    connection.commit()
+    executeCustomQueries('AFTER_CSV_TODB', _keys=keys, _timeit=timeit,
+                        _cursor=cursor)
+
+
+def _csvFileSize(item):
+    """Size of the CSV file of a (file name, table name) tuple."""
+    try:
+        return os.path.getsize(item[0])
+    except OSError:
+        return 0
+
+
+def loadCSVFiles():
+    """Load every CSV file into the database; with CSV_LOAD_JOBS greater
+    than 1, more files are loaded at once, starting from the largest."""
+    files = []
     for fName in CSV_CURS.fileNames():
+        tName = fName
+        if tName.endswith('.gz'):
+            tName = tName[:-3]
+        tName = os.path.basename(tName[:-len(CSV_EXT)])
+        files.append((os.path.join(CSV_DIR, fName), tName))
+    if CSV_LOAD_JOBS > 1 and threading is not None and len(files) > 1:
         connectObject.commit()
-        tName = os.path.basename(fName[:-len(CSV_EXT)])
-        cfName = os.path.join(CSV_DIR, fName)
-        CSV_REPL['file'] = cfName
-        CSV_REPL['table'] = tName
-        sqlStr = CSV_LOAD_SQL % CSV_REPL
-        print ' * LOADING CSV FILE %s...' % cfName
-        sys.stdout.flush()
-        executeCustomQueries('BEFORE_CSV_TODB')
-        try:
-            CURS.execute(sqlStr)
+        files.sort(key=_csvFileSize, reverse=True)
+        queue = Queue.Queue()
+        for item in files:
+            queue.put(item)
+        def _load():
             try:
-                res = CURS.fetchall()
-                if res:
-                    print 'LOADING OUTPUT:', res
-            except:
-                pass
-        except Exception, e:
-            print 'ERROR: unable to import CSV file %s: %s' % (cfName, str(e))
-            continue
+                connection = conn.newConnection()
+            except Exception, e:
+                print 'ERROR: unable to open a new connection: %s' % e
+                return
+            try:
+                while 1:
+                    try:
+                        cfName, tName = queue.get_nowait()
+                    except Queue.Empty:
+                        break
+                    _loadCSVFile(connection, cfName, tName, timeit=False)
+            finally:
+                connection.close()
+        print ' * LOADING %d CSV FILES using %d connections...' % \
+                (len(files), CSV_LOAD_JOBS)
+        threads = [threading.Thread(target=_load)
+                    for x in xrange(min(CSV_LOAD_JOBS, len(files)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Files left by threads unable to connect.
+        files = []
+        while not queue.empty():
+            files.append(queue.get_nowait())
+    for cfName, tName in files:
         connectObject.commit()
-        executeCustomQueries('AFTER_CSV_TODB')
+        _loadCSVFile(connectObject, cfName, tName)
 
 #-----------------------
 
@@ -516,6 +1038,49 @@ except AttributeError, e:
     warnings.warn('Unable to import IntegrityError')
     IntegrityError = Exception
 
+if sqlite3 is not None:
+    class SQLiteFastConnection(sqlite3.Connection):
+        """Connection used with the --sqlite-fast option: the data of
+        a whole stage are written in a single transaction, committed
+        by the t function."""
+        def commit(self):
+            pass
+
+        def rollback(self):
+            # A failed statement doesn't abort a SQLite transaction:
+            # the data written so far in this stage are kept.
+            pass
+
+        def commitStage(self):
+            sqlite3.Connection.commit(self)
+
+
+def sqliteFastConnection(ormConnection):
+    """Return a new connection to the SQLite database opened by the ORM,
+    configured for a fast import."""
+    dbFile = None
+    curs = ormConnection.cursor()
+    curs.execute('PRAGMA database_list;')
+    for row in curs.fetchall():
+        if row[1] == 'main':
+            dbFile = row[2]
+    curs.close()
+    if not dbFile:
+        print 'The --sqlite-fast argument can\'t be used with an in-memory'
+        print 'database'
+        sys.exit(3)
+    # Statements are prepared once, and cached by the connection.
+    connection = sqlite3.connect(dbFile, timeout=600,
+                                factory=SQLiteFastConnection,
+                                cached_statements=256)
+    connection.text_factory = str
+    curs = connection.cursor()
+    for pragma in SQLITE_FAST_PRAGMAS:
+        curs.execute(pragma)
+    curs.close()
+    return connection
+
+
 connectObject = conn.getConnection()
 # XXX: fix for a problem that should be fixed in objectadapter.py (see it).
 if URI and URI.startswith('sqlite') and USED_ORM == 'sqlobject':
@@ -524,6 +1089,11 @@ if URI and URI.startswith('sqlite') and USED_ORM == 'sqlobject':
     if major > 2 or (major == 2 and minor > 5):
         connectObject.text_factory = str
 
+if SQLITE_FAST:
+    connectObject = sqliteFastConnection(connectObject)
+    OperationalError = sqlite3.OperationalError
+    IntegrityError = sqlite3.IntegrityError
+
 # Cursor object.
 CURS = connectObject.cursor()
 
@@ -531,6 +1101,16 @@ CURS = connectObject.cursor()
 DB_NAME = conn.dbName
 PARAM_STYLE = conn.paramstyle
 
+if BATCH_BYTES is None:
+    BATCH_BYTES = 16 * 1024 * 1024
+    if DB_NAME == 'mysql':
+        # Every batch is sent to MySQL as a single statement.
+        try:
+            CURS.execute("SHOW VARIABLES LIKE 'max_allowed_packet';")
+            BATCH_BYTES = int(CURS.fetchone()[1]) / 2
+        except Exception, e:
+            print 'WARNING: unable to read max_allowed_packet: %s' % e
+
 
 def tableName(table):
     """Return a string with the name of the table in the current db."""
@@ -542,6 +1122,27 @@ def colName(table, column):
         return table.sqlmeta.idName
     return table.sqlmeta.columns[column].dbName
 
+def tableExists(table):
+    """Return True if the table is in the database."""
+    try:
+        CURS.execute('SELECT COUNT(*) FROM %s WHERE 1 = 0;' %
+                    tableName(table))
+        CURS.fetchall()
+    except Exception:
+        connectObject.rollback()
+        return False
+    return True
+
+
+# The trigrams tables are handled only using --trigrams or, with
+# --incremental, if they were created by a previous import.
+TRIGRAM_TABLES = [TitleTrigram, NameTrigram]
+MISSING_TRIGRAM_TABLES = [x for x in TRIGRAM_TABLES if not tableExists(x)]
+if not TRIGRAMS:
+    for _table in TRIGRAM_TABLES:
+        if not INCREMENTAL_DIR or _table in MISSING_TRIGRAM_TABLES:
+            DB_TABLES.remove(_table)
+
 
 class RawValue(object):
     """String-like objects to store raw SQL parameters, that are not
@@ -567,6 +1168,17 @@ def _makeConvNamed(cols):
         return params
     return _converter
 
+def _valStr(s, index):
+    """Return the placeholder for the index-th parameter (named s)
+    of a query."""
+    if DB_NAME in ('mysql', 'postgres'): return '%s'
+    elif PARAM_STYLE == 'format': return '%s'
+    elif PARAM_STYLE == 'qmark': return '?'
+    elif PARAM_STYLE == 'numeric': return ':%s' % index
+    elif PARAM_STYLE == 'named': return ':%s' % s
+    elif PARAM_STYLE == 'pyformat': return '%(' + s + ')s'
+    return '%s'
+
 def createSQLstr(table, cols, command='INSERT'):
     """Given a table and a list of columns returns a sql statement
     useful to insert a set of data in the database.
@@ -577,14 +1189,6 @@ def createSQLstr(table, cols, command='INSERT'):
     values = []
     convCols = []
     count = 1
-    def _valStr(s, index):
-        if DB_NAME in ('mysql', 'postgres'): return '%s'
-        elif PARAM_STYLE == 'format': return '%s'
-        elif PARAM_STYLE == 'qmark': return '?'
-        elif PARAM_STYLE == 'numeric': return ':%s' % index
-        elif PARAM_STYLE == 'named': return ':%s' % s
-        elif PARAM_STYLE == 'pyformat': return '%(' + s + ')s'
-        return '%s'
     for col in cols:
         if isinstance(col, RawValue):
             colNames.append(colName(table, col.string))
@@ -609,6 +1213,45 @@ def createSQLstr(table, cols, command='INSERT'):
         converter = lambda x: x
     return sqlstr, converter
 
+def _doubleParams(params):
+    """Repeat twice every parameter of a list of tuples."""
+    newParams = []
+    for paramSet in params:
+        l = []
+        for param in paramSet:
+            l += [param, param]
+        newParams.append(tuple(l))
+    return newParams
+
+def createDeleteSQLstr(table, cols):
+    """Like createSQLstr, but the returned sql statement deletes
+    the rows matching the given values (NULL values included)."""
+    conditions = []
+    convCols = []
+    count = 1
+    for col in cols:
+        if isinstance(col, RawValue):
+            conditions.append('%s = %s' % (colName(table, col.string),
+                                            col.value))
+            continue
+        cName = colName(table, col)
+        value = _valStr(col, count)
+        conditions.append('(%s = %s OR (%s IS NULL AND %s IS NULL))' %
+                            (cName, value, cName, value))
+        convCols.append(col)
+        count += 1
+    sqlstr = 'DELETE FROM %s WHERE %s' % (tableName(table),
+                                        ' AND '.join(conditions))
+    if DB_NAME not in ('mysql', 'postgres') and \
+            PARAM_STYLE in ('named', 'pyformat'):
+        converter = _makeConvNamed(convCols)
+    elif DB_NAME not in ('mysql', 'postgres') and PARAM_STYLE == 'numeric':
+        converter = lambda x: x
+    else:
+        # Every positional parameter is used twice.
+        converter = _doubleParams
+    return sqlstr, converter
+
 def _(s):
     """Nicely print a string to sys.stdout."""
     if not isinstance(s, UnicodeType):
@@ -652,6 +1295,134 @@ def t(s, sinceBegin=False):
     if not sinceBegin:
         CTIME = nt
         CTIMES = ntimes
+    if SQLITE_FAST:
+        connectObject.commitStage()
+    if STATS_FILE:
+        writeStats(s, sinceBegin, ntimes)
+    if not sinceBegin:
+        resetStats()
+
+
+def _newStats():
+    """Return the counters of a stage of the import."""
+    return {'begin': time.time(), 'times': os.times(), 'inputBytes': 0,
+            'rows': {}, 'flushes': 0, 'writeTime': 0.0}
+
+# Metrics of the current stage (since the last call to t), and of the
+# whole import.
+_STATS = _newStats()
+_STATS_TOTAL = _newStats()
+
+def resetStats():
+    """Add the metrics of the current stage to the totals, and start
+    a new stage."""
+    global _STATS
+    _STATS_TOTAL['inputBytes'] += _STATS['inputBytes']
+    _STATS_TOTAL['flushes'] += _STATS['flushes']
+    _STATS_TOTAL['writeTime'] += _STATS['writeTime']
+    for table, nrRows in _STATS['rows'].iteritems():
+        _STATS_TOTAL['rows'][table] = _STATS_TOTAL['rows'].get(table, 0) + \
+                                        nrRows
+    _STATS = _newStats()
+
+def countRows(table, nrRows, elapsed):
+    """Count a batch of nrRows rows written to a table."""
+    _STATS['rows'][table] = _STATS['rows'].get(table, 0) + nrRows
+    _STATS['flushes'] += 1
+    _STATS['writeTime'] += elapsed
+
+def writeStats(stage, sinceBegin=False, ntimes=None):
+    """Append a JSON record with the metrics of a stage (or, if
+    sinceBegin is True, of the whole import) to the STATS_FILE."""
+    if ntimes is None:
+        ntimes = os.times()
+    stats = _STATS
+    if sinceBegin:
+        resetStats()
+        stats = _STATS_TOTAL
+    wallTime = time.time() - stats['begin']
+    record = {'stage': stage, 'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'wallTime': round(wallTime, 3),
+            'userTime': round(ntimes[0] - stats['times'][0], 3),
+            'systemTime': round(ntimes[1] - stats['times'][1], 3),
+            'writeTime': round(stats['writeTime'], 3),
+            'parseTime': round(max(0.0, wallTime - stats['writeTime']), 3),
+            'inputBytes': stats['inputBytes'], 'rows': stats['rows'],
+            'flushes': stats['flushes'], 'caches': {}}
+    if resource is not None:
+        # Kilobytes on Linux.
+        record['peakRSS'] = \
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        record['peakRSSChildren'] = \
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    for label, cache in _checkpointCaches():
+        record['caches'][label] = len(cache)
+    fd = open(STATS_FILE, 'a')
+    fd.write(json.dumps(record, sort_keys=True) + '\n')
+    fd.close()
+
+class Progress(object):
+    """Estimate the time remaining to read the current data file, and
+    the whole set of files, from the compressed bytes consumed."""
+    def __init__(self):
+        self.begin = time.time()
+        self.last = self.begin
+        # Compressed size of the files to read, and of the files already
+        # read (also by the pool of processes).
+        self.totalBytes = None
+        self.doneBytes = 0
+        self.pid = os.getpid()
+
+    def _getTotalBytes(self):
+        total = 0
+        for dirName in (IMDB_PTDF_DIR, os.path.join(IMDB_PTDF_DIR, 'contrib')):
+            if not os.path.isdir(dirName):
+                continue
+            for fname in os.listdir(dirName):
+                if fname.endswith('.list.gz') and isSelected(fname):
+                    total += os.path.getsize(os.path.join(dirName, fname))
+        return total
+
+    def fileDone(self, size):
+        """Count the compressed size of a file completely read."""
+        if os.getpid() == self.pid:
+            self.doneBytes += size
+
+    def update(self, sf):
+        """Print the progress of the SourceFile sf, if more than PROGRESS
+        seconds passed since the last time."""
+        now = time.time()
+        if now - self.last < PROGRESS:
+            return
+        self.last = now
+        pos = sf.position()
+        if not (pos and sf.size):
+            return
+        elapsed = now - sf.openTime
+        # The throughput of a file just opened is not meaningful.
+        if elapsed >= PROGRESS:
+            rate = pos / elapsed
+            print 'PROGRESS %s: %.1f%% (%.2f MB/s), ' \
+                    '%dmin, %dsec remaining' % ((os.path.basename(sf.name),
+                    100.0 * pos / sf.size, rate / 1048576.0) +
+                    _minSec(max(sf.size - pos, 0) / rate))
+        if os.getpid() != self.pid:
+            # Parsed by the pool of processes: the main process prints
+            # the progress of the whole set.
+            return
+        if self.totalBytes is None:
+            self.totalBytes = self._getTotalBytes()
+        done = self.doneBytes + pos
+        if not self.totalBytes or done > self.totalBytes:
+            return
+        rate = done / max(now - self.begin, 0.001)
+        print 'PROGRESS all the files: %.1f%%, %dmin, %dsec remaining' % \
+                ((100.0 * done / self.totalBytes,) +
+                _minSec((self.totalBytes - done) / rate))
+        sys.stdout.flush()
+
+_PROGRESS = Progress()
+
 
 def title_soundex(title):
     """Return the soundex code for the given title; the (optional) starting
@@ -692,6 +1463,45 @@ def name_soundexes(name, character=False):
     if s3 and s3 in (s1, s2): s3 = None
     return (s1, s2, s3)
 
+def titles_soundexes(titles):
+    """Return a list with the soundex codes of a list of titles (see
+    title_soundex), computed with a single call to soundexes."""
+    strings = []
+    sapp = strings.append
+    for title in titles:
+        if not title:
+            sapp(None)
+            continue
+        title = canonicalTitle(title)
+        ts = title.split(', ')
+        if ts[-1].lower() in _articles:
+            title = ', '.join(ts[:-1])
+        sapp(title)
+    return soundexes(strings)
+
+def names_soundexes(names, character=False):
+    """Return a list with the three soundex codes of every name of
+    a list (see name_soundexes), computed with a single call
+    to soundexes."""
+    strings = []
+    sext = strings.extend
+    for name in names:
+        if not name:
+            sext((None, None, None))
+        elif not character:
+            sext((name, normalizeName(name), name.split(', ')[0]))
+        else:
+            sext((name, normalizeName(name), name.split(' ')[-1]))
+    codes = soundexes(strings)
+    res = []
+    rapp = res.append
+    for i in xrange(0, len(codes), 3):
+        s1, s2, s3 = codes[i:i+3]
+        if s1 == s2: s2 = None
+        if s3 and s3 in (s1, s2): s3 = None
+        rapp((s1, s2, s3))
+    return res
+
 
 # Tags to identify where the meaningful data begin/end in files.
 MOVIES = 'movies.list.gz'
@@ -750,14 +1560,217 @@ COMPCREW_START = ('CREW COVERAGE TRACKING LIST', '===========================')
 COMP_STOP = '---------------'
 
 GzipFileRL = GzipFile.readline
-class SourceFile(GzipFile):
+
+# Pass of an incremental import: 'delete' (removing the data read from
+# the chunks of the old files which are not in the new ones) or 'insert'
+# (storing the data of the chunks which are only in the new files).
+INCR_PASS = None
+_CHANGED_CHUNKS = {}
+
+def isChunkStart(line):
+    """Return True if the line is the first of a chunk of lines
+    about the same subject (e.g.: a person of a cast list, or every
+    line of the movies list)."""
+    return line[:1] not in ('', ' ', '\t', '\n')
+
+def isHashChunkStart(line):
+    """Chunks separated by lines starting with #."""
+    return line[:1] == '#'
+
+def isLineChunkStart(line):
+    """Every line is a chunk."""
+    return True
+
+def iterChunks(readline, chunkBy):
+    """Yield the chunks (lists of lines) read with the readline
+    function; chunkBy is a function that tells if a line starts a new
+    chunk (if None, every line belongs to the same chunk)."""
+    chunk = []
+    for line in iter(readline, ''):
+        if chunk and chunkBy is not None and chunkBy(line):
+            yield chunk
+            chunk = []
+        chunk.append(line)
+    if chunk:
+        yield chunk
+
+def changedChunks(fname, start, stop, chunkBy):
+    """Compare the chunks of the old and the new fname file; return
+    a CompactDict with the difference between the number of occurrences
+    of every chunk in the two files, and the number of chunks with
+    a different number of occurrences."""
+    key = (fname, start, stop)
+    res = _CHANGED_CHUNKS.get(key)
+    if res is None:
+        print 'COMPARING the old and the new %s file...' % fname,
+        sys.stdout.flush()
+        counts = CompactDict()
+        nrChanged = 0
+        for directory, step in ((INCREMENTAL_DIR, 1), (IMDB_PTDF_DIR, -1)):
+            try:
+                fp = SourceFile(fname, start=start, stop=stop, pwarning=0,
+                                directory=directory, incremental=False)
+            except IOError:
+                continue
+            for chunk in iterChunks(fp.readline, chunkBy):
+                chunk = ''.join(chunk)
+                count = counts.get(chunk, 0)
+                if count == 0: nrChanged += 1
+                elif count + step == 0: nrChanged -= 1
+                counts[chunk] = count + step
+            fp.close()
+        print 'DONE! (%d changed chunks)' % nrChanged
+        res = (counts, nrChanged)
+    # Kept from the 'delete' pass to the 'insert' pass.
+    if INCR_PASS == 'delete':
+        _CHANGED_CHUNKS[key] = res
+    else:
+        _CHANGED_CHUNKS.pop(key, None)
+    return res
+
+
+def zlibBlocks(fd, blockSize=READ_BLOCK_SIZE):
+    """Yield blocks of decompressed data, read from the fd gzipped
+    file (which can be made of multiple members)."""
+    decomp = None
+    while 1:
+        data = fd.read(blockSize)
+        if not data:
+            break
+        while data:
+            if decomp is None:
+                # Skip the padding between (or after) the members.
+                data = data.lstrip('\0')
+                if not data:
+                    break
+                decomp = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            try:
+                block = decomp.decompress(data)
+            except zlib.error, e:
+                raise IOError('%s: %s' % (fd.name, e))
+            if block:
+                yield block
+            # Data after the end of a member: it starts a new one.
+            data = decomp.unused_data
+            if data:
+                decomp = None
+    if decomp is not None:
+        block = decomp.flush()
+        if block:
+            yield block
+
+def threadedBlocks(fd, blockSize=READ_BLOCK_SIZE, queueSize=4):
+    """Like zlibBlocks, but the data is decompressed by a background
+    thread, while the main one parses the previous blocks."""
+    queue = Queue.Queue(queueSize)
+    closed = threading.Event()
+    def _put(item):
+        while not closed.isSet():
+            try:
+                queue.put(item, timeout=1)
+                return True
+            except Queue.Full:
+                pass
+        return False
+    def _decompress():
+        try:
+            for block in zlibBlocks(fd, blockSize):
+                if not _put(block):
+                    return
+        except IOError, e:
+            _put(e)
+        _put(None)
+    thread = threading.Thread(target=_decompress)
+    thread.setDaemon(True)
+    thread.start()
+    try:
+        while 1:
+            block = queue.get()
+            if block is None:
+                break
+            if isinstance(block, IOError):
+                raise block
+            yield block
+    finally:
+        closed.set()
+        thread.join()
+
+def commandBlocks(fd, command, blockSize=READ_BLOCK_SIZE):
+    """Yield blocks of data decompressed by an external command
+    (e.g.: pigz or gzip), run with the -dc arguments."""
+    import signal, subprocess
+    def _restoreSigpipe():
+        # So that the command silently exits, if the pipe is closed.
+        signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+    proc = subprocess.Popen([command, '-dc'], stdin=fd,
+                            stdout=subprocess.PIPE, close_fds=True,
+                            preexec_fn=_restoreSigpipe)
+    completed = False
+    try:
+        while 1:
+            block = proc.stdout.read(blockSize)
+            if not block:
+                break
+            yield block
+        completed = True
+    finally:
+        proc.stdout.close()
+        status = proc.wait()
+    if completed and status != 0:
+        raise IOError('%s: "%s" exited with status %s' % (fd.name,
+                                                        command, status))
+
+def readBlocks(fd):
+    """Return an iterator over the blocks of decompressed data
+    of the fd gzipped file, according to the --decompress option."""
+    if DECOMPRESS == 'zlib':
+        return zlibBlocks(fd)
+    elif DECOMPRESS == 'thread':
+        return threadedBlocks(fd)
+    return commandBlocks(fd, DECOMPRESS)
+
+
+def isSelected(fname):
+    """Return False if a data file was excluded by the --only or
+    --exclude command line options."""
+    if not SKIPPED_FILES:
+        return True
+    fname = os.path.basename(fname)
+    if fname.endswith('.list.gz'):
+        fname = fname[:-8]
+    return fname not in SKIPPED_FILES
+
+
+class SourceFile(object):
     """Instances of this class are used to read gzipped files,
-    starting from a defined line to a (optionally) given end."""
+    starting from a defined line to a (optionally) given end.
+    The data is decompressed and converted to utf-8 in large blocks,
+    and the lines are then read from a buffer.
+    During an incremental import, only the lines of the chunks
+    (see the chunkBy argument) that are changed are returned, reading
+    the old file in the 'delete' pass and the new one in the 'insert'
+    pass."""
     def __init__(self, filename=None, mode=None, start=(), stop=None,
-                    pwarning=1, *args, **kwds):
-        filename = os.path.join(IMDB_PTDF_DIR, filename)
+                    pwarning=1, chunkBy=isChunkStart, directory=None,
+                    incremental=True):
+        if not isSelected(filename):
+            print 'SKIPPING %s (not selected).' % filename
+            raise IOError('file not selected: %s' % filename)
+        changed = None
+        if incremental and INCR_PASS is not None:
+            if INCR_PASS == 'delete':
+                # Nothing to delete, if one of the two files is missing.
+                for dirName in (IMDB_PTDF_DIR, INCREMENTAL_DIR):
+                    if not os.path.isfile(os.path.join(dirName, filename)):
+                        raise IOError('missing file: %s' % filename)
+                directory = INCREMENTAL_DIR
+            if os.path.isfile(os.path.join(IMDB_PTDF_DIR, filename)):
+                changed = changedChunks(filename, start, stop, chunkBy)
+        if directory is None:
+            directory = IMDB_PTDF_DIR
+        filename = os.path.join(directory, filename)
         try:
-            GzipFile.__init__(self, filename, mode, *args, **kwds)
+            self.fileobj = open(filename, 'rb')
         except IOError, e:
             if not pwarning: raise
             print 'WARNING WARNING WARNING'
@@ -767,29 +1780,122 @@ class SourceFile(GzipFile):
             print 'WARNING Complete error: ', e
             # re-raise the exception.
             raise
+        self.name = filename
+        # Compressed size, used to show the progress.
+        self.size = os.path.getsize(filename)
+        self.openTime = time.time()
+        self._blocks = readBlocks(self.fileobj)
+        self._buffer = StringIO('')
+        # Incomplete last line of the data read so far.
+        self._rest = ''
+        self._eof = False
+        # Decompressed bytes read.
+        self.bytesRead = 0
+        self.stop = None
         self.start = start
         for item in start:
             itemlen = len(item)
             for line in self:
                 if line[:itemlen] == item: break
         self.set_stop(stop)
+        if changed is not None:
+            self._changed, self._nrChanged = changed
+            self._chunks = iterChunks(self.readline, chunkBy)
+            self._lines = []
+            self.readline = self.readline_changedChunks
 
     def set_stop(self, stop):
+        """Stop reading at the first line starting with stop."""
+        self.stop = stop
         if stop is not None:
-            self.stop = stop
-            self.stoplen = len(self.stop)
-            self.readline = self.readline_checkEnd
+            self._buffer = StringIO(self._cutAtStop(self._buffer.read()))
+
+    def _cutAtStop(self, data):
+        """Return data (complete lines) up to the stop line, if any."""
+        stop = self.stop
+        if stop is None:
+            return data
+        if data[:len(stop)] == stop:
+            idx = 0
         else:
-            self.readline = self.readline_NOcheckEnd
-
-    def readline_NOcheckEnd(self, size=-1):
-        line = GzipFile.readline(self, size)
-        return unicode(line, 'latin_1').encode('utf_8')
-
-    def readline_checkEnd(self, size=-1):
-        line = GzipFile.readline(self, size)
-        if self.stop is not None and line[:self.stoplen] == self.stop: return ''
-        return unicode(line, 'latin_1').encode('utf_8')
+            idx = data.find('\n' + stop) + 1
+            if not idx:
+                return data
+        self._eof = True
+        self._rest = ''
+        return data[:idx]
+
+    def _fill(self):
+        """Fill the buffer with the next block of complete lines;
+        return False at the end of the data."""
+        while not self._eof:
+            try:
+                block = self._blocks.next()
+            except StopIteration:
+                self._eof = True
+                data = self._rest
+                self._rest = ''
+            else:
+                self.bytesRead += len(block)
+                _STATS['inputBytes'] += len(block)
+                if PROGRESS:
+                    _PROGRESS.update(self)
+                # latin_1 is a single-byte encoding: a block can be
+                # safely converted, even if it ends in the middle of a line.
+                data = self._rest + unicode(block,
+                                            'latin_1').encode('utf_8')
+                cut = data.rfind('\n') + 1
+                if not cut:
+                    self._rest = data
+                    continue
+                self._rest = data[cut:]
+                data = data[:cut]
+            data = self._cutAtStop(data)
+            if data:
+                self._buffer = StringIO(data)
+                return True
+        return False
+
+    def readline(self, size=-1):
+        line = self._buffer.readline()
+        if not line and self._fill():
+            line = self._buffer.readline()
+        return line
+
+    def __iter__(self):
+        return iter(self.readline, '')
+
+    def position(self):
+        """Return the number of compressed bytes consumed."""
+        try:
+            # The file descriptor can be shared with the external
+            # command used to decompress the file.
+            return os.lseek(self.fileobj.fileno(), 0, 1)
+        except (OSError, ValueError):
+            return 0
+
+    def close(self):
+        if PROGRESS and not self.fileobj.closed:
+            _PROGRESS.fileDone(self.size)
+        self._buffer = StringIO('')
+        self._eof = True
+        if self._blocks is not None:
+            self._blocks.close()
+            self._blocks = None
+        self.fileobj.close()
+
+    def readline_changedChunks(self, size=-1):
+        while not self._lines:
+            if not self._nrChanged:
+                return ''
+            try:
+                chunk = self._chunks.next()
+            except StopIteration:
+                return ''
+            if self._changed.get(''.join(chunk)):
+                chunk.reverse()
+                self._lines = chunk
+        return self._lines.pop()
 
     def getByHashSections(self):
         return getSectionHash(self)
@@ -839,6 +1945,11 @@ def getSectionNMMV(fp):
         curSectList[:] = []
         curNMMV = ''
 
+def isNMMVChunkStart(line):
+    """Chunks separated by lines starting with 'NM: ', 'MV: ', 'OT: '
+    or 'MOVI'."""
+    return line[:4] in NMMVSections
+
 def counter(initValue=1):
     """A counter implemented using a generator."""
     i = initValue
@@ -846,91 +1957,454 @@ def counter(initValue=1):
         yield i
         i += 1
 
-class _BaseCache(dict):
+def _keyDigest(key):
+    """Return a 64-bit digest of a string, as a couple of 32-bit integers;
+    (0, 0) is never returned, being used to mark empty slots."""
+    hi, lo = struct.unpack('<II', md5(key).digest()[:8])
+    if not (hi or lo):
+        lo = 1
+    return hi, lo
+
+
+class CompactDict(object):
+    """A dictionary-like object which maps strings to integers, using
+    much less memory than a dict: the keys are not stored, but only
+    their 64-bit digests, in an open-addressing hash table made of
+    array objects.  The keys can't be retrieved, and two keys with the
+    same digest are considered equal (that's extremely unlikely, with
+    a few millions of entries)."""
+    def __init__(self, valueCode='i'):
+        self._valueCode = valueCode
+        self._allocate(1024)
+
+    def _allocate(self, size):
+        """Allocate empty tables with the given number of slots."""
+        self._size = size
+        self._mask = size - 1
+        self._used = 0
+        self._hi = array('I', [0]) * size
+        self._lo = array('I', [0]) * size
+        self._values = array(self._valueCode, [0]) * size
+
+    def _slot(self, hi, lo):
+        """Return the index of the slot for the given digest; it's
+        either the one already used by the digest, or an empty slot."""
+        mask = self._mask
+        his = self._hi
+        los = self._lo
+        i = lo & mask
+        while 1:
+            h = his[i]
+            l = los[i]
+            if h == hi and l == lo:
+                return i
+            if not (h or l):
+                return i
+            i = (i + 1) & mask
+
+    def _grow(self):
+        """Double the size of the tables."""
+        his, los, values = self._hi, self._lo, self._values
+        used = self._used
+        self._allocate(self._size * 2)
+        self._used = used
+        newHis, newLos, newValues = self._hi, self._lo, self._values
+        _slot = self._slot
+        for i in xrange(len(his)):
+            hi = his[i]
+            lo = los[i]
+            if not (hi or lo):
+                continue
+            j = _slot(hi, lo)
+            newHis[j] = hi
+            newLos[j] = lo
+            newValues[j] = values[i]
+
+    def __setitem__(self, key, value):
+        hi, lo = _keyDigest(key)
+        i = self._slot(hi, lo)
+        if not (self._hi[i] or self._lo[i]):
+            self._hi[i] = hi
+            self._lo[i] = lo
+            self._used += 1
+            self._values[i] = value
+            if self._used * 3 > self._size * 2:
+                self._grow()
+        else:
+            self._values[i] = value
+
+    def __getitem__(self, key):
+        hi, lo = _keyDigest(key)
+        i = self._slot(hi, lo)
+        if not (self._hi[i] or self._lo[i]):
+            raise KeyError(key)
+        return self._values[i]
+
+    def get(self, key, default=None):
+        hi, lo = _keyDigest(key)
+        i = self._slot(hi, lo)
+        if not (self._hi[i] or self._lo[i]):
+            return default
+        return self._values[i]
+
+    def __contains__(self, key):
+        hi, lo = _keyDigest(key)
+        i = self._slot(hi, lo)
+        return bool(self._hi[i] or self._lo[i])
+
+    has_key = __contains__
+
+    def __len__(self):
+        return self._used
+
+    def clear(self):
+        self._allocate(1024)
+
+    def dumpState(self, fd):
+        """Write the content of the tables to the fd file."""
+        pickle.dump((self._size, self._used, self._hi.tostring(),
+                    self._lo.tostring(), self._values.tostring()), fd,
+                    pickle.HIGHEST_PROTOCOL)
+
+    def loadState(self, fd, nextValue=None):
+        """Read the content of the tables from the fd file."""
+        size, used, his, los, values = pickle.load(fd)
+        self._allocate(size)
+        self._used = used
+        self._hi = array('I')
+        self._hi.fromstring(his)
+        self._lo = array('I')
+        self._lo.fromstring(los)
+        self._values = array(self._valueCode)
+        self._values.fromstring(values)
+
+
+_DISK_CACHE_CONN = None
+
+def _diskCacheConnection():
+    """Return the connection to the SQLite file used to store the caches."""
+    global _DISK_CACHE_CONN
+    if _DISK_CACHE_CONN is None:
+        fname = os.path.join(CACHE_DIR, 'imdbpy2sql-cache.db')
+        _DISK_CACHE_CONN = sqlite3.connect(fname)
+        _DISK_CACHE_CONN.text_factory = str
+        _DISK_CACHE_CONN.execute('PRAGMA synchronous = OFF;')
+    return _DISK_CACHE_CONN
+
+
+class DiskDict(object):
+    """A dictionary-like object which maps strings to integers, stored
+    in a table of an auxiliary SQLite file (in the CACHE_DIR directory),
+    so that data survive across runs.  Up to CACHE_SIZE recently used
+    entries are also kept in memory (in two generations, a simple
+    approximation of a LRU cache); new entries are written to disk
+    in batches."""
+    persistent = True
+
+    def __init__(self, name=None, frontSize=None, writeEvery=20000):
+        if name is None:
+            name = getattr(self, 'className', self.__class__.__name__)
+        if frontSize is None:
+            frontSize = CACHE_SIZE
+        self._diskTable = 'cache_%s' % name
+        self._frontSize = max(frontSize / 2, 1)
+        self._writeEvery = writeEvery
+        self._hot = {}
+        self._cold = {}
+        self._pending = {}
+        self._diskConn = _diskCacheConnection()
+        self._diskConn.execute('CREATE TABLE IF NOT EXISTS %s '
+                            '(key TEXT PRIMARY KEY, value INTEGER);' %
+                            self._diskTable)
+        self._diskConn.commit()
+        self._selectStr = 'SELECT value FROM %s WHERE key = ?;' % \
+                            self._diskTable
+        self._insertStr = 'INSERT OR REPLACE INTO %s (key, value) ' \
+                            'VALUES (?, ?);' % self._diskTable
+
+    def _remember(self, key, value):
+        """Keep an entry in memory."""
+        hot = self._hot
+        hot[key] = value
+        if len(hot) >= self._frontSize:
+            # The older generation is discarded.
+            self._cold = hot
+            self._hot = {}
+
+    def _lookup(self, key):
+        """Return the value of the given key, or None."""
+        value = self._hot.get(key)
+        if value is not None:
+            return value
+        value = self._cold.get(key)
+        if value is None:
+            value = self._pending.get(key)
+            if value is None:
+                res = self._diskConn.execute(self._selectStr,
+                                            (key,)).fetchone()
+                if res is None:
+                    return None
+                value = res[0]
+        self._remember(key, value)
+        return value
+
+    def sync(self):
+        """Write the pending entries to disk."""
+        if not self._pending:
+            return
+        self._diskConn.executemany(self._insertStr,
+                                    self._pending.iteritems())
+        self._diskConn.commit()
+        self._pending.clear()
+
+    def __setitem__(self, key, value):
+        self._pending[key] = value
+        self._remember(key, value)
+        if len(self._pending) >= self._writeEvery:
+            self.sync()
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        if value is None:
+            return default
+        return value
+
+    def __contains__(self, key):
+        return self._lookup(key) is not None
+
+    has_key = __contains__
+
+    def __len__(self):
+        self.sync()
+        return self._diskConn.execute('SELECT COUNT(*) FROM %s;' %
+                                        self._diskTable).fetchone()[0]
+
+    def clear(self):
+        """Free the memory used by the entries; data written on disk are
+        kept, so that they can be reused by a later run (see erase)."""
+        self.sync()
+        self._hot.clear()
+        self._cold.clear()
+
+    def erase(self):
+        """Remove every entry, also from the disk."""
+        self._hot.clear()
+        self._cold.clear()
+        self._pending.clear()
+        self._diskConn.execute('DELETE FROM %s;' % self._diskTable)
+        self._diskConn.commit()
+
+    def dumpState(self, fd):
+        """Data are already stored on disk: just write the pending ones."""
+        self.sync()
+
+    def loadState(self, fd, nextValue=None):
+        """Remove the entries stored on disk after the state was saved
+        (the ones with a value not lower than nextValue)."""
+        self._hot.clear()
+        self._cold.clear()
+        self._pending.clear()
+        if nextValue is not None:
+            self._diskConn.execute('DELETE FROM %s WHERE value >= ?;' %
+                                    self._diskTable, (nextValue,))
+            self._diskConn.commit()
+
+
+class MemoryDict(dict):
+    """A plain dictionary, which can save and restore its content."""
+    def dumpState(self, fd):
+        """Write the entries to the fd file, in chunks."""
+        items = []
+        for item in self.iteritems():
+            items.append(item)
+            if len(items) >= 100000:
+                pickle.dump(items, fd, pickle.HIGHEST_PROTOCOL)
+                items[:] = []
+        pickle.dump(items, fd, pickle.HIGHEST_PROTOCOL)
+
+    def loadState(self, fd, nextValue=None):
+        """Read the entries from the fd file."""
+        dict.clear(self)
+        while 1:
+            try:
+                items = pickle.load(fd)
+            except EOFError:
+                break
+            dict.update(self, items)
+
+
+# Storage used by the caches.
+if CACHE_BACKEND == 'compact':
+    _CacheStorage = CompactDict
+elif CACHE_BACKEND == 'disk':
+    _CacheStorage = DiskDict
+else:
+    _CacheStorage = MemoryDict
+
+def _rowBytes(row):
+    """Rough size, in bytes, of a row (or of an entry of a cache)."""
+    size = 0
+    for value in row:
+        if isinstance(value, basestring):
+            size += len(value) + 4
+        else:
+            size += 8
+    return size
+
+
+class BatchSize(object):
+    """Number of rows written at once to a table; it's adapted after
+    every batch, measuring the size of its rows and the time taken."""
+    def __init__(self, size):
+        self.size = max(1, size)
+        self.maxBytes = BATCH_BYTES
+        # Average size of a row, and rows written per second.
+        self.rowBytes = None
+        self.rate = None
+
+    def limit(self, rows):
+        """Return the number of rows (a list) to write in the next batch,
+        according to the size of some of them."""
+        sample = rows[:100]
+        if sample:
+            self.rowBytes = float(sum([_rowBytes(r) for r in sample])) / \
+                            len(sample)
+            return max(1, min(self.size, int(self.maxBytes / self.rowBytes)))
+        return self.size
+
+    def done(self, nrRows, elapsed):
+        """A batch of nrRows rows was written in elapsed seconds."""
+        limits = [BATCH_MAX_ROWS]
+        # Grow only when a whole batch was written.
+        if nrRows >= self.size:
+            limits.append(self.size * 2)
+        else:
+            limits.append(self.size)
+        if self.rowBytes:
+            limits.append(int(self.maxBytes / self.rowBytes))
+        if elapsed > 0:
+            self.rate = nrRows / elapsed
+            limits.append(max(BATCH_MIN_ROWS, int(self.rate * BATCH_TIME)))
+        self.size = max(1, min(limits))
+
+    def failed(self, nrRows):
+        """A batch of nrRows rows was too large: halve it, and lower
+        the max size in bytes of the next batches."""
+        self.size = max(1, nrRows / 2)
+        if self.rowBytes:
+            self.maxBytes = min(self.maxBytes,
+                                max(1, int(self.rowBytes * self.size)))
+
+
+_BATCH_SIZES = {}
+
+def batchSize(name, size):
+    """Return the BatchSize instance shared by the objects writing
+    to the same table (or cache); size is used for a new one."""
+    batch = _BATCH_SIZES.get(name)
+    if batch is None:
+        batch = _BATCH_SIZES[name] = BatchSize(size)
+    return batch
+
+
+def writeBatches(batch, rows, write, label, table=None):
+    """Write the rows (a list), calling the write function with batches
+    of the size suggested by the batch BatchSize instance; a batch that
+    fails with an OperationalError is split and written again, so that
+    no row is lost (if a single row can't be written, the exception
+    is raised, as for any other error).  The rows are counted for the
+    table (or label)."""
+    if table is None:
+        table = label
+    # Using SQLAlchemy, tableName returns a Table object.
+    table = str(table)
+    pos = 0
+    nrRows = len(rows)
+    while pos < nrRows:
+        chunk = rows[pos:pos + batch.limit(rows[pos:pos + 100])]
+        begin = time.time()
+        try:
+            write(chunk)
+        except OperationalError, e:
+            if len(chunk) == 1:
+                raise
+            batch.failed(len(chunk))
+            print ' * TOO MANY DATA (%s items in %s), SPLITTING: %s' % \
+                    (len(chunk), label, e)
+            continue
+        elapsed = time.time() - begin
+        batch.done(len(chunk), elapsed)
+        countRows(table, len(chunk), elapsed)
+        pos += len(chunk)
+
+
+class _BaseCache(_CacheStorage):
     """Base class for Movie and Person basic information."""
     def __init__(self, d=None, flushEvery=100000):
-        dict.__init__(self)
-        # Flush data into the SQL database every flushEvery entries.
+        _CacheStorage.__init__(self)
+        # Initial number of entries flushed at once (see BatchSize),
+        # and entries fetched at once populating the cache.
         self.flushEvery = flushEvery
         self._tmpDict = {}
         self._flushing = 0
         self._deferredData = {}
-        self._recursionLevel = 0
+        self._batch = None
         self._table_name = ''
         self._id_for_custom_q = ''
+        # Table and column used to look up keys in the database.
+        self._lookupTable = None
+        self._lookupCol = 'md5sum'
         if d is not None:
             for k, v in d.iteritems(): self[k] = v
 
     def __setitem__(self, key, counter):
         """Every time a key is set, its value is the counter;
-        every flushEvery, the temporary dictionary is
-        flushed to the database, and then zeroed."""
-        if counter % self.flushEvery == 0:
+        when it's large enough (see BatchSize), the temporary
+        dictionary is flushed to the database, and then zeroed."""
+        if len(self._tmpDict) >= self.batch().size:
             self.flush()
-        dict.__setitem__(self, key, counter)
+        _CacheStorage.__setitem__(self, key, counter)
         if not self._flushing:
             self._tmpDict[key] = counter
         else:
             self._deferredData[key] = counter
 
-    def flush(self, quiet=0, _recursionLevel=0):
+    def batch(self):
+        """Return the BatchSize instance used by this cache."""
+        if self._batch is None:
+            self._batch = batchSize(self.className, self.flushEvery)
+        return self._batch
+
+    def flush(self, quiet=0):
         """Flush to the database."""
         if self._flushing: return
         self._flushing = 1
-        if _recursionLevel >= MAX_RECURSION:
-            print 'WARNING recursion level exceded trying to flush data'
-            print 'WARNING this batch of data is lost (%s).' % self.className
-            self._tmpDict.clear()
-            return
         if self._tmpDict:
-            # Horrible hack to know if AFTER_%s_TODB has run.
-            _after_has_run = False
             keys = {'table': self._table_name}
-            try:
+            entries = self._tmpDict.items()
+            def _write(chunk):
                 executeCustomQueries('BEFORE_%s_TODB' % self._id_for_custom_q,
                                     _keys=keys, _timeit=False)
-                self._toDB(quiet)
-                executeCustomQueries('AFTER_%s_TODB' % self._id_for_custom_q,
-                                    _keys=keys, _timeit=False)
-                _after_has_run = True
-                self._tmpDict.clear()
-            except OperationalError, e:
-                # XXX: I'm not sure this is the right thing (and way)
-                #      to proceed.
-                if not _after_has_run:
-                    executeCustomQueries('AFTER_%s_TODB'%self._id_for_custom_q,
+                try:
+                    self._tmpDict = dict(chunk)
+                    self._toDB(quiet)
+                finally:
+                    executeCustomQueries('AFTER_%s_TODB' %
+                                        self._id_for_custom_q,
                                         _keys=keys, _timeit=False)
-                # Dataset too large; split it in two and retry.
-                # XXX: new code!
-                # the same class instance (self) is used, instead of
-                # creating two separated objects.
-                _recursionLevel += 1
+            try:
+                writeBatches(self.batch(), entries, _write, self.className,
+                            self._table_name)
+            except:
                 self._flushing = 0
-                firstHalf = {}
-                poptmpd = self._tmpDict.popitem
-                originalLength = len(self._tmpDict)
-                for x in xrange(1 + originalLength/2):
-                    k, v = poptmpd()
-                    firstHalf[k] = v
-                print ' * TOO MANY DATA (%s items in %s), recursion: %s' % \
-                                                        (originalLength,
-                                                        self.className,
-                                                        _recursionLevel)
-                print '   * SPLITTING (run 1 of 2), recursion: %s' % \
-                                                        _recursionLevel
-                self.flush(quiet=quiet, _recursionLevel=_recursionLevel)
-                self._tmpDict = firstHalf
-                print '   * SPLITTING (run 2 of 2), recursion: %s' % \
-                                                        _recursionLevel
-                self.flush(quiet=quiet, _recursionLevel=_recursionLevel)
-                self._tmpDict.clear()
-            except Exception, e:
-                if isinstance(e, KeyboardInterrupt):
-                    raise
-                print 'WARNING: unknown exception caught committing the data'
-                print 'WARNING: to the database; report this as a bug, since'
-                print 'WARNING: many data (%d items) were lost: %s' % \
-                        (len(self._tmpDict), e)
+                raise
+            self._tmpDict = {}
         self._flushing = 0
         # Flush also deferred data.
         if self._deferredData:
@@ -938,11 +2412,57 @@ class _BaseCache(dict):
             self.flush(quiet=1)
             self._deferredData = {}
         connectObject.commit()
+        if getattr(self, 'persistent', False):
+            self.sync()
 
     def populate(self):
         """Populate the dictionary from the database."""
         raise NotImplementedError
 
+    def saveState(self, fname):
+        """Save the entries of the cache in the fname file (caches stored
+        on disk only write their pending entries); return the next value
+        of the counter."""
+        nextValue = self.counter.next()
+        self.counter = counter(nextValue)
+        if getattr(self, 'persistent', False):
+            _CacheStorage.dumpState(self, None)
+            return nextValue
+        fd = open(fname + '.tmp', 'wb')
+        _CacheStorage.dumpState(self, fd)
+        fd.close()
+        if os.path.exists(fname):
+            os.remove(fname)
+        os.rename(fname + '.tmp', fname)
+        return nextValue
+
+    def loadState(self, fname, nextValue):
+        """Restore the entries saved by saveState, and the counter."""
+        self._tmpDict.clear()
+        self._deferredData.clear()
+        if getattr(self, 'persistent', False):
+            _CacheStorage.loadState(self, None, nextValue)
+        else:
+            fd = open(fname, 'rb')
+            _CacheStorage.loadState(self, fd, nextValue)
+            fd.close()
+        self.counter = counter(nextValue)
+
+    def _reusePersisted(self, table):
+        """If the cache is stored on disk and contains the entries
+        written by a previous run for the given table, reuse them
+        (without reading the whole table) and return True."""
+        if not getattr(self, 'persistent', False):
+            return False
+        nrRows = table.select().count()
+        if not nrRows or len(self) != nrRows:
+            self.erase()
+            return False
+        print ' * REUSING %s (%d entries stored on disk)...' % \
+                (self.className, nrRows)
+        self.counter = counter(nrRows + 1)
+        return True
+
     def _toDB(self, quiet=0):
         """Write the dictionary to the database."""
         raise NotImplementedError
@@ -958,11 +2478,33 @@ class _BaseCache(dict):
         self[key] = c
         return c
 
+    def lookup(self, key):
+        """Return the ID of a key already stored in the database,
+        or None."""
+        if self._lookupTable is None:
+            return None
+        if self._lookupCol == 'md5sum':
+            value = md5(key).hexdigest()
+        else:
+            value = unicode(key, 'utf_8')
+        table = self._lookupTable
+        for row in table.select(getattr(table.q, self._lookupCol) == value):
+            return row.id
+        return None
+
     def addUnique(self, key, miscData=None):
         """Insert a new key and return its value; if the key is already
         in the dictionary, its previous  value is returned."""
         if key in self: return self[key]
-        else: return self.add(key, miscData)
+        if INCR_PASS is not None:
+            # Incremental import: the key can be in the database.
+            value = self.lookup(key)
+            if value is not None:
+                _CacheStorage.__setitem__(self, key, value)
+                return value
+            if INCR_PASS == 'delete':
+                return None
+        return self.add(key, miscData)
 
 
 def fetchsome(curs, size=20000):
@@ -982,6 +2524,7 @@ class MoviesCache(_BaseCache):
         _BaseCache.__init__(self, *args, **kwds)
         self.movieYear = {}
         self._table_name = tableName(Title)
+        self._lookupTable = Title
         self._id_for_custom_q = 'MOVIES'
         self.sqlstr, self.converter = createSQLstr(Title, ('id', 'title',
                                     'imdbIndex', 'kindID', 'productionYear',
@@ -990,6 +2533,8 @@ class MoviesCache(_BaseCache):
                                     'md5sum'))
 
     def populate(self):
+        if self._reusePersisted(Title):
+            return
         print ' * POPULATING %s...' % self.className
         titleTbl = tableName(Title)
         movieidCol = colName(Title, 'id')
@@ -1000,32 +2545,35 @@ class MoviesCache(_BaseCache):
         episodeofidCol = colName(Title, 'episodeOfID')
         seasonNrCol = colName(Title, 'seasonNr')
         episodeNrCol = colName(Title, 'episodeNr')
-        sqlPop = 'SELECT %s, %s, %s, %s, %s, %s, %s, %s FROM %s;' % \
-                (movieidCol, titleCol, kindidCol, yearCol, imdbindexCol,
-                episodeofidCol, seasonNrCol, episodeNrCol, titleTbl)
+        # The series of an episode is read with a self join, instead
+        # of a Title.get() for every episode.
+        cols = (movieidCol, titleCol, kindidCol, yearCol, imdbindexCol,
+                episodeofidCol, seasonNrCol, episodeNrCol)
+        sqlPop = 'SELECT %s, %s FROM %s e LEFT JOIN %s s ON e.%s = s.%s;' % \
+                (', '.join(['e.%s' % col for col in cols]),
+                ', '.join(['s.%s' % col for col in cols[1:5]]),
+                titleTbl, titleTbl, episodeofidCol, movieidCol)
         CURS.execute(sqlPop)
-        _oldcacheValues = Title.sqlmeta.cacheValues
-        Title.sqlmeta.cacheValues = False
         for x in fetchsome(CURS, self.flushEvery):
             mdict = {'title': x[1], 'kind': KIND_STRS[x[2]],
                     'year': x[3], 'imdbIndex': x[4]}
             if mdict['imdbIndex'] is None: del mdict['imdbIndex']
             if mdict['year'] is None: del mdict['year']
             else: mdict['year'] = str(mdict['year'])
-            episodeOfID = x[5]
-            if episodeOfID is not None:
-                s = Title.get(episodeOfID)
-                series_d = {'title': s.title,
-                            'kind': str(KIND_STRS[s.kindID]),
-                            'year': s.productionYear, 'imdbIndex': s.imdbIndex}
+            if x[5] is not None and x[8] is not None:
+                series_d = {'title': x[8], 'kind': str(KIND_STRS[x[9]]),
+                            'year': x[10], 'imdbIndex': x[11]}
                 if series_d['imdbIndex'] is None: del series_d['imdbIndex']
                 if series_d['year'] is None: del series_d['year']
                 else: series_d['year'] = str(series_d['year'])
                 mdict['episode of'] = series_d
+                if x[6] is not None:
+                    mdict['season'] = x[6]
+                    if x[7] is not None:
+                        mdict['episode'] = x[7]
             title = build_title(mdict, ptdf=1, _emptyString='')
-            dict.__setitem__(self, title, x[0])
+            _CacheStorage.__setitem__(self, title, x[0])
         self.counter = counter(Title.select().count() + 1)
-        Title.sqlmeta.cacheValues = _oldcacheValues
 
     def _toDB(self, quiet=0):
         if not quiet:
@@ -1056,12 +2604,14 @@ class MoviesCache(_BaseCache):
                     except ValueError: pass
             elif kind in ('tv series', 'tv mini series'):
                 t['series years'] = self.movieYear.get(v)
-            title = tget('title')
-            soundex = title_soundex(title)
-            lapp((v, title, tget('imdbIndex'), KIND_IDS[kind],
-                    tget('year'), None, soundex, episodeOf,
-                    tget('season'), tget('episode'), tget('series years'),
-                    md5(k).hexdigest()))
+            lapp((v, tget('title'), tget('imdbIndex'), KIND_IDS[kind],
+                    tget('year'), episodeOf, tget('season'),
+                    tget('episode'), tget('series years'), k))
+        # Phonetic codes and digests are computed for the whole batch.
+        codes = titles_soundexes([x[1] for x in l])
+        digests = md5sums([x[-1] for x in l])
+        l[:] = [x[:5] + (None, codes[i]) + x[5:9] + (digests[i],)
+                for i, x in enumerate(l)]
         self._runCommand(l)
 
     def _runCommand(self, dataList):
@@ -1077,8 +2627,7 @@ class MoviesCache(_BaseCache):
         #if FIX_OLD_STYLE_TITLES:
         #    key = build_title(analyze_title(key, canonical=False,
         #                    _emptyString=''), ptdf=1, _emptyString='')
-        if key in self: return self[key]
-        else: return self.add(key, miscData)
+        return _BaseCache.addUnique(self, key, miscData)
 
 
 class PersonsCache(_BaseCache):
@@ -1090,11 +2639,14 @@ class PersonsCache(_BaseCache):
         _BaseCache.__init__(self, *args, **kwds)
         self._table_name = tableName(Name)
         self._id_for_custom_q = 'PERSONS'
+        self._lookupTable = Name
         self.sqlstr, self.converter = createSQLstr(Name, ['id', 'name',
                                 'imdbIndex', 'imdbID', 'namePcodeCf',
                                 'namePcodeNf', 'surnamePcode', 'md5sum'])
 
     def populate(self):
+        if self._reusePersisted(Name):
+            return
         print ' * POPULATING PersonsCache...'
         nameTbl = tableName(Name)
         personidCol = colName(Name, 'id')
@@ -1108,7 +2660,7 @@ class PersonsCache(_BaseCache):
             nd = {'name': x[1]}
             if x[2]: nd['imdbIndex'] = x[2]
             name = build_name(nd)
-            dict.__setitem__(self, name, x[0])
+            _CacheStorage.__setitem__(self, name, x[0])
         self.counter = counter(Name.select().count() + 1)
         Name.sqlmeta.cacheValues = _oldcacheValues
 
@@ -1126,12 +2678,11 @@ class PersonsCache(_BaseCache):
                 if k and k.strip():
                     print 'WARNING PersonsCache._toDB() invalid name:', _(k)
                 continue
-            tget = t.get
-            name = tget('name')
-            namePcodeCf, namePcodeNf, surnamePcode = name_soundexes(name)
-            lapp((v, name, tget('imdbIndex'), None,
-                namePcodeCf, namePcodeNf, surnamePcode,
-                md5(k).hexdigest()))
+            lapp((v, t.get('name'), t.get('imdbIndex'), k))
+        codes = names_soundexes([x[1] for x in l])
+        digests = md5sums([x[-1] for x in l])
+        l[:] = [x[:3] + (None,) + codes[i] + (digests[i],)
+                for i, x in enumerate(l)]
         if not CSV_DIR:
             CURS.executemany(self.sqlstr, self.converter(l))
         else:
@@ -1147,11 +2698,14 @@ class CharactersCache(_BaseCache):
         _BaseCache.__init__(self, *args, **kwds)
         self._table_name = tableName(CharName)
         self._id_for_custom_q = 'CHARACTERS'
+        self._lookupTable = CharName
         self.sqlstr, self.converter = createSQLstr(CharName, ['id', 'name',
                                 'imdbIndex', 'imdbID', 'namePcodeNf',
                                 'surnamePcode', 'md5sum'])
 
     def populate(self):
+        if self._reusePersisted(CharName):
+            return
         print ' * POPULATING CharactersCache...'
         nameTbl = tableName(CharName)
         personidCol = colName(CharName, 'id')
@@ -1165,7 +2719,7 @@ class CharactersCache(_BaseCache):
             nd = {'name': x[1]}
             if x[2]: nd['imdbIndex'] = x[2]
             name = build_name(nd)
-            dict.__setitem__(self, name, x[0])
+            _CacheStorage.__setitem__(self, name, x[0])
         self.counter = counter(CharName.select().count() + 1)
         CharName.sqlmeta.cacheValues = _oldcacheValues
 
@@ -1183,12 +2737,11 @@ class CharactersCache(_BaseCache):
                 if k and k.strip():
                     print 'WARNING CharactersCache._toDB() invalid name:', _(k)
                 continue
-            tget = t.get
-            name = tget('name')
-            namePcodeCf, namePcodeNf, surnamePcode = name_soundexes(name,
-                                                                character=True)
-            lapp((v, name, tget('imdbIndex'), None,
-                namePcodeCf, surnamePcode, md5(k).hexdigest()))
+            lapp((v, t.get('name'), t.get('imdbIndex'), k))
+        codes = names_soundexes([x[1] for x in l], character=True)
+        digests = md5sums([x[-1] for x in l])
+        l[:] = [x[:3] + (None, codes[i][0], codes[i][2], digests[i])
+                for i, x in enumerate(l)]
         if not CSV_DIR:
             CURS.executemany(self.sqlstr, self.converter(l))
         else:
@@ -1204,11 +2757,14 @@ class CompaniesCache(_BaseCache):
         _BaseCache.__init__(self, *args, **kwds)
         self._table_name = tableName(CompanyName)
         self._id_for_custom_q = 'COMPANIES'
+        self._lookupTable = CompanyName
         self.sqlstr, self.converter = createSQLstr(CompanyName, ['id', 'name',
                                 'countryCode', 'imdbID', 'namePcodeNf',
                                 'namePcodeSf', 'md5sum'])
 
     def populate(self):
+        if self._reusePersisted(CompanyName):
+            return
         print ' * POPULATING CharactersCache...'
         nameTbl = tableName(CompanyName)
         companyidCol = colName(CompanyName, 'id')
@@ -1222,7 +2778,7 @@ class CompaniesCache(_BaseCache):
             nd = {'name': x[1]}
             if x[2]: nd['country'] = x[2]
             name = build_company_name(nd)
-            dict.__setitem__(self, name, x[0])
+            _CacheStorage.__setitem__(self, name, x[0])
         self.counter = counter(CompanyName.select().count() + 1)
         CompanyName.sqlmeta.cacheValues = _oldcacheValues
 
@@ -1240,15 +2796,14 @@ class CompaniesCache(_BaseCache):
                 if k and k.strip():
                     print 'WARNING CompaniesCache._toDB() invalid name:', _(k)
                 continue
-            tget = t.get
-            name = tget('name')
-            namePcodeNf = soundex(name)
-            namePcodeSf = None
-            country = tget('country')
-            if k != name:
-                namePcodeSf = soundex(k)
-            lapp((v, name, country, None, namePcodeNf, namePcodeSf,
-                    md5(k).hexdigest()))
+            name = t.get('name')
+            lapp((v, name, t.get('country'), k, k != name and k or None))
+        # The soundex of the full name, if different from the name.
+        codes = soundexes([x[1] for x in l] + [x[4] for x in l])
+        digests = md5sums([x[3] for x in l])
+        nrItems = len(l)
+        l[:] = [x[:3] + (None, codes[i], codes[nrItems + i], digests[i])
+                for i, x in enumerate(l)]
         if not CSV_DIR:
             CURS.executemany(self.sqlstr, self.converter(l))
         else:
@@ -1262,13 +2817,17 @@ class KeywordsCache(_BaseCache):
 
     def __init__(self, *args, **kwds):
         _BaseCache.__init__(self, *args, **kwds)
-        self._table_name = tableName(CompanyName)
+        self._table_name = tableName(Keyword)
         self._id_for_custom_q = 'KEYWORDS'
+        self._lookupTable = Keyword
+        self._lookupCol = 'keyword'
         self.flushEvery = 10000
         self.sqlstr, self.converter = createSQLstr(Keyword, ['id', 'keyword',
                                 'phoneticCode'])
 
     def populate(self):
+        if self._reusePersisted(Keyword):
+            return
         print ' * POPULATING KeywordsCache...'
         nameTbl = tableName(CompanyName)
         keywordidCol = colName(Keyword, 'id')
@@ -1278,7 +2837,7 @@ class KeywordsCache(_BaseCache):
         _oldcacheValues = Keyword.sqlmeta.cacheValues
         Keyword.sqlmeta.cacheValues = False
         for x in fetchsome(CURS, self.flushEvery):
-            dict.__setitem__(self, x[1], x[0])
+            _CacheStorage.__setitem__(self, x[1], x[0])
         self.counter = counter(Keyword.select().count() + 1)
         Keyword.sqlmeta.cacheValues = _oldcacheValues
 
@@ -1290,8 +2849,9 @@ class KeywordsCache(_BaseCache):
         lapp = l.append
         tmpDictiter = self._tmpDict.iteritems
         for k, v in tmpDictiter():
-            keySoundex = soundex(k)
-            lapp((v, k, keySoundex))
+            lapp((v, k))
+        codes = soundexes([x[1] for x in l])
+        l[:] = [x + (codes[i],) for i, x in enumerate(l)]
         if not CSV_DIR:
             CURS.executemany(self.sqlstr, self.converter(l))
         else:
@@ -1306,7 +2866,10 @@ class SQLData(dict):
         if not sqlString:
             if not (table and cols):
                 raise TypeError('"table" or "cols" unspecified')
-            sqlString, converter = createSQLstr(table, cols)
+            if INCR_PASS == 'delete':
+                sqlString, converter = createDeleteSQLstr(table, cols)
+            else:
+                sqlString, converter = createSQLstr(table, cols)
         elif converter is None:
             raise TypeError('"sqlString" or "converter" unspecified')
         dict.__init__(self)
@@ -1315,93 +2878,52 @@ class SQLData(dict):
         self.flushEvery = flushEvery
         self.sqlString = sqlString
         self.converter = converter
-        self._recursionLevel = 1
         self._table = table
         self._table_name = tableName(table)
+        self._batch = batchSize(self._table_name, flushEvery)
         for k, v in d.items(): self[k] = v
 
     def __setitem__(self, key, value):
         """The value is discarded, the counter is used as the 'real' key
         and the user's 'key' is used as its values."""
         counter = self.counter
-        if counter % self.flushEvery == 0:
+        if len(self) >= self._batch.size:
             self.flush()
+            counter = self.counter
         dict.__setitem__(self, counter, key)
         self.counter += 1
 
     def add(self, key):
         self[key] = None
 
-    def flush(self, _resetRecursion=1):
+    def flush(self):
         if not self: return
         # XXX: it's safer to flush MoviesCache and PersonsCache, to preserve
         #      consistency of ForeignKey, but it can also slow down everything
         #      a bit...
         CACHE_MID.flush(quiet=1)
         CACHE_PID.flush(quiet=1)
-        if _resetRecursion: self._recursionLevel = 1
-        if self._recursionLevel >= MAX_RECURSION:
-            print 'WARNING recursion level exceded trying to flush data'
-            print 'WARNING this batch of data is lost.'
-            self.clear()
-            self.counter = self.counterInit
-            return
         keys = {'table': self._table_name}
-        _after_has_run = False
-        try:
+        def _write(rows):
             executeCustomQueries('BEFORE_SQLDATA_TODB', _keys=keys,
                                 _timeit=False)
-            self._toDB()
-            executeCustomQueries('AFTER_SQLDATA_TODB', _keys=keys,
-                                _timeit=False)
-            _after_has_run = True
-            self.clear()
-            self.counter = self.counterInit
-        except OperationalError, e:
-            if not _after_has_run:
+            try:
+                self._toDB(rows)
+            finally:
                 executeCustomQueries('AFTER_SQLDATA_TODB', _keys=keys,
                                     _timeit=False)
-            print ' * TOO MANY DATA (%s items), SPLITTING (run #%d)...' % \
-                    (len(self), self._recursionLevel)
-            self._recursionLevel += 1
-            newdata = self.__class__(table=self._table,
-                                    sqlString=self.sqlString,
-                                    converter=self.converter)
-            newdata._recursionLevel = self._recursionLevel
-            newflushEvery = self.flushEvery / 2
-            if newflushEvery < 1:
-                print 'WARNING recursion level exceded trying to flush data'
-                print 'WARNING this batch of data is lost.'
-                self.clear()
-                self.counter = self.counterInit
-                return
-            self.flushEvery = newflushEvery
-            newdata.flushEvery = newflushEvery
-            popitem = self.popitem
-            dsi = dict.__setitem__
-            for x in xrange(len(self)/2):
-                k, v = popitem()
-                dsi(newdata, k, v)
-            newdata.flush(_resetRecursion=0)
-            del newdata
-            self.flush(_resetRecursion=0)
-            self.clear()
-            self.counter = self.counterInit
-        except Exception, e:
-            if isinstance(e, KeyboardInterrupt):
-                raise
-            print 'WARNING: unknown exception caught committing the data'
-            print 'WARNING: to the database; report this as a bug, since'
-            print 'WARNING: many data (%d items) were lost: %s' % \
-                    (len(self), e)
+        rows = self.values()
+        writeBatches(self._batch, rows, _write, self._table_name)
+        self.clear()
+        self.counter = self.counterInit
         connectObject.commit()
 
-    def _toDB(self):
+    def _toDB(self, rows):
         print ' * FLUSHING SQLData...'
         if not CSV_DIR:
-            CURS.executemany(self.sqlString, self.converter(self.values()))
+            CURS.executemany(self.sqlString, self.converter(rows))
         else:
-            CSV_CURS.executemany(self.sqlString, self.values())
+            CSV_CURS.executemany(self.sqlString, rows)
 
 
 # Miscellaneous functions.
@@ -1458,6 +2980,181 @@ def _parseColonList(lines, replaceKeys):
     return out
 
 
+# Parsing of the data files; files that don't depend on each other
+# can be parsed in a pool of processes.
+
+def _unpackLines(fp, headers):
+    """Yield a tuple for every line with a value for (at least) the
+    first two items of headers; missing values are set to None."""
+    firstKey = headers[0]
+    secondKey = headers[1]
+    for line in fp:
+        data = unpack(line.strip(), headers)
+        if firstKey not in data: continue
+        if secondKey not in data: continue
+        yield tuple([data.get(x) for x in headers])
+
+
+def _hashSectionsItems(fp, funct):
+    """Yield (title, information) tuples from a file with sections
+    separated by lines starting with '#'."""
+    for title, text in fp.getByHashSections():
+        yield title.strip(), funct(text.split('\n'))
+
+
+def _nmmvSectionsItems(fp, funct):
+    """Yield (title or name, information) tuples from a file with
+    sections separated by 'MV: ' or 'NM: '."""
+    for ton, text in fp.getByNMMVSections():
+        ton = ton.strip()
+        if not ton: continue
+        yield ton, funct(text.split('\n'))
+
+# How the files read by every parser are split in chunks, for an
+# incremental import.
+_CHUNK_STARTS = {_hashSectionsItems: isHashChunkStart,
+                _nmmvSectionsItems: isNMMVChunkStart}
+
+
+def _initParser():
+    """Initialize a process used to parse the data files."""
+    import signal
+    # Interruptions are managed by the main process.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _parseFile(job):
+    """Parse a data file, storing the resulting items in a temporary
+    spool file; return its name and the number of bytes read (or None,
+    if the file can't be read)."""
+    fname, start, stop, parser, args = job
+    try:
+        fp = SourceFile(fname, start=start, stop=stop)
+    except IOError:
+        return None
+    spoolName = _spoolItems(parser(fp, *args))
+    fp.close()
+    return spoolName, fp.bytesRead
+
+
+def _spoolItems(iterator):
+    """Store the items of an iterator in a temporary spool file;
+    return its name."""
+    fd, spoolName = tempfile.mkstemp(prefix='imdbpy2sql-', suffix='.spool')
+    spool = os.fdopen(fd, 'wb')
+    try:
+        items = []
+        for item in iterator:
+            items.append(item)
+            if len(items) >= 10000:
+                pickle.dump(items, spool, pickle.HIGHEST_PROTOCOL)
+                items[:] = []
+        if items:
+            pickle.dump(items, spool, pickle.HIGHEST_PROTOCOL)
+        spool.close()
+    except:
+        spool.close()
+        os.remove(spoolName)
+        raise
+    return spoolName
+
+
+def _readSpool(spoolName):
+    """Yield the items stored in a spool file, and then remove it."""
+    spool = open(spoolName, 'rb')
+    try:
+        while 1:
+            try:
+                items = pickle.load(spool)
+            except EOFError:
+                break
+            for item in items:
+                yield item
+    finally:
+        spool.close()
+        os.remove(spoolName)
+
+
+_PARSE_POOL = None
+_PARSE_RESULTS = {}
+
+def parsePool():
+    """Return the pool of JOBS processes used to parse the data files,
+    starting it if needed."""
+    global _PARSE_POOL
+    if _PARSE_POOL is None:
+        print 'STARTING %d processes to parse the data files...' % JOBS
+        _PARSE_POOL = multiprocessing.Pool(JOBS, _initParser)
+    return _PARSE_POOL
+
+
+def startParsing(jobs):
+    """Start parsing the files described by the given jobs, using
+    a pool of JOBS processes; the results will be collected by
+    the parsedFiles function."""
+    jobs = [job for job in jobs
+            if job[0] not in _DONE_STAGES and isSelected(job[0])]
+    if JOBS < 2 or not jobs:
+        return
+    pool = parsePool()
+    for job in jobs:
+        _PARSE_RESULTS[job[0]] = pool.apply_async(_parseFile, (job,))
+
+
+def stopParsing(terminate=False):
+    """Shut down the pool of processes used to parse the data files."""
+    global _PARSE_POOL
+    if _PARSE_POOL is None:
+        return
+    if terminate:
+        _PARSE_POOL.terminate()
+    else:
+        _PARSE_POOL.close()
+    _PARSE_POOL.join()
+    _PARSE_POOL = None
+    # Remove spool files never consumed.
+    for result in _PARSE_RESULTS.values():
+        try:
+            parsed = result.get(0)
+        except Exception:
+            continue
+        if parsed and os.path.isfile(parsed[0]):
+            os.remove(parsed[0])
+    _PARSE_RESULTS.clear()
+
+
+def parsedFiles(jobs):
+    """For every job - a (fname, start, stop, parser, args) tuple - yield
+    a tuple with the file name and an iterator over the parsed items.
+    Files not already sent to the pool of processes by startParsing
+    are parsed here; unreadable files and files completed by a previous
+    run are skipped."""
+    for job in jobs:
+        fname, start, stop, parser, args = job
+        if stageDone(fname):
+            continue
+        result = _PARSE_RESULTS.pop(fname, None)
+        if result is not None:
+            # Using a timeout, get() can be interrupted by the user.
+            parsed = result.get(86400 * 7)
+            if parsed is None:
+                continue
+            spoolName, nrBytes = parsed
+            _STATS['inputBytes'] += nrBytes
+            if PROGRESS:
+                _PROGRESS.fileDone(os.path.getsize(os.path.join(IMDB_PTDF_DIR,
+                                                                fname)))
+            yield fname, _readSpool(spoolName)
+            continue
+        try:
+            fp = SourceFile(fname, start=start, stop=stop,
+                            chunkBy=_CHUNK_STARTS.get(parser, isChunkStart))
+        except IOError:
+            continue
+        yield fname, parser(fp, *args)
+        fp.close()
+
+
 # Functions used to manage data files.
 
 def readMovieList():
@@ -1482,22 +3179,18 @@ def readMovieList():
     mdbf.close()
 
 
-def doCast(fp, roleid, rolename):
-    """Populate the cast table."""
-    pid = None
-    count = 0
-    name = ''
-    roleidVal = RawValue('roleID', roleid)
-    sqldata = SQLData(table=CastInfo, cols=['personID', 'movieID',
-                        'personRoleID', 'note', 'nrOrder', roleidVal])
-    if rolename == 'miscellaneous crew': sqldata.flushEvery = 10000
+def castItems(fp):
+    """Parse the lines of a cast list, yielding a (name, title, role,
+    note, order) tuple for every role (None, if missing) of a person
+    in a title."""
+    name = None
     for line in fp:
         if line and line[0] != '\t':
             if line[0] == '\n': continue
             sl = filter(None, line.split('\t'))
             if len(sl) != 2: continue
             name, line = sl
-            pid = CACHE_PID.addUnique(name.strip())
+            name = name.strip()
         line = line.strip()
         ll = line.split('  ')
         title = ll[0]
@@ -1535,22 +3228,106 @@ def doCast(fp, roleid, rolename):
                                     ((long(os[1])-1) * 100) + (long(os[0])-1)
                         except ValueError:
                             pass
-        movieid = CACHE_MID.addUnique(title)
         if role is not None:
             roles = filter(None, [x.strip() for x in role.split('/')])
             for role in roles:
-                cid = CACHE_CID.addUnique(role)
-                sqldata.add((pid, movieid, cid, note, order))
+                yield (name, title, role, note, order)
+            if not roles:
+                # Still store the title in the cache.
+                yield (name, title, False, note, order)
         else:
+            yield (name, title, None, note, order)
+
+
+def doCast(items, roleid, rolename):
+    """Populate the cast table, with the (name, title, role, note, order)
+    tuples generated by castItems."""
+    pid = None
+    count = 0
+    lastName = None
+    roleidVal = RawValue('roleID', roleid)
+    sqldata = SQLData(table=CastInfo, cols=['personID', 'movieID',
+                        'personRoleID', 'note', 'nrOrder', roleidVal])
+    for name, title, role, note, order in items:
+        if name != lastName:
+            pid = CACHE_PID.addUnique(name)
+            lastName = name
+        movieid = CACHE_MID.addUnique(title)
+        if role:
+            cid = CACHE_CID.addUnique(role)
+            sqldata.add((pid, movieid, cid, note, order))
+        elif role is None:
             sqldata.add((pid, movieid, None, note, order))
         if count % 10000 == 0:
             print 'SCANNING %s:' % rolename,
-            print _(name)
+            print _(name or '')
         count += 1
     sqldata.flush()
     print 'CLOSING %s...' % rolename
 
 
+def _parseCastShard(job):
+    """Parse a shard of a cast list, storing the resulting items
+    in a temporary spool file; return its name."""
+    fname, begin, end = job
+    fp = open(fname, 'rb')
+    fp.seek(begin)
+    data = fp.read(end - begin)
+    fp.close()
+    return _spoolItems(castItems(StringIO(data)))
+
+
+def splitCastItems(fp):
+    """Like castItems, but the lines are copied in a temporary file,
+    split in shards (at the first line of a person) that are parsed by
+    the pool of processes returned by parsePool (shared with the files
+    parsed in advance); the items are yielded in the original order."""
+    fd, tmpName = tempfile.mkstemp(prefix='imdbpy2sql-', suffix='.cast')
+    tmp = os.fdopen(fd, 'wb')
+    shards = []
+    begin = pos = 0
+    try:
+        for line in fp:
+            if pos - begin >= CAST_SHARD_SIZE and \
+                    line[:1] not in ('\t', '\n') and \
+                    len(filter(None, line.split('\t'))) == 2:
+                shards.append((tmpName, begin, pos))
+                begin = pos
+            tmp.write(line)
+            pos += len(line)
+        tmp.close()
+    except:
+        tmp.close()
+        os.remove(tmpName)
+        raise
+    if pos > begin:
+        shards.append((tmpName, begin, pos))
+    print 'PARSING %d shards using %d processes...' % (len(shards), JOBS)
+    pool = parsePool()
+    results = [pool.apply_async(_parseCastShard, (shard,))
+                for shard in shards]
+    completed = False
+    try:
+        for result in results:
+            # Using a timeout, get() can be interrupted by the user.
+            for item in _readSpool(result.get(86400 * 7)):
+                yield item
+        completed = True
+    finally:
+        if not completed:
+            # Don't leave the pool busy parsing the other shards.
+            stopParsing(terminate=True)
+        # Remove spool files never consumed.
+        for result in results:
+            try:
+                spoolName = result.get(0)
+            except Exception:
+                continue
+            if os.path.isfile(spoolName):
+                os.remove(spoolName)
+        os.remove(tmpName)
+
+
 def castLists(_charIDsList=None):
     """Read files listed in the 'role' column of the 'roletypes' table."""
     # _charIDsList is a dirty hack to allow us to get rid of
@@ -1567,6 +3344,8 @@ def castLists(_charIDsList=None):
         if fname == 'actress': fname = 'actresses.list.gz'
         elif fname == 'miscellaneous-crew': fname = 'miscellaneous.list.gz'
         else: fname = fname + 's.list.gz'
+        if stageDone(fname):
+            continue
         print 'DOING', fname
         try:
             f = SourceFile(fname, start=CAST_START, stop=CAST_STOP)
@@ -1580,7 +3359,10 @@ def castLists(_charIDsList=None):
                     del _charIDsList
                     CACHE_CID.clear()
             continue
-        doCast(f, roleid, rolename)
+        if SPLIT_CAST:
+            doCast(splitCastItems(f), roleid, rolename)
+        else:
+            doCast(castItems(f), roleid, rolename)
         f.close()
         if rolename == 'actress':
             CACHE_CID.flush()
@@ -1591,6 +3373,7 @@ def castLists(_charIDsList=None):
                 del _charIDsList
                 CACHE_CID.clear()
         t('castLists(%s)' % rolename)
+        checkpoint(fname)
 
 
 def doAkaNames():
@@ -1640,10 +3423,13 @@ class AkasMoviesCache(MoviesCache):
         self.ids = {}
         self._table_name = tableName(AkaTitle)
         self._id_for_custom_q = 'AKAMOVIES'
+        self._lookupTable = None
         self.sqlstr, self.converter = createSQLstr(AkaTitle, ('id', 'movieID',
                             'title', 'imdbIndex', 'kindID', 'productionYear',
                             'phoneticCode', 'episodeOfID', 'seasonNr',
                             'episodeNr', 'note', 'md5sum'))
+        self.delSqlstr, self.delConverter = createDeleteSQLstr(AkaTitle,
+                                                    ('movieID', 'md5sum'))
 
     def flush(self, *args, **kwds):
         # Preserve consistency of ForeignKey.
@@ -1668,7 +3454,11 @@ class AkasMoviesCache(MoviesCache):
             new_item.append(md5sum)
             new_dataListapp(tuple(new_item))
         new_dataList.reverse()
-        if not CSV_DIR:
+        if INCR_PASS == 'delete':
+            # Remove the akas of the old data files.
+            CURS.executemany(self.delSqlstr, self.delConverter(
+                            [(x[1], x[-1]) for x in new_dataList]))
+        elif not CSV_DIR:
             CURS.executemany(self.sqlstr, self.converter(new_dataList))
         else:
             CSV_CURS.executemany(self.sqlstr, new_dataList)
@@ -1841,18 +3631,12 @@ def doMovieLinks():
     fp.close()
 
 
-def minusHashFiles(fp, funct, defaultid, descr):
+def minusHashFiles(items, defaultid, descr):
     """A file with lines starting with '# ' and '- '."""
     sqldata = SQLData(table=MovieInfo,
                         cols=['movieID', 'infoTypeID', 'info', 'note'])
-    sqldata.flushEvery = 2500
-    if descr == 'quotes': sqldata.flushEvery = 4000
-    elif descr == 'soundtracks': sqldata.flushEvery = 3000
-    elif descr == 'trivia': sqldata.flushEvery = 3000
     count = 0
-    for title, text in fp.getByHashSections():
-        title = title.strip()
-        d = funct(text.split('\n'))
+    for title, d in items:
         if not d:
             print 'WARNING skipping empty information about title:',
             print _(title)
@@ -1873,27 +3657,18 @@ def minusHashFiles(fp, funct, defaultid, descr):
 
 def doMinusHashFiles():
     """Files with lines starting with '# ' and '- '."""
-    for fname, start in [('alternate versions',AV_START),
-                         ('goofs',GOOFS_START), ('crazy credits',CC_START),
-                         ('quotes',QUOTES_START),
-                         ('soundtracks',SNDT_START),
-                         ('trivia',TRIV_START)]:
-        try:
-            fp = SourceFile(fname.replace(' ', '-')+'.list.gz', start=start,
-                        stop=MINHASH_STOP)
-        except IOError:
-            continue
-        funct = _parseMinusList
-        if fname == 'quotes': funct = getQuotes
-        index = fname
+    for fname, items in parsedFiles(MINUSHASH_JOBS):
+        descr = fname[:-8].replace('-', ' ')
+        index = descr
         if index == 'soundtracks': index = 'soundtrack'
-        minusHashFiles(fp, funct, INFO_TYPES[index], fname)
-        fp.close()
+        minusHashFiles(items, INFO_TYPES[index], descr)
+        checkpoint(fname)
 
 
 def getTaglines():
     """Movie's taglines."""
-    try: fp = SourceFile('taglines.list.gz', start=TAGL_START, stop=TAGL_STOP)
+    try: fp = SourceFile('taglines.list.gz', start=TAGL_START, stop=TAGL_STOP,
+                        chunkBy=isHashChunkStart)
     except IOError: return
     sqldata = SQLData(table=MovieInfo,
                 cols=['movieID', 'infoTypeID', 'info', 'note'],
@@ -2046,7 +3821,7 @@ def getMPAA(lines):
 
 re_nameImdbIndex = re.compile(r'\(([IVXLCDM]+)\)')
 
-def nmmvFiles(fp, funct, fname):
+def nmmvFiles(items, fname):
     """Files with sections separated by 'MV: ' or 'NM: '."""
     count = 0
     sqlsP = (PersonInfo, ['personID', 'infoTypeID', 'info', 'note'])
@@ -2069,17 +3844,11 @@ def nmmvFiles(fp, funct, fname):
         guestdata = None
         akanamesdata = None
     sqldata = SQLData(table=sqls[0], cols=sqls[1])
-    if fname == 'plot.list.gz': sqldata.flushEvery = 1100
-    elif fname == 'literature.list.gz': sqldata.flushEvery = 5000
-    elif fname == 'business.list.gz': sqldata.flushEvery = 10000
-    elif fname == 'biographies.list.gz': sqldata.flushEvery = 5000
     islaserdisc = False
     if fname == 'laserdisc.list.gz':
         islaserdisc = True
     _ltype = type([])
-    for ton, text in fp.getByNMMVSections():
-        ton = ton.strip()
-        if not ton: continue
+    for ton, d in items:
         note = None
         if datakind == 'movie':
             if islaserdisc:
@@ -2095,7 +3864,6 @@ def nmmvFiles(fp, funct, fname):
         if count % 6000 == 0:
             print 'SCANNING %s:' % fname[:-8].replace('-', ' '),
             print _(ton)
-        d = funct(text.split('\n'))
         for k, v in d.iteritems():
             if k != 'notable tv guest appearances':
                 theid = INFO_TYPES.get(k)
@@ -2296,23 +4064,10 @@ def _parseBiography(biol):
 
 def doNMMVFiles():
     """Files with large sections, about movies and persons."""
-    for fname, start, funct in [
-            ('biographies.list.gz', BIO_START, _parseBiography),
-            ('business.list.gz', BUS_START, getBusiness),
-            ('laserdisc.list.gz', LSD_START, getLaserDisc),
-            ('literature.list.gz', LIT_START, getLiterature),
-            ('mpaa-ratings-reasons.list.gz', MPAA_START, getMPAA),
-            ('plot.list.gz', PLOT_START, getPlot)]:
-    ##for fname, start, funct in [('business.list.gz',BUS_START,getBusiness)]:
-        try:
-            fp = SourceFile(fname, start=start)
-        except IOError:
-            continue
-        if fname == 'literature.list.gz': fp.set_stop(LIT_STOP)
-        elif fname == 'business.list.gz': fp.set_stop(BUS_STOP)
-        nmmvFiles(fp, funct, fname)
-        fp.close()
+    for fname, items in parsedFiles(NMMV_JOBS):
+        nmmvFiles(items, fname)
         t('doNMMVFiles(%s)' % fname[:-8].replace('-', ' '))
+        checkpoint(fname)
 
 
 def doMovieCompaniesInfo():
@@ -2320,57 +4075,28 @@ def doMovieCompaniesInfo():
     concerning companies."""
     sqldata = SQLData(table=MovieCompanies,
                 cols=['movieID', 'companyID', 'companyTypeID', 'note'])
-    for dataf in (('distributors.list.gz', DIS_START),
-                    ('miscellaneous-companies.list.gz', MIS_START),
-                    ('production-companies.list.gz', PRO_START),
-                    ('special-effects-companies.list.gz', SFX_START)):
-        try:
-            fp = SourceFile(dataf[0], start=dataf[1])
-        except IOError:
-            continue
-        typeindex = dataf[0][:-8].replace('-', ' ')
+    for fname, items in parsedFiles(COMPANIES_JOBS):
+        typeindex = fname[:-8].replace('-', ' ')
         infoid =  COMP_TYPES[typeindex]
         count = 0
-        for line in fp:
-            data = unpack(line.strip(), ('title', 'company', 'note'))
-            if 'title' not in data: continue
-            if 'company' not in data: continue
-            title = data['title']
-            company = data['company']
+        for title, company, note in items:
             mid = CACHE_MID.addUnique(title)
             cid = CACHE_COMPID.addUnique(company)
-            note = None
-            if 'note' in data:
-                note = data['note']
             if count % 10000 == 0:
-                print 'SCANNING %s:' % dataf[0][:-8].replace('-', ' '),
-                print _(data['title'])
+                print 'SCANNING %s:' % typeindex,
+                print _(title)
             sqldata.add((mid, cid, infoid, note))
             count += 1
         sqldata.flush()
         CACHE_COMPID.flush()
-        fp.close()
-        t('doMovieCompaniesInfo(%s)' % dataf[0][:-8].replace('-', ' '))
+        t('doMovieCompaniesInfo(%s)' % typeindex)
+        checkpoint(fname)
 
 
 def doMiscMovieInfo():
     """Files with information on a single line about movies."""
-    for dataf in (('certificates.list.gz',CER_START),
-                    ('color-info.list.gz',COL_START),
-                    ('countries.list.gz',COU_START),
-                    ('genres.list.gz',GEN_START),
-                    ('keywords.list.gz',KEY_START),
-                    ('language.list.gz',LAN_START),
-                    ('locations.list.gz',LOC_START),
-                    ('running-times.list.gz',RUN_START),
-                    ('sound-mix.list.gz',SOU_START),
-                    ('technical.list.gz',TCN_START),
-                    ('release-dates.list.gz',RELDATE_START)):
-        try:
-            fp = SourceFile(dataf[0], start=dataf[1])
-        except IOError:
-            continue
-        typeindex = dataf[0][:-8].replace('-', ' ')
+    for fname, items in parsedFiles(MISC_INFO_JOBS):
+        typeindex = fname[:-8].replace('-', ' ')
         if typeindex == 'running times': typeindex = 'runtimes'
         elif typeindex == 'technical': typeindex = 'tech info'
         elif typeindex == 'language': typeindex = 'languages'
@@ -2382,23 +4108,11 @@ def doMiscMovieInfo():
                         cols=['movieID', 'keywordID'])
         infoid =  INFO_TYPES[typeindex]
         count = 0
-        if dataf[0] == 'locations.list.gz':
-            sqldata.flushEvery = 10000
-        else:
-            sqldata.flushEvery = 20000
-        for line in fp:
-            data = unpack(line.strip(), ('title', 'info', 'note'))
-            if 'title' not in data: continue
-            if 'info' not in data: continue
-            title = data['title']
+        for title, info, note in items:
             mid = CACHE_MID.addUnique(title)
-            note = None
-            if 'note' in data:
-                note = data['note']
             if count % 10000 == 0:
-                print 'SCANNING %s:' % dataf[0][:-8].replace('-', ' '),
-                print _(data['title'])
-            info = data['info']
+                print 'SCANNING %s:' % fname[:-8].replace('-', ' '),
+                print _(title)
             if typeindex == 'keywords':
                 keywordID = CACHE_KWRDID.addUnique(info)
                 sqldata.add((mid, keywordID))
@@ -2409,18 +4123,73 @@ def doMiscMovieInfo():
         if typeindex == 'keywords':
             CACHE_KWRDID.flush()
             CACHE_KWRDID.clear()
-        fp.close()
-        t('doMiscMovieInfo(%s)' % dataf[0][:-8].replace('-', ' '))
+        t('doMiscMovieInfo(%s)' % fname[:-8].replace('-', ' '))
+        checkpoint(fname)
+
+
+# Sections of the ratings.list.gz file: info type of the rank (None
+# for the ratings report), start and stop markers, and chunks compared
+# in an incremental import (ranks depend on the position: every list
+# is a single chunk).
+RAT_SECTIONS = (('top 250 rank', RAT_TOP250_START, TOPBOT_STOP, None),
+                ('bottom 10 rank', RAT_BOT10_START, TOPBOT_STOP, None),
+                (None, RAT_START, RAT_STOP, isLineChunkStart))
+
+
+def ratingLines():
+    """Yield (section, line) tuples for the lines of the sections
+    of the ratings.list.gz file (see RAT_SECTIONS), reading it
+    in a single pass."""
+    if INCR_PASS is not None:
+        # The chunks of every section are compared on their own.
+        for section, start, stop, chunkBy in RAT_SECTIONS:
+            try: fp = SourceFile('ratings.list.gz', start=start, stop=stop,
+                                chunkBy=chunkBy)
+            except IOError: return
+            for line in fp:
+                yield section, line
+            fp.close()
+        return
+    try: fp = SourceFile('ratings.list.gz')
+    except IOError: return
+    # Sections still looking for their start markers (and the number of
+    # markers already found), and sections being read.
+    pending = [[section, start, 0, stop]
+                for section, start, stop, chunkBy in RAT_SECTIONS]
+    active = []
+    for line in fp:
+        for item in active[:]:
+            stop = item[3]
+            if line[:len(stop)] == stop:
+                active.remove(item)
+            else:
+                yield item[0], line
+        for item in pending[:]:
+            start = item[1][item[2]]
+            if line[:len(start)] == start:
+                item[2] += 1
+                if item[2] == len(item[1]):
+                    pending.remove(item)
+                    active.append(item)
+        if not (active or pending):
+            break
+    fp.close()
 
 
 def getRating():
-    """Movie's rating."""
-    try: fp = SourceFile('ratings.list.gz', start=RAT_START, stop=RAT_STOP)
-    except IOError: return
+    """Movie's rating, and top 250 and bottom 10 ranks."""
     sqldata = SQLData(table=MovieInfoIdx, cols=['movieID', 'infoTypeID',
                                                 'info', 'note'])
+    # Ranks are stored after the ratings, as they come first in the file.
+    ranks = {'top 250 rank': [], 'bottom 10 rank': []}
     count = 0
-    for line in fp:
+    for section, line in ratingLines():
+        if section is not None:
+            data = unpack(line, ('votes distribution', 'votes', 'rank',
+                                'title'), sep='  ')
+            if 'title' not in data: continue
+            ranks[section].append(data['title'].strip())
+            continue
         data = unpack(line, ('votes distribution', 'votes', 'rating', 'title'),
                         sep='  ')
         if 'title' not in data: continue
@@ -2434,34 +4203,19 @@ def getRating():
         sqldata.add((mid, INFO_TYPES['rating'], data.get('rating'), None))
         count += 1
     sqldata.flush()
-    fp.close()
-
-
-def getTopBottomRating():
-    """Movie's rating, scanning for top 250 and bottom 10."""
     for what in ('top 250 rank', 'bottom 10 rank'):
-        if what == 'top 250 rank': st = RAT_TOP250_START
-        else: st = RAT_BOT10_START
-        try: fp = SourceFile('ratings.list.gz', start=st, stop=TOPBOT_STOP)
-        except IOError: break
+        if not ranks[what]: continue
         sqldata = SQLData(table=MovieInfoIdx,
                     cols=['movieID',
                         RawValue('infoTypeID', INFO_TYPES[what]),
                         'info', 'note'])
-        count = 1
         print 'SCANNING %s...' % what
-        for line in fp:
-            data = unpack(line, ('votes distribution', 'votes', 'rank',
-                                'title'), sep='  ')
-            if 'title' not in data: continue
-            title = data['title'].strip()
+        for count, title in enumerate(ranks[what]):
             mid = CACHE_MID.addUnique(title)
-            if what == 'top 250 rank': rank = count
-            else: rank = 11 - count
+            if what == 'top 250 rank': rank = count + 1
+            else: rank = 10 - count
             sqldata.add((mid, str(rank), None))
-            count += 1
         sqldata.flush()
-        fp.close()
 
 
 def getPlot(lines):
@@ -2513,6 +4267,65 @@ def completeCast():
         sqldata.flush()
 
 
+# Files parsed by the parsedFiles function, as
+# (fname, start, stop, parser, parserArgs) tuples.
+_COMPANIES_HEADERS = ('title', 'company', 'note')
+COMPANIES_JOBS = [
+    ('distributors.list.gz', DIS_START, None, _unpackLines,
+        (_COMPANIES_HEADERS,)),
+    ('miscellaneous-companies.list.gz', MIS_START, None, _unpackLines,
+        (_COMPANIES_HEADERS,)),
+    ('production-companies.list.gz', PRO_START, None, _unpackLines,
+        (_COMPANIES_HEADERS,)),
+    ('special-effects-companies.list.gz', SFX_START, None, _unpackLines,
+        (_COMPANIES_HEADERS,))]
+
+MINUSHASH_JOBS = [
+    ('alternate-versions.list.gz', AV_START, MINHASH_STOP,
+        _hashSectionsItems, (_parseMinusList,)),
+    ('goofs.list.gz', GOOFS_START, MINHASH_STOP,
+        _hashSectionsItems, (_parseMinusList,)),
+    ('crazy-credits.list.gz', CC_START, MINHASH_STOP,
+        _hashSectionsItems, (_parseMinusList,)),
+    ('quotes.list.gz', QUOTES_START, MINHASH_STOP,
+        _hashSectionsItems, (getQuotes,)),
+    ('soundtracks.list.gz', SNDT_START, MINHASH_STOP,
+        _hashSectionsItems, (_parseMinusList,)),
+    ('trivia.list.gz', TRIV_START, MINHASH_STOP,
+        _hashSectionsItems, (_parseMinusList,))]
+
+NMMV_JOBS = [
+    ('biographies.list.gz', BIO_START, None,
+        _nmmvSectionsItems, (_parseBiography,)),
+    ('business.list.gz', BUS_START, BUS_STOP,
+        _nmmvSectionsItems, (getBusiness,)),
+    ('laserdisc.list.gz', LSD_START, None,
+        _nmmvSectionsItems, (getLaserDisc,)),
+    ('literature.list.gz', LIT_START, LIT_STOP,
+        _nmmvSectionsItems, (getLiterature,)),
+    ('mpaa-ratings-reasons.list.gz', MPAA_START, None,
+        _nmmvSectionsItems, (getMPAA,)),
+    ('plot.list.gz', PLOT_START, None,
+        _nmmvSectionsItems, (getPlot,))]
+
+_MISC_INFO_HEADERS = ('title', 'info', 'note')
+MISC_INFO_JOBS = []
+for _fname, _start in (('certificates.list.gz', CER_START),
+                    ('color-info.list.gz', COL_START),
+                    ('countries.list.gz', COU_START),
+                    ('genres.list.gz', GEN_START),
+                    ('keywords.list.gz', KEY_START),
+                    ('language.list.gz', LAN_START),
+                    ('locations.list.gz', LOC_START),
+                    ('running-times.list.gz', RUN_START),
+                    ('sound-mix.list.gz', SOU_START),
+                    ('technical.list.gz', TCN_START),
+                    ('release-dates.list.gz', RELDATE_START)):
+    MISC_INFO_JOBS.append((_fname, _start, None, _unpackLines,
+                            (_MISC_INFO_HEADERS,)))
+del _fname, _start
+
+
 # global instances
 CACHE_MID = MoviesCache()
 CACHE_PID = PersonsCache()
@@ -2559,28 +4372,23 @@ def readConstants():
         COMP_TYPES[x.kind] = x.id
 
 
-def notNULLimdbID(cls):
+def _imdbIDClass(cls):
+    """Return the cache and the plural name for a class."""
+    if cls is Title: return CACHE_MID, 'movies'
+    elif cls is Name: return CACHE_PID, 'people'
+    elif cls is CompanyName: return CACHE_COMPID, 'companies'
+    return CACHE_CID, 'characters'
+
+
+def _slowNotNULLimdbID(cls):
     """Return a list of dictionaries for titles or names for which an
-    imdbID is present in the database."""
-    if cls is Title: cname = 'movies'
-    elif cls is Name: cname = 'people'
-    elif cls is CompanyName: cname = 'companies'
-    else: cname = 'characters'
-    print 'SAVING imdbID values for %s...' % cname,
-    sys.stdout.flush()
-    try:
-        tons = cls.select(ISNOTNULL(cls.q.imdbID))
-    except:
-        print 'SKIPPING: no data.'
-        return []
+    imdbID is present in the database; used for databases created by
+    older versions, without the md5sum column."""
+    tons = cls.select(ISNOTNULL(cls.q.imdbID))
     results = []
     _kdict = {}
-    try:
-        for x in KindType.select():
-            _kdict[x.id] = x.kind
-    except:
-        print 'SKIPPING: no data.'
-        return []
+    for x in KindType.select():
+        _kdict[x.id] = x.kind
     for t in tons:
         if cls is Title:
             # imdb.parser.sql is not initialized, and we need
@@ -2598,55 +4406,178 @@ def notNULLimdbID(cls):
                 md['imdbIndex'] = t.imdbIndex
         md['imdbID'] = t.imdbID
         results.append(md)
-    print 'DONE! (%d entries)' % len(results)
     return results
 
 
-def restoreImdbID(tons, cls):
-    """Restore imdbID for movies, people, companies and characters."""
-    if cls is Title:
-        CACHE = CACHE_MID
-        cname = 'movies'
-    elif cls is Name:
-        CACHE = CACHE_PID
-        cname = 'people'
-    elif cls is CompanyName:
-        CACHE = CACHE_COMPID
-        cname = 'companies'
-    else:
-        CACHE = CACHE_CID
-        cname = 'characters'
-    print 'RESTORING imdbID values for %s...' % cname,
+def notNULLimdbID(cls):
+    """Return a list of (md5sum, imdbID) tuples for titles or names
+    for which an imdbID is present in the database."""
+    cname = _imdbIDClass(cls)[1]
+    print 'SAVING imdbID values for %s...' % cname,
     sys.stdout.flush()
-    count = 0
+    imdbIDCol = colName(cls, 'imdbID')
+    try:
+        CURS.execute('SELECT %s, %s FROM %s WHERE %s IS NOT NULL '
+                    'AND %s IS NOT NULL;' % (colName(cls, 'md5sum'),
+                    imdbIDCol, tableName(cls), imdbIDCol,
+                    colName(cls, 'md5sum')))
+        results = [(str(x[0]), int(x[1])) for x in CURS.fetchall()]
+    except Exception:
+        # No data, or a table without the md5sum column.
+        try: connectObject.rollback()
+        except Exception: pass
+        try:
+            results = _slowNotNULLimdbID(cls)
+        except:
+            print 'SKIPPING: no data.'
+            return []
+    print 'DONE! (%d entries)' % len(results)
+    return results
+
+
+def _imdbIDPairs(tons, cls):
+    """Return a dictionary md5sum:imdbID; tons can be a list of
+    (md5sum, imdbID) tuples or a list of dictionaries, as returned
+    by older versions of notNULLimdbID."""
+    pairs = {}
     for t in tons:
+        if isinstance(t, tuple):
+            pairs[t[0]] = t[1]
+            continue
         if cls is Title:
             t_str = build_title(t, ptdf=1)
         elif cls is CompanyName:
             t_str = build_company_name(t)
         else:
             t_str = build_name(t)
-        t_str = t_str.encode('utf_8')
-        if CSV_ONLY_LOAD:
-            # Big assumption: that we're running
-            # --csv-only-load on the same set of data/db...
-            db_mopID = t['imdbID']
-        else:
-            db_mopID = CACHE.get(t_str)
-        #print 'DEBUG: %s' % t_str, db_mopID
-        if db_mopID is None:
+        pairs[md5(t_str.encode('utf_8')).hexdigest()] = t['imdbID']
+    return pairs
+
+
+def restoreImdbID(tons, cls):
+    """Restore imdbID for movies, people, companies and characters.
+    The saved values are stored in a temporary table, and applied with
+    a single UPDATE joined on the md5sum column."""
+    CACHE, cname = _imdbIDClass(cls)
+    print 'RESTORING imdbID values for %s...' % cname,
+    sys.stdout.flush()
+    if not tons:
+        print 'DONE! (restored 0 entries out of 0)'
+        return
+    if not CSV_DIR:
+        # Every key must be in the database, to be matched.
+        CACHE.flush(quiet=1)
+    pairs = _imdbIDPairs(tons, cls)
+    tmpTable = 'imdbpy_restore_imdbid'
+    table = tableName(cls)
+    imdbIDCol = colName(cls, 'imdbID')
+    md5Col = colName(cls, 'md5sum')
+    try: CURS.execute('DROP TABLE %s;' % tmpTable)
+    except Exception:
+        try: connectObject.rollback()
+        except Exception: pass
+    CURS.execute('CREATE TABLE %s (md5sum CHAR(32) NOT NULL, '
+                'imdb_id INTEGER NOT NULL);' % tmpTable)
+    insert = 'INSERT INTO %s (md5sum, imdb_id) VALUES (%s, %s);' % \
+            (tmpTable, _valStr('md5sum', 1), _valStr('imdb_id', 2))
+    if DB_NAME not in ('mysql', 'postgres') and \
+            PARAM_STYLE in ('named', 'pyformat'):
+        converter = _makeConvNamed(['md5sum', 'imdb_id'])
+    else:
+        converter = lambda x: x
+    # Not written with writeBatches: it's not data of the import.
+    pairs = pairs.items()
+    for pos in xrange(0, len(pairs), 10000):
+        CURS.executemany(insert, converter(pairs[pos:pos + 10000]))
+    CURS.execute('CREATE INDEX %s_md5sum_idx ON %s (md5sum);' % (tmpTable,
+                tmpTable))
+    if DB_NAME == 'mysql':
+        CURS.execute('UPDATE %s, %s SET %s.%s = %s.imdb_id '
+                    'WHERE %s.%s = %s.md5sum;' % (table, tmpTable, table,
+                    imdbIDCol, tmpTable, table, md5Col, tmpTable))
+    elif DB_NAME == 'postgres':
+        CURS.execute('UPDATE %s SET %s = %s.imdb_id FROM %s '
+                    'WHERE %s.%s = %s.md5sum;' % (table, imdbIDCol, tmpTable,
+                    tmpTable, table, md5Col, tmpTable))
+    else:
+        CURS.execute('UPDATE %s SET %s = (SELECT imdb_id FROM %s '
+                    'WHERE %s.md5sum = %s.%s) WHERE %s IN '
+                    '(SELECT md5sum FROM %s);' % (table, imdbIDCol, tmpTable,
+                    tmpTable, table, md5Col, md5Col, tmpTable))
+    count = CURS.rowcount
+    if count is None or count < 0:
+        # Some drivers don't report the number of updated rows.
+        CURS.execute('SELECT COUNT(*) FROM %s, %s WHERE %s.%s = %s.md5sum;' %
+                    (table, tmpTable, table, md5Col, tmpTable))
+        count = CURS.fetchone()[0]
+    CURS.execute('DROP TABLE %s;' % tmpTable)
+    connectObject.commit()
+    print 'DONE! (restored %d entries out of %d)' % (count, len(tons))
+
+
+def _hasTrigrams():
+    """Return True if the trigrams tables contain some data."""
+    for table in TRIGRAM_TABLES:
+        if table not in DB_TABLES:
             continue
-        try:
-            mop_in_db = cls.get(db_mopID)
+        CURS.execute('SELECT MIN(%s) FROM %s;' % (colName(table, 'id'),
+                                                tableName(table)))
+        if CURS.fetchone()[0] is not None:
+            return True
+    return False
+
+
+def buildTrigrams():
+    """Store in the TitleTrigram and NameTrigram tables the trigrams of
+    the titles and names (and of their AKAs), used by the "sql" data
+    access system to pre-rank the candidates of a search."""
+    for trgTable, table, akaTable, col, fk in (
+                (TitleTrigram, Title, AkaTitle, 'title', 'movieID'),
+                (NameTrigram, Name, AkaName, 'name', 'personID')):
+        print 'BUILDING the trigrams of %s...' % tableName(table),
+        sys.stdout.flush()
+        CURS.execute('DELETE FROM %s;' % tableName(trgTable))
+        # The AKAs are merged with the main entry, so that every trigram
+        # is stored once for every movie or person.
+        akas = {}
+        CURS.execute('SELECT %s, %s FROM %s;' % (colName(akaTable, fk),
+                    colName(akaTable, col), tableName(akaTable)))
+        for mainID, aka in CURS.fetchall():
+            akas.setdefault(mainID, []).append(aka)
+        sqlstr, converter = createSQLstr(trgTable, [fk, 'trigram',
+                                        'nrTrigrams'])
+        keys = {'table': tableName(trgTable)}
+        def _write(rows):
+            executeCustomQueries('BEFORE_SQLDATA_TODB', _keys=keys,
+                                _timeit=False)
             try:
-                mop_in_db.imdbID = t['imdbID']
-            except Exception, e:
-                print 'WARNING: error writing imdbID: %s' % e
-                continue
-        except NotFoundError:
-            continue
-        count += 1
-    print 'DONE! (restored %d entries out of %d)' % (count, len(tons))
+                CURS.executemany(sqlstr, converter(rows))
+            finally:
+                executeCustomQueries('AFTER_SQLDATA_TODB', _keys=keys,
+                                    _timeit=False)
+        batch = batchSize(tableName(trgTable), 10000)
+        idCol = colName(table, 'id')
+        CURS.execute('SELECT MAX(%s) FROM %s;' % (idCol, tableName(table)))
+        maxID = CURS.fetchone()[0] or 0
+        count = 0
+        # The entries are read in ranges of IDs, so that no query is
+        # left open while the trigrams are written.
+        for firstID in xrange(1, maxID + 1, TRIGRAMS_RANGE):
+            CURS.execute('SELECT %s, %s FROM %s WHERE %s >= %d AND %s < %d;' %
+                        (idCol, colName(table, col), tableName(table), idCol,
+                        firstID, idCol, firstID + TRIGRAMS_RANGE))
+            rows = []
+            for mainID, s in CURS.fetchall():
+                trgs = trigrams(s)
+                for aka in akas.get(mainID, ()):
+                    trgs.update(trigrams(aka))
+                nrTrigrams = len(trgs)
+                rows.extend([(mainID, trg, nrTrigrams)
+                            for trg in sorted(trgs)])
+            writeBatches(batch, rows, _write, tableName(trgTable))
+            count += len(rows)
+        connectObject.commit()
+        print 'DONE! (%d trigrams)' % count
 
 
 def runSafely(funct, fmsg, default, *args, **kwds):
@@ -2661,32 +4592,34 @@ def runSafely(funct, fmsg, default, *args, **kwds):
     return default
 
 
-def _executeQuery(query):
-    """Execute a query on the CURS object."""
+def _executeQuery(query, _cursor=None):
+    """Execute a query on the CURS object (or on the given cursor)."""
     print 'EXECUTING "%s"...' % (query),
     sys.stdout.flush()
     try:
-        CURS.execute(query)
+        (_cursor or CURS).execute(query)
         print 'DONE!'
     except Exception, e:
         print 'FAILED (%s)!' % e
 
 
-def executeCustomQueries(when, _keys=None, _timeit=True):
-    """Run custom queries as specified on the command line."""
+def executeCustomQueries(when, _keys=None, _timeit=True, _cursor=None):
+    """Run custom queries as specified on the command line (using
+    the CURS object or the given cursor)."""
     if _keys is None: _keys = {}
     for query in CUSTOM_QUERIES.get(when, []):
         print 'EXECUTING "%s:%s"...' % (when, query)
         sys.stdout.flush()
         if query.startswith('FOR_EVERY_TABLE:'):
             query = query[16:]
-            CURS.execute('SHOW TABLES;')
-            tables = [x[0] for x in CURS.fetchall()]
+            cursor = _cursor or CURS
+            cursor.execute('SHOW TABLES;')
+            tables = [x[0] for x in cursor.fetchall()]
             for table in tables:
                 try:
                     keys = {'table': table}
                     keys.update(_keys)
-                    _executeQuery(query % keys)
+                    _executeQuery(query % keys, _cursor)
                     if _timeit:
                         t('%s command' % when)
                 except Exception, e:
@@ -2694,7 +4627,7 @@ def executeCustomQueries(when, _keys=None, _timeit=True):
                     continue
         else:
             try:
-                _executeQuery(query % _keys)
+                _executeQuery(query % _keys, _cursor)
             except Exception, e:
                 print 'FAILED (%s)!' % e
                 continue
@@ -2726,22 +4659,163 @@ def unpickle_ids(fname):
 def buildIndexesAndFK():
     """Build indexes and Foreign Keys."""
     executeCustomQueries('BEFORE_INDEXES')
+    tables = DB_TABLES
+    if INDEX_JOBS > 1:
+        # Start with the largest tables.
+        maxIDs = runSafely(_maxIDs, 'failed to read the size of the tables',
+                            {})
+        tables = list(DB_TABLES)
+        tables.sort(key=lambda x: maxIDs.get(tableName(x), 0), reverse=True)
     print 'building database indexes (this may take a while)'
+    if INDEX_JOBS > 1:
+        print ' * USING %d connections, starting from the largest tables' % \
+                INDEX_JOBS
     sys.stdout.flush()
     # Build database indexes.
-    idx_errors = createIndexes(DB_TABLES)
+    idx_errors = createIndexes(tables, jobs=INDEX_JOBS)
     for idx_error in idx_errors:
         print 'ERROR caught exception creating an index: %s' % idx_error
     t('createIndexes()')
     print 'adding foreign keys (this may take a while)'
     sys.stdout.flush()
     # Add FK.
-    fk_errors = createForeignKeys(DB_TABLES)
+    fk_errors = createForeignKeys(tables, jobs=INDEX_JOBS)
     for fk_error in fk_errors:
         print 'ERROR caught exception creating a foreign key: %s' % fk_error
     t('createForeignKeys()')
 
 
+# Stages completed by a previous run (with --resume), and state
+# of the import saved at the last checkpoint.
+_DONE_STAGES = []
+_CHECKPOINT = {}
+_SAVED_CACHES = {}
+
+def _checkpointCaches():
+    """Return a list of (label, cache) tuples, for the caches whose
+    content is saved at every checkpoint."""
+    return [('movies', CACHE_MID), ('people', CACHE_PID),
+            ('characters', CACHE_CID), ('companies', CACHE_COMPID),
+            ('keywords', CACHE_KWRDID), ('akas', CACHE_MID_AKAS)]
+
+
+def _maxIDs():
+    """Return a dictionary with the highest ID of every table."""
+    maxIDs = {}
+    for table in DB_TABLES:
+        CURS.execute('SELECT MAX(%s) FROM %s;' % (colName(table, 'id'),
+                                                tableName(table)))
+        maxIDs[tableName(table)] = CURS.fetchone()[0] or 0
+    return maxIDs
+
+
+def stageDone(stage):
+    """Return True if the given stage was completed by a previous run."""
+    if stage in _DONE_STAGES:
+        print 'SKIPPING %s: completed by a previous run.' % stage
+        return True
+    return False
+
+
+def checkpoint(stage, imdbIDs=None):
+    """Record that a stage is completed, saving the state needed to
+    resume the import from the next one; imdbIDs, if present, is saved
+    too and returned by resumeCheckpoint."""
+    if not CHECKPOINT_FILE:
+        return
+    _DONE_STAGES.append(stage)
+    caches = _checkpointCaches()
+    for label, cache in caches:
+        cache.flush(quiet=1)
+    counters = _CHECKPOINT.setdefault('counters', {})
+    for label, cache in caches:
+        nextValue = cache.counter.next()
+        cache.counter = counter(nextValue)
+        fname = '%s.%s' % (CHECKPOINT_FILE, label)
+        if not getattr(cache, 'persistent', False):
+            # Write the entries only if something has changed.
+            signature = (nextValue, len(cache))
+            if _SAVED_CACHES.get(label) == signature:
+                counters[label] = nextValue
+                continue
+            _SAVED_CACHES[label] = signature
+        counters[label] = cache.saveState(fname)
+    if imdbIDs is not None:
+        fd = open(CHECKPOINT_FILE + '.imdbIDs', 'wb')
+        pickle.dump(imdbIDs, fd, pickle.HIGHEST_PROTOCOL)
+        fd.close()
+    if CSV_DIR:
+        _CHECKPOINT['csv'] = CSV_CURS.getState()
+    if SQLITE_FAST:
+        # The flushed caches must be stored before the checkpoint.
+        connectObject.commitStage()
+    else:
+        connectObject.commit()
+    _CHECKPOINT['maxIDs'] = _maxIDs()
+    _CHECKPOINT['stages'] = _DONE_STAGES
+    fd = open(CHECKPOINT_FILE + '.tmp', 'wb')
+    pickle.dump(_CHECKPOINT, fd, pickle.HIGHEST_PROTOCOL)
+    fd.close()
+    if os.path.exists(CHECKPOINT_FILE):
+        os.remove(CHECKPOINT_FILE)
+    os.rename(CHECKPOINT_FILE + '.tmp', CHECKPOINT_FILE)
+
+
+def resumeCheckpoint():
+    """Restore the state saved at the last checkpoint of a previous run;
+    data stored after that are removed.  The saved imdbIDs are returned
+    (None, if there's nothing to resume)."""
+    if not os.path.isfile(CHECKPOINT_FILE):
+        print 'NOTICE: no checkpoint in %s; starting from scratch.' % \
+                CHECKPOINT_FILE
+        return None
+    print 'RESUMING from the checkpoint in %s...' % CHECKPOINT_FILE,
+    sys.stdout.flush()
+    fd = open(CHECKPOINT_FILE, 'rb')
+    state = pickle.load(fd)
+    fd.close()
+    _CHECKPOINT.update(state)
+    _DONE_STAGES[:] = state['stages']
+    for label, cache in _checkpointCaches():
+        if label in state['counters']:
+            cache.loadState('%s.%s' % (CHECKPOINT_FILE, label),
+                            state['counters'][label])
+    if CSV_DIR:
+        CSV_CURS.resume(state['csv'])
+    for table in DB_TABLES:
+        maxID = state['maxIDs'].get(tableName(table), 0)
+        CURS.execute('DELETE FROM %s WHERE %s > %d;' % (tableName(table),
+                                                colName(table, 'id'), maxID))
+    connectObject.commit()
+    imdbIDs = None
+    if os.path.isfile(CHECKPOINT_FILE + '.imdbIDs'):
+        fd = open(CHECKPOINT_FILE + '.imdbIDs', 'rb')
+        imdbIDs = pickle.load(fd)
+        fd.close()
+    print 'DONE! (%d completed stages)' % len(_DONE_STAGES)
+    return imdbIDs
+
+
+def removeCheckpoint():
+    """Remove the checkpoint files, at the end of the import."""
+    if not CHECKPOINT_FILE:
+        return
+    for suffix in [''] + ['.%s' % x[0] for x in _checkpointCaches()] + \
+            ['.imdbIDs']:
+        if os.path.isfile(CHECKPOINT_FILE + suffix):
+            os.remove(CHECKPOINT_FILE + suffix)
+
+
+def runStage(stage, funct, *args, **kwds):
+    """Run the funct function as a stage of the import, unless it was
+    completed by a previous run; then record a checkpoint."""
+    if stageDone(stage):
+        return
+    funct(*args, **kwds)
+    t(stage)
+    checkpoint(stage)
+
+
 def restoreCSV():
     """Only restore data from a set of CSV files."""
     movies_imdbIDs = unpickle_ids('movies_imdbIDs.pkl')
@@ -2771,50 +4845,74 @@ def restoreCSV():
 # begin the iterations...
 def run():
     print 'RUNNING imdbpy2sql.py using the %s ORM' % USED_ORM
+    if SKIPPED_FILES:
+        print 'SKIPPING the data files: %s' % ', '.join(sorted(SKIPPED_FILES))
 
     executeCustomQueries('BEGIN')
 
-    # Storing imdbIDs for movies and persons.
-    movies_imdbIDs = runSafely(notNULLimdbID,
+    imdbIDs = None
+    if RESUME:
+        imdbIDs = resumeCheckpoint()
+    if imdbIDs is not None:
+        movies_imdbIDs, people_imdbIDs, characters_imdbIDs, \
+                companies_imdbIDs = imdbIDs
+    del imdbIDs
+
+    if not stageDone('createTables'):
+        # Storing imdbIDs for movies and persons.
+        movies_imdbIDs = runSafely(notNULLimdbID,
                                 'failed to read imdbIDs for movies', [], Title)
-    people_imdbIDs = runSafely(notNULLimdbID,
+        people_imdbIDs = runSafely(notNULLimdbID,
                                 'failed to read imdbIDs for people', [], Name)
-    characters_imdbIDs = runSafely(notNULLimdbID,
+        characters_imdbIDs = runSafely(notNULLimdbID,
                                 'failed to read imdbIDs for characters', [],
                                 CharName)
-    companies_imdbIDs = runSafely(notNULLimdbID,
+        companies_imdbIDs = runSafely(notNULLimdbID,
                                 'failed to read imdbIDs for companies', [],
                                 CompanyName)
-    if CSV_DIR:
-        pickle_ids(movies_imdbIDs, 'movies_imdbIDs.pkl')
-        pickle_ids(people_imdbIDs, 'people_imdbIDs.pkl')
-        pickle_ids(characters_imdbIDs, 'characters_imdbIDs.pkl')
-        pickle_ids(companies_imdbIDs, 'companies_imdbIDs.pkl')
-
-    # Truncate the current database.
-    print 'DROPPING current database...',
-    sys.stdout.flush()
-    dropTables(DB_TABLES)
-    print 'DONE!'
+        if CSV_DIR:
+            pickle_ids(movies_imdbIDs, 'movies_imdbIDs.pkl')
+            pickle_ids(people_imdbIDs, 'people_imdbIDs.pkl')
+            pickle_ids(characters_imdbIDs, 'characters_imdbIDs.pkl')
+            pickle_ids(companies_imdbIDs, 'companies_imdbIDs.pkl')
+
+        # Truncate the current database.
+        print 'DROPPING current database...',
+        sys.stdout.flush()
+        # The trigrams of a previous import are removed, even if they're
+        # not built again.
+        dropTables(DB_TABLES + [x for x in TRIGRAM_TABLES
+                                if x not in DB_TABLES])
+        print 'DONE!'
 
-    executeCustomQueries('BEFORE_CREATE')
-    # Rebuild the database structure.
-    print 'CREATING new tables...',
-    sys.stdout.flush()
-    createTables(DB_TABLES)
-    print 'DONE!'
-    t('dropping and recreating the database')
-    executeCustomQueries('AFTER_CREATE')
+        executeCustomQueries('BEFORE_CREATE')
+        # Rebuild the database structure.
+        print 'CREATING new tables...',
+        sys.stdout.flush()
+        createTables(DB_TABLES)
+        print 'DONE!'
+        t('dropping and recreating the database')
+        if CACHE_BACKEND == 'disk':
+            # Entries stored on disk by a previous run refer to the old data.
+            for cache in (CACHE_MID, CACHE_PID, CACHE_CID, CACHE_COMPID,
+                            CACHE_KWRDID, CACHE_MID_AKAS):
+                cache.erase()
+        executeCustomQueries('AFTER_CREATE')
+        checkpoint('createTables', imdbIDs=(movies_imdbIDs, people_imdbIDs,
+                                    characters_imdbIDs, companies_imdbIDs))
 
     # Read the constants.
     readConstants()
 
+    # Files that don't depend on each other can be parsed in advance,
+    # by a pool of processes.
+    startParsing(COMPANIES_JOBS + MINUSHASH_JOBS + NMMV_JOBS + MISC_INFO_JOBS)
+
     # Populate the CACHE_MID instance.
-    readMovieList()
+    runStage('readMovieList()', readMovieList)
     # Comment readMovieList() and uncomment the following two lines
     # to keep the current info in the name and title tables.
     ##CACHE_MID.populate()
-    t('readMovieList()')
 
     executeCustomQueries('BEFORE_COMPANIES')
 
@@ -2842,10 +4940,8 @@ def run():
         del characters_imdbIDs
 
     # Aka names and titles.
-    doAkaNames()
-    t('doAkaNames()')
-    doAkaTitles()
-    t('doAkaTitles()')
+    runStage('doAkaNames()', doAkaNames)
+    runStage('doAkaTitles()', doAkaTitles)
 
     # alternate-versions, goofs, crazy-credits, quotes, soundtracks, trivia.
     doMinusHashFiles()
@@ -2858,21 +4954,15 @@ def run():
     # locations, running-times, sound-mix, technical, release-dates.
     doMiscMovieInfo()
     # movie-links.
-    doMovieLinks()
-    t('doMovieLinks()')
+    runStage('doMovieLinks()', doMovieLinks)
 
-    # ratings.
-    getRating()
-    t('getRating()')
+    # ratings (and top 250 and bottom 10 movies).
+    runStage('getRating()', getRating)
     # taglines.
-    getTaglines()
-    t('getTaglines()')
-    # ratings (top 250 and bottom 10 movies).
-    getTopBottomRating()
-    t('getTopBottomRating()')
+    runStage('getTaglines()', getTaglines)
     # complete-cast, complete-crew.
-    completeCast()
-    t('completeCast()')
+    runStage('completeCast()', completeCast)
+    stopParsing()
 
     if CSV_DIR:
         CSV_CURS.closeAll()
@@ -2900,14 +4990,17 @@ def run():
     if CSV_ONLY_WRITE:
         t('TOTAL TIME TO WRITE CSV FILES', sinceBegin=True)
         executeCustomQueries('END')
+        removeCheckpoint()
         t('FINAL', sinceBegin=True)
         return
 
     if CSV_DIR:
-        print 'loading CSV files into the database'
-        executeCustomQueries('BEFORE_CSV_LOAD')
-        loadCSVFiles()
-        t('loadCSVFiles()')
+        if not stageDone('loadCSVFiles()'):
+            print 'loading CSV files into the database'
+            executeCustomQueries('BEFORE_CSV_LOAD')
+            loadCSVFiles()
+            t('loadCSVFiles()')
+            checkpoint('loadCSVFiles()')
         executeCustomQueries('BEFORE_RESTORE')
 
         # Restoring imdbIDs for movies and persons.
@@ -2924,9 +5017,98 @@ def run():
                     None, companies_imdbIDs, CompanyName)
         del companies_imdbIDs
 
+    if TRIGRAMS:
+        runStage('buildTrigrams()', buildTrigrams)
+
     t('TOTAL TIME TO INSERT/WRITE DATA', sinceBegin=True)
 
-    buildIndexesAndFK()
+    if not stageDone('buildIndexesAndFK()'):
+        buildIndexesAndFK()
+        checkpoint('buildIndexesAndFK()')
+
+    executeCustomQueries('END')
+    removeCheckpoint()
+
+    t('FINAL', sinceBegin=True)
+
+
+def incrementalStage(stage, funct, passes=('delete', 'insert')):
+    """Run funct once for every pass of an incremental import; the
+    INCR_PASS variable is left to the last pass."""
+    global INCR_PASS
+    for incrPass in passes:
+        INCR_PASS = incrPass
+        print 'RUNNING %s (%s pass)' % (stage, incrPass)
+        funct()
+        t('%s (%s pass)' % (stage, incrPass))
+
+
+def runIncremental():
+    """Update the database, storing only the changes between the data
+    files in INCREMENTAL_DIR (used to create the database) and the new
+    ones: the data read from the chunks of the old files that are not
+    in the new files are deleted, and the new chunks are stored."""
+    print 'RUNNING imdbpy2sql.py using the %s ORM' % USED_ORM
+    print 'UPDATING the database with the changes to the files in %s' % \
+            INCREMENTAL_DIR
+    if SKIPPED_FILES:
+        print 'SKIPPING the data files: %s' % ', '.join(sorted(SKIPPED_FILES))
+
+    executeCustomQueries('BEGIN')
+    readConstants()
+    # With --trigrams, the trigrams tables are created, if needed.
+    newTables = [x for x in DB_TABLES if x in MISSING_TRIGRAM_TABLES]
+    if newTables:
+        createTables(newTables)
+
+    # New IDs follow the ones already in the database.
+    maxIDs = _maxIDs()
+    for cache, table in ((CACHE_MID, Title), (CACHE_PID, Name),
+                        (CACHE_CID, CharName), (CACHE_COMPID, CompanyName),
+                        (CACHE_KWRDID, Keyword), (CACHE_MID_AKAS, AkaTitle)):
+        cache.counter = counter(maxIDs[tableName(table)] + 1)
+        if CACHE_BACKEND == 'disk':
+            # Entries stored on disk can refer to another database; the
+            # keys are looked up in the database, when needed.
+            cache.erase()
+
+    # Titles no more in the list are kept, since they can still be
+    # referenced by other information.
+    incrementalStage('readMovieList()', readMovieList, passes=('insert',))
+
+    executeCustomQueries('BEFORE_COMPANIES')
+    incrementalStage('doMovieCompaniesInfo()', doMovieCompaniesInfo)
+
+    executeCustomQueries('BEFORE_CAST')
+    incrementalStage('castLists()', castLists)
+    incrementalStage('doAkaNames()', doAkaNames)
+    incrementalStage('doAkaTitles()', doAkaTitles)
+    incrementalStage('doMinusHashFiles()', doMinusHashFiles)
+    incrementalStage('doNMMVFiles()', doNMMVFiles)
+    incrementalStage('doMiscMovieInfo()', doMiscMovieInfo)
+    incrementalStage('doMovieLinks()', doMovieLinks)
+    incrementalStage('getRating()', getRating)
+    incrementalStage('getTaglines()', getTaglines)
+    incrementalStage('completeCast()', completeCast)
+    # Started by --split-cast.
+    stopParsing()
+
+    # Flush caches.
+    CACHE_MID.flush()
+    CACHE_PID.flush()
+    CACHE_CID.flush()
+    CACHE_COMPID.flush()
+    t('fushing caches...')
+
+    # Trigrams already in the database are updated, too.
+    if TRIGRAMS or _hasTrigrams():
+        buildTrigrams()
+        t('buildTrigrams()')
+        if newTables:
+            for idx_error in createIndexes(newTables):
+                print 'ERROR caught exception creating an index: %s' % \
+                        idx_error
+            t('createIndexes()')
 
     executeCustomQueries('END')
 
@@ -2942,6 +5124,7 @@ def _kdb_handler(signum, frame):
         return
     print 'INTERRUPT REQUEST RECEIVED FROM USER.  FLUSHING CACHES...'
     _HEARD = 1
+    stopParsing(terminate=True)
     # XXX: trap _every_ error?
     try: CACHE_MID.flush()
     except IntegrityError: pass
@@ -2951,6 +5134,8 @@ def _kdb_handler(signum, frame):
     except IntegrityError: pass
     try: CACHE_COMPID.flush()
     except IntegrityError: pass
+    if SQLITE_FAST:
+        connectObject.commitStage()
     print 'DONE! (in %d minutes, %d seconds)' % \
             divmod(int(time.time())-BEGIN_TIME, 60)
     sys.exit()
@@ -2973,6 +5158,8 @@ if __name__ == '__main__':
     signal.signal(signal.SIGINT, _kdb_handler)
     if CSV_ONLY_LOAD:
         restoreCSV()
+    elif INCREMENTAL_DIR:
+        runIncremental()
     else:
         run()
 
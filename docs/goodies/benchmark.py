@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""
+benchmark.py script.
+
+This script imports a set of synthetic plain text data files (written
+by makeptdf.py) in a SQLite database, and reports the time and the
+throughput of every stage of the imdbpy2sql.py script.
+
+Usage: benchmark.py [options] [-- imdbpy2sql.py options]
+
+    -m, --movies N      number of titles of the generated files
+                        (default: 10000).
+    -s, --seed N        seed of the random generator (default: 0).
+    -d, --data DIR      directory of the data files; if it already
+                        contains a movies.list.gz file, the files are
+                        not generated again (default: a temporary
+                        directory, removed at the end).
+    -k, --keep FILE     keep the SQLite database in FILE.
+    -i, --imdbpy2sql S  path of the imdbpy2sql.py script (default: the
+                        one in the bin directory of this source tree).
+
+The options after '--' are passed to imdbpy2sql.py; e.g.:
+    benchmark.py -m 50000 -- --split-cast --jobs 4
+
+Copyright 2012 Davide Alberani <da@erlug.linux.it>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+import os, sys, getopt, time, shutil, tempfile, subprocess
+
+try: import json
+except ImportError:
+    try: import simplejson as json
+    except ImportError:
+        print 'You need the json (or simplejson) module.'
+        sys.exit(1)
+
+from makeptdf import makePTDF
+
+
+HELP = __doc__[__doc__.index('Usage:'):__doc__.index('Copyright')].strip()
+
+GOODIES_DIR = os.path.dirname(os.path.abspath(__file__))
+IMDBPY2SQL = os.path.join(GOODIES_DIR, os.pardir, os.pardir, 'bin',
+                        'imdbpy2sql.py')
+
+
+def runImport(script, dataDir, dbFile, statsFile, logFile, extraArgs):
+    """Run the imdbpy2sql.py script; return its exit code and the
+    wall time."""
+    cmd = [sys.executable, script, '-d', dataDir, '-u',
+            'sqlite:' + dbFile, '--sqlite-transactions',
+            '--stats-file', statsFile] + extraArgs
+    env = os.environ.copy()
+    # Use the IMDbPY package of this source tree, if the script is.
+    srcDir = os.path.dirname(os.path.dirname(os.path.abspath(script)))
+    if os.path.isdir(os.path.join(srcDir, 'imdb')):
+        env['PYTHONPATH'] = os.pathsep.join(filter(None,
+                                [srcDir, env.get('PYTHONPATH')]))
+    log = open(logFile, 'w')
+    begin = time.time()
+    ret = subprocess.call(cmd, stdout=log, stderr=subprocess.STDOUT, env=env)
+    log.close()
+    return ret, time.time() - begin
+
+
+def readStats(statsFile):
+    """Return the list of records of a file written by --stats-file."""
+    records = []
+    for line in open(statsFile):
+        line = line.strip()
+        if line: records.append(json.loads(line))
+    return records
+
+
+def report(records, wallTime, dataBytes):
+    """Print the time and the throughput of every stage."""
+    print '%-40s %9s %10s %10s %8s' % ('stage', 'seconds', 'rows',
+                                        'rows/s', 'MB/s')
+    totalRows = 0
+    for record in records:
+        stage = record['stage']
+        if stage in ('FINAL',) or stage.startswith('TOTAL'):
+            continue
+        seconds = record['wallTime']
+        rows = sum(record['rows'].values())
+        totalRows += rows
+        mbs = record['inputBytes'] / 1048576.0
+        if seconds > 0:
+            rowsSec = '%.0f' % (rows / seconds)
+            mbSec = '%.2f' % (mbs / seconds)
+        else:
+            rowsSec = mbSec = '-'
+        print '%-40s %9.2f %10d %10s %8s' % (stage[:40], seconds, rows,
+                                            rowsSec, mbSec)
+    print ''
+    print 'compressed input: %.2f MB' % (dataBytes / 1048576.0)
+    print 'rows written: %d' % totalRows
+    print 'total time: %.2f seconds (%.0f rows/s)' % (wallTime,
+                                            totalRows / max(wallTime, 0.001))
+
+
+def dirSize(path):
+    return sum([os.path.getsize(os.path.join(path, x))
+                for x in os.listdir(path) if x.endswith('.gz')])
+
+
+if __name__ == '__main__':
+    try:
+        optlist, args = getopt.getopt(sys.argv[1:], 'm:s:d:k:i:h',
+                                    ['movies=', 'seed=', 'data=', 'keep=',
+                                    'imdbpy2sql=', 'help'])
+    except getopt.error, e:
+        print 'Troubles with arguments.'
+        print HELP
+        sys.exit(2)
+    nrMovies = 10000
+    seed = 0
+    dataDir = None
+    keepDB = None
+    script = IMDBPY2SQL
+    for opt in optlist:
+        if opt[0] in ('-m', '--movies'):
+            nrMovies = int(opt[1])
+        elif opt[0] in ('-s', '--seed'):
+            seed = int(opt[1])
+        elif opt[0] in ('-d', '--data'):
+            dataDir = opt[1]
+        elif opt[0] in ('-k', '--keep'):
+            keepDB = os.path.abspath(opt[1])
+        elif opt[0] in ('-i', '--imdbpy2sql'):
+            script = opt[1]
+        elif opt[0] in ('-h', '--help'):
+            print HELP
+            sys.exit(0)
+    tmpDir = tempfile.mkdtemp(prefix='imdbpy-benchmark-')
+    try:
+        if dataDir is None:
+            dataDir = os.path.join(tmpDir, 'data')
+        if not os.path.isfile(os.path.join(dataDir, 'movies.list.gz')):
+            print 'writing the data files for %d titles in %s...' % \
+                    (nrMovies, dataDir)
+            begin = time.time()
+            makePTDF(dataDir, nrMovies, seed)
+            print 'done in %.2f seconds' % (time.time() - begin)
+        dbFile = keepDB or os.path.join(tmpDir, 'imdb.db')
+        if os.path.exists(dbFile):
+            os.unlink(dbFile)
+        statsFile = os.path.join(tmpDir, 'stats.json')
+        logFile = os.path.join(tmpDir, 'imdbpy2sql.log')
+        print 'importing the data files...'
+        ret, wallTime = runImport(script, dataDir, dbFile, statsFile,
+                                logFile, args)
+        if ret != 0:
+            print 'imdbpy2sql.py failed (exit code %s); last lines:' % ret
+            sys.stdout.write(''.join(open(logFile).readlines()[-20:]))
+            sys.exit(3)
+        print ''
+        report(readStats(statsFile), wallTime, dirSize(dataDir))
+        print 'database size: %.2f MB' % (os.path.getsize(dbFile) / 1048576.0)
+    finally:
+        shutil.rmtree(tmpDir, True)
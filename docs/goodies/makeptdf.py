@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+"""
+makeptdf.py script.
+
+This script writes a set of synthetic plain text data files, useful
+to test and benchmark the imdbpy2sql.py script without the real files.
+
+Usage: makeptdf.py [options] DESTDIR
+
+    -m, --movies N      number of titles (default: 10000); the number
+                        of people is proportional.
+    -s, --seed N        seed of the random generator (default: 0);
+                        the same seed always produces the same files.
+    -c, --compress N    gzip compression level (default: 1).
+
+Written files: movies, aka-titles, actors, actresses, directors,
+genres, keywords, ratings and biographies .list.gz files.
+
+Copyright 2012 Davide Alberani <da@erlug.linux.it>
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+
+import os, sys, getopt, random
+from gzip import GzipFile
+
+
+HELP = __doc__[__doc__.index('Usage:'):__doc__.index('Copyright')].strip()
+
+# Number of people, for every title.
+ACTORS_RATIO = 3.0
+ACTRESSES_RATIO = 2.0
+DIRECTORS_RATIO = 0.4
+# Fraction of series (and episodes for every series), of titles with
+# akas, of rated titles and of people with a biography.
+SERIES_RATIO = 0.02
+EPISODES_PER_SERIES = (5, 60)
+AKAS_RATIO = 0.3
+RATINGS_RATIO = 0.6
+BIOS_RATIO = 0.2
+
+SYLLABLES = ['an', 'bel', 'cor', 'da', 'el', 'fin', 'gar', 'ho', 'is',
+            'jo', 'ka', 'lo', 'mar', 'ne', 'or', 'pe', 'qui', 'ro', 'sa',
+            'ti', 'u', 'ver', 'wil', 'xa', 'yo', 'ze', 'ber', 'ston',
+            'ham', 'ley', 'son', 'ta', 'ri', 'mo', 'ja', 'st\xe9', 'm\xfc',
+            'l\xe9a', 'r\xf6']
+ARTICLES = ['The', 'A', 'Le', 'La', 'Il', 'Der', 'El']
+KINDS = [('', 0.85), (' (TV)', 0.06), (' (V)', 0.07), (' (VG)', 0.02)]
+GENRES = ['Drama', 'Comedy', 'Documentary', 'Short', 'Action', 'Thriller',
+        'Romance', 'Horror', 'Crime', 'Adventure', 'Family', 'Sci-Fi',
+        'Animation', 'Fantasy', 'Mystery', 'Music', 'War', 'Western']
+COUNTRIES = ['USA', 'UK', 'France', 'Italy', 'Germany', 'Spain', 'Japan',
+            'India', 'Brazil', 'Canada']
+CAST_NOTES = [('(uncredited)', 0.08), ('(voice)', 0.04),
+            ('(archive footage)', 0.02), ('(as %s)', 0.03)]
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+        'August', 'September', 'October', 'November', 'December']
+SEPARATOR = '-' * 77
+
+
+def roman(nr):
+    """Return the roman numeral of a (small) number."""
+    res = ''
+    for value, digits in ((1000, 'M'), (900, 'CM'), (500, 'D'), (400, 'CD'),
+                        (100, 'C'), (90, 'XC'), (50, 'L'), (40, 'XL'),
+                        (10, 'X'), (9, 'IX'), (5, 'V'), (4, 'IV'), (1, 'I')):
+        while nr >= value:
+            res += digits
+            nr -= value
+    return res
+
+
+class Generator(object):
+    """Generate the data of the synthetic files."""
+    def __init__(self, nrMovies, seed=0):
+        self.rnd = random.Random(seed)
+        self.nrMovies = nrMovies
+        self._names = {}
+        self._titles = {}
+        # List of (title, year string) tuples, in the movies.list order;
+        # series and episodes included.
+        self.movies = []
+        # Titles that can be referred by other files (no series).
+        self.titles = []
+
+    def chance(self, fraction):
+        return self.rnd.random() < fraction
+
+    def skewed(self, seq, k=3.0):
+        """Pick an item of a list, preferring the first ones (a few
+        titles are in many cast lists, most in a few)."""
+        return seq[int(len(seq) * self.rnd.random() ** k)]
+
+    def choiceWeighted(self, items):
+        x = self.rnd.random()
+        for item, weight in items:
+            x -= weight
+            if x < 0: return item
+        return items[0][0]
+
+    def word(self, minSyl=1, maxSyl=3):
+        nr = self.rnd.randint(minSyl, maxSyl)
+        return ''.join([self.rnd.choice(SYLLABLES)
+                        for x in xrange(nr)]).capitalize()
+
+    def imdbIndex(self, string, used):
+        """Return an imdbIndex, if the string was already used."""
+        count = used.get(string, 0) + 1
+        used[string] = count
+        if count == 1: return None
+        return roman(count)
+
+    def words(self):
+        nr = self.rnd.randint(1, 4)
+        title = ' '.join([self.word() for x in xrange(nr)])
+        if self.chance(0.15):
+            title = '%s, %s' % (title, self.rnd.choice(ARTICLES))
+        return title
+
+    def title(self, year, kind='', series=False):
+        title = self.words()
+        index = self.imdbIndex('%s%s' % (title, year), self._titles)
+        if index: year = '%s/%s' % (year, index)
+        if series: title = '"%s"' % title
+        return '%s (%s)%s' % (title, year, kind)
+
+    def name(self):
+        name = '%s, %s' % (self.word(2, 3), self.word(1, 2))
+        index = self.imdbIndex(name, self._names)
+        if index: name = '%s (%s)' % (name, index)
+        return name
+
+    def year(self):
+        return self.rnd.randint(1920, 2012)
+
+    def makeMovies(self):
+        nrSeries = int(self.nrMovies * SERIES_RATIO)
+        while len(self.movies) < self.nrMovies:
+            year = self.year()
+            if nrSeries and self.chance(SERIES_RATIO * 2):
+                nrSeries -= 1
+                series = self.title(year, series=True)
+                end = min(2012, year + self.rnd.randint(0, 10))
+                self.movies.append((series, '%s-%s' % (year, end)))
+                nrEp = self.rnd.randint(*EPISODES_PER_SERIES)
+                for ep in xrange(nrEp):
+                    season = ep // 20 + 1
+                    epTitle = self.word(1, 3)
+                    if self.chance(0.2):
+                        epTitle = 'Episode #%d.%d' % (season, ep % 20 + 1)
+                    episode = '%s {%s (#%d.%d)}' % (series, epTitle, season,
+                                                    ep % 20 + 1)
+                    epYear = min(end, year + season - 1)
+                    self.movies.append((episode, str(epYear)))
+                    self.titles.append(episode)
+                continue
+            kind = self.choiceWeighted(KINDS)
+            title = self.title(year, kind)
+            self.movies.append((title, str(year)))
+            self.titles.append(title)
+        # Popular titles are spread over the whole list.
+        self.rnd.shuffle(self.titles)
+
+    def makePeople(self, ratio):
+        people = []
+        for x in xrange(int(self.nrMovies * ratio)):
+            people.append(self.name())
+        return people
+
+    def castLine(self, title, withRole=True):
+        line = title
+        note = self.choiceWeighted(CAST_NOTES + [(None, 1.0)])
+        if note is not None:
+            if '%s' in note:
+                note = note % self.word(2, 3)
+            line += '  %s' % note
+        if withRole:
+            if self.chance(0.9):
+                role = '%s %s' % (self.word(1, 2), self.word(2, 3))
+                if self.chance(0.05):
+                    role += '/%s' % self.word(1, 3)
+                line += '  [%s]' % role
+            if self.chance(0.7):
+                line += '  <%d>' % self.rnd.randint(1, 40)
+        return line
+
+    def credits(self):
+        """Number of credits of a person: a few people have hundreds."""
+        return min(int(self.rnd.paretovariate(1.2)), 300)
+
+
+def openFile(destDir, fname, compress):
+    fpath = os.path.join(destDir, fname)
+    return GzipFile(fpath, 'wb', compress)
+
+
+def writeMovies(gen, destDir, compress):
+    fd = openFile(destDir, 'movies.list.gz', compress)
+    fd.write('CRC: 0x0  File: movies.list  Date: synthetic\n\n'
+            'MOVIES LIST\n===========\n\n')
+    for title, year in gen.movies:
+        tabs = '\t' * max(1, 7 - len(title) // 8)
+        fd.write('%s%s%s\n' % (title, tabs, year))
+    fd.write('%s\n' % ('-' * 80))
+    fd.close()
+
+
+def writeAkas(gen, destDir, compress):
+    fd = openFile(destDir, 'aka-titles.list.gz', compress)
+    fd.write('AKA TITLES LIST\n=============\n\n\n\n')
+    for title in gen.titles:
+        if not gen.chance(AKAS_RATIO): continue
+        fd.write('%s\n' % title)
+        year = title[title.index(' (') + 2:].split(')')[0].split('/')[0]
+        for x in xrange(gen.rnd.randint(1, 4)):
+            aka = '%s (%s)' % (' '.join([gen.word()
+                            for y in xrange(gen.rnd.randint(1, 3))]), year)
+            if title[0] == '"':
+                aka = '"%s" (%s)' % (aka.split(' (')[0], year)
+            fd.write('   (aka %s)\t(%s)\n' % (aka,
+                    gen.rnd.choice(COUNTRIES)))
+        fd.write('\n')
+    fd.write('\n%s\n' % SEPARATOR)
+    fd.close()
+
+
+def writeCast(gen, destDir, compress, fname, header, people, withRole=True):
+    fd = openFile(destDir, fname, compress)
+    fd.write('%s\n%s\n\nName\t\t\tTitles\n----\t\t\t------\n' %
+            (header, '=' * len(header)))
+    for name in people:
+        titles = {}
+        for x in xrange(gen.credits()):
+            titles[gen.skewed(gen.titles)] = None
+        lines = [gen.castLine(title, withRole) for title in titles]
+        fd.write('%s\t%s\n' % (name, lines[0]))
+        for line in lines[1:]:
+            fd.write('\t\t\t%s\n' % line)
+        fd.write('\n')
+    fd.write('\n%s\n' % SEPARATOR)
+    fd.close()
+
+
+def writeTitleValues(gen, destDir, compress, fname, header, values, avg):
+    fd = openFile(destDir, fname, compress)
+    fd.write('%s\n%s\n\n' % (header, '=' * len(header)))
+    for title in gen.titles:
+        nr = int(gen.rnd.expovariate(1.0 / avg))
+        for value in gen.rnd.sample(values, min(nr, len(values))):
+            fd.write('%s\t\t\t\t%s\n' % (title, value))
+    fd.close()
+
+
+def writeRatings(gen, destDir, compress):
+    ratings = []
+    for title in gen.titles:
+        if not gen.chance(RATINGS_RATIO): continue
+        # Most titles have a few votes, some hundreds of thousands.
+        votes = min(int(5 * gen.rnd.paretovariate(0.5)), 900000)
+        rating = round(min(10.0, max(1.0, gen.rnd.gauss(6.2, 1.4))), 1)
+        distrib = ''.join([gen.rnd.choice('.0123456789*')
+                            for x in xrange(10)])
+        ratings.append((title, votes, rating, distrib))
+    line = '      %s  %6d  %4s  %s\n'
+    fd = openFile(destDir, 'ratings.list.gz', compress)
+    fd.write('CRC: 0x0  File: ratings.list  Date: synthetic\n\n')
+    # Titles with enough votes, sorted by rating.
+    top = [x for x in ratings if x[1] >= 25000 and x[0][0] != '"']
+    top.sort(key=lambda x: (-x[2], -x[1]))
+    fd.write('TOP 250 MOVIES (25000+ VOTES)\n\n'
+            'note: for this top 250, only votes from regular voters '
+            'are considered.\n\nNew  Distribution  Votes  Rank  Title\n')
+    for title, votes, rating, distrib in top[:250]:
+        fd.write(line % (distrib, votes, rating, title))
+    bottom = [x for x in ratings if x[1] >= 1500 and x[0][0] != '"']
+    bottom.sort(key=lambda x: (x[2], -x[1]))
+    fd.write('\nBOTTOM 10 MOVIES (1500+ VOTES)\n\n'
+            'New  Distribution  Votes  Rank  Title\n')
+    for title, votes, rating, distrib in bottom[:10]:
+        fd.write(line % (distrib, votes, rating, title))
+    fd.write('\nMOVIE RATINGS REPORT\n\n'
+            'New  Distribution  Votes  Rank  Title\n')
+    for title, votes, rating, distrib in ratings:
+        fd.write(line % (distrib, votes, rating, title))
+    fd.write('\n%s\n' % SEPARATOR)
+    fd.close()
+
+
+def writeBiographies(gen, destDir, compress, people):
+    fd = openFile(destDir, 'biographies.list.gz', compress)
+    fd.write('BIOGRAPHY LIST\n==============\n\n%s\n' % SEPARATOR)
+    for name in people:
+        if not gen.chance(BIOS_RATIO): continue
+        fd.write('NM: %s\n\n' % name)
+        realName = name.split(' (')[0].split(', ')
+        fd.write('RN: %s %s %s\n' % (realName[-1], gen.word(),
+                                    realName[0]))
+        born = gen.rnd.randint(1890, 2000)
+        fd.write('DB: %d %s %d, %s, %s\n' % (gen.rnd.randint(1, 28),
+                gen.rnd.choice(MONTHS), born, gen.word(2, 3),
+                gen.rnd.choice(COUNTRIES)))
+        if born < 1940 and gen.chance(0.6):
+            fd.write('DD: %d %s %d\n' % (gen.rnd.randint(1, 28),
+                    gen.rnd.choice(MONTHS), born + gen.rnd.randint(30, 90)))
+        for x in xrange(gen.rnd.randint(1, 3)):
+            for y in xrange(gen.rnd.randint(1, 8)):
+                fd.write('BG: %s.\n' % ' '.join([gen.word().lower()
+                        for z in xrange(gen.rnd.randint(5, 12))]))
+            fd.write('\nBY: %s\n\n' % gen.word(2, 3))
+        fd.write('%s\n' % SEPARATOR)
+    fd.close()
+
+
+def makePTDF(destDir, nrMovies, seed=0, compress=1):
+    """Write the synthetic plain text data files in destDir."""
+    if not os.path.isdir(destDir):
+        os.makedirs(destDir)
+    gen = Generator(nrMovies, seed)
+    gen.makeMovies()
+    writeMovies(gen, destDir, compress)
+    writeAkas(gen, destDir, compress)
+    actors = gen.makePeople(ACTORS_RATIO)
+    writeCast(gen, destDir, compress, 'actors.list.gz', 'THE ACTORS LIST',
+            actors)
+    writeBiographies(gen, destDir, compress, actors)
+    del actors
+    writeCast(gen, destDir, compress, 'actresses.list.gz',
+            'THE ACTRESSES LIST', gen.makePeople(ACTRESSES_RATIO))
+    writeCast(gen, destDir, compress, 'directors.list.gz',
+            'THE DIRECTORS LIST', gen.makePeople(DIRECTORS_RATIO),
+            withRole=False)
+    writeTitleValues(gen, destDir, compress, 'genres.list.gz',
+            '8: THE GENRES LIST', GENRES, 1.5)
+    keywords = ['%s-%s' % (gen.word(1, 2).lower(), gen.word(1, 3).lower())
+                for x in xrange(max(100, nrMovies // 10))]
+    writeTitleValues(gen, destDir, compress, 'keywords.list.gz',
+            '8: THE KEYWORDS LIST', keywords, 4.0)
+    writeRatings(gen, destDir, compress)
+
+
+if __name__ == '__main__':
+    try:
+        optlist, args = getopt.getopt(sys.argv[1:], 'm:s:c:h',
+                                    ['movies=', 'seed=', 'compress=', 'help'])
+    except getopt.error, e:
+        print 'Troubles with arguments.'
+        print HELP
+        sys.exit(2)
+    nrMovies = 10000
+    seed = 0
+    compress = 1
+    for opt in optlist:
+        if opt[0] in ('-m', '--movies'):
+            nrMovies = int(opt[1])
+        elif opt[0] in ('-s', '--seed'):
+            seed = int(opt[1])
+        elif opt[0] in ('-c', '--compress'):
+            compress = int(opt[1])
+        elif opt[0] in ('-h', '--help'):
+            print HELP
+            sys.exit(0)
+    if len(args) != 1:
+        print HELP
+        sys.exit(2)
+    makePTDF(args[0], nrMovies, seed, compress)
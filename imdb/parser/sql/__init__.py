@@ -28,6 +28,7 @@ Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 #        The code should be commented, rewritten and cleaned. :-)
 
 import re
+import heapq
 import logging
 from difflib import SequenceMatcher
 from codecs import lookup
@@ -114,11 +115,25 @@ def nameVariations(name, fromPtdf=0):
     return name1, name2, name3
 
 
+# Strings whose lengths ratio is below this value are not compared.
+STRING_MAXLENDIFFER = 0.7
+
 try:
     from cutils import ratcliff as _ratcliff
     def ratcliff(s1, s2, sm):
         """Return the Ratcliff-Obershelp value between the two strings,
         using the C implementation."""
+        # Same check done by the C code, but before encoding the strings.
+        s1len = len(s1)
+        s2len = len(s2)
+        if s1len < s2len:
+            threshold = float(s1len) / s2len
+        elif s2len:
+            threshold = float(s2len) / s1len
+        else:
+            return 0.0
+        if threshold < STRING_MAXLENDIFFER:
+            return 0.0
         return _ratcliff(s1.encode('latin_1', 'replace'),
                         s2.encode('latin_1', 'replace'))
 except ImportError:
@@ -128,7 +143,6 @@ except ImportError:
 
     def ratcliff(s1, s2, sm):
         """Ratcliff-Obershelp similarity."""
-        STRING_MAXLENDIFFER = 0.7
         s1len = len(s1)
         s2len = len(s2)
         if s1len < s2len:
@@ -141,6 +155,14 @@ except ImportError:
         return sm.ratio()
 
 
+def _topResults(resd, results):
+    """Return the values of the resd dictionary, sorted from the best
+    match; only the first 'results' ones, if results > 0."""
+    if results > 0:
+        return heapq.nlargest(results, resd.itervalues())
+    return sorted(resd.itervalues(), reverse=True)
+
+
 def merge_roles(mop):
     """Merge multiple roles."""
     new_list = []
@@ -204,11 +226,7 @@ def scan_names(name_list, name1, name2, name3, results=0, ro_thresold=None,
             if resd.has_key(i):
                 if ratio > resd[i][0]: resd[i] = (ratio, (i, n_data))
             else: resd[i] = (ratio, (i, n_data))
-    res = resd.values()
-    res.sort()
-    res.reverse()
-    if results > 0: res[:] = res[:results]
-    return res
+    return _topResults(resd, results)
 
 
 def scan_titles(titles_list, title1, title2, title3, results=0,
@@ -282,11 +300,7 @@ def scan_titles(titles_list, title1, title2, title3, results=0,
                 if ratio > resd[i][0]:
                     resd[i] = (ratio, (i, t_data))
             else: resd[i] = (ratio, (i, t_data))
-    res = resd.values()
-    res.sort()
-    res.reverse()
-    if results > 0: res[:] = res[:results]
-    return res
+    return _topResults(resd, results)
 
 
 def scan_company_names(name_list, name1, results=0, ro_thresold=None):
@@ -319,11 +333,7 @@ def scan_company_names(name_list, name1, results=0, ro_thresold=None):
                                             (i, analyze_company_name(o_name)))
             else:
                 resd[i] = (ratio, (i, analyze_company_name(o_name)))
-    res = resd.values()
-    res.sort()
-    res.reverse()
-    if results > 0: res[:] = res[:results]
-    return res
+    return _topResults(resd, results)
 
 
 try:
@@ -353,6 +363,44 @@ except ImportError:
                 soundCode += cw
         return soundCode[:SOUNDEX_LEN] or None
 
+try:
+    from cutils import soundexes, md5sums
+except ImportError:
+    try: from hashlib import md5
+    except ImportError: from md5 import md5
+
+    def soundexes(strings):
+        """Return a list with the soundex codes of a sequence of
+        strings (None for None values)."""
+        return [s is not None and soundex(s) or None for s in strings]
+
+    def md5sums(strings):
+        """Return a list with the MD5 hex digests of a sequence
+        of strings."""
+        return [md5(s).hexdigest() for s in strings]
+
+
+_re_trigramSep = re.compile(r'[^a-z0-9]+')
+# Maximum number of candidates of a search, pre-ranked by the number
+# of trigrams they share with the searched string.
+TRIGRAM_CANDIDATES = 100
+
+def trigrams(s):
+    """Return the set of trigrams of the words of the given string;
+    only ASCII letters and digits are considered, and every word is
+    padded with '$' characters, so that the trigrams don't depend
+    on the order of the words."""
+    if not isinstance(s, unicode):
+        s = unicode(s, 'utf_8', 'ignore')
+    s = s.encode('ascii', 'ignore').lower()
+    trgs = set()
+    for word in _re_trigramSep.split(s):
+        if not word: continue
+        word = '$$%s$' % word
+        for i in xrange(len(word) - 2):
+            trgs.add(word[i:i+3])
+    return trgs
+
 
 def _sortKeywords(keyword, kwds):
     """Sort a list of keywords, based on the searched one."""
@@ -452,7 +500,14 @@ def get_movie_data(movieID, kindDict, fromAka=0, _table=None):
     else:
         if not fromAka: Table = Title
         else: Table = AkaTitle
-    m = Table.get(movieID)
+    return _buildMovieData(Table.get(movieID), kindDict, fromAka)
+
+
+def _buildMovieData(m, kindDict, fromAka=0, series=None):
+    """Return a dictionary containing data about the movie in the m row
+    (of the Title or AkaTitle table); if series is not None, it's used
+    as the 'episode of' value of an episode, otherwise the series
+    is read from the database."""
     mdict = {'title': m.title, 'kind': kindDict[m.kindID],
             'year': m.productionYear, 'imdbIndex': m.imdbIndex,
             'season': m.seasonNr, 'episode': m.episodeNr}
@@ -475,7 +530,9 @@ def get_movie_data(movieID, kindDict, fromAka=0, _table=None):
         try: mdict['episode'] = int(mdict['episode'])
         except: pass
     episodeOfID = m.episodeOfID
-    if episodeOfID is not None:
+    if episodeOfID is not None and series is not None:
+        mdict['episode of'] = series
+    elif episodeOfID is not None:
         ser_dict = get_movie_data(episodeOfID, kindDict, fromAka)
         mdict['episode of'] = Movie(data=ser_dict, movieID=episodeOfID,
                                     accessSystem='sql')
@@ -486,6 +543,55 @@ def get_movie_data(movieID, kindDict, fromAka=0, _table=None):
     return mdict
 
 
+def get_movies_data(movieIDs, kindDict, fromAka=0):
+    """Return a dictionary {movieID: movieData} with the data about the
+    given movies, as returned by get_movie_data; the titles and their
+    series are read with a few queries."""
+    if not fromAka: Table = Title
+    else: Table = AkaTitle
+    return _moviesDataFromRows(_getRowsByID(Table, movieIDs).values(),
+                                kindDict, fromAka)
+
+
+def _moviesDataFromRows(rows, kindDict, fromAka=0):
+    """Return a dictionary {id: movieData} for the given rows of the
+    Title (or AkaTitle, if fromAka is true) table; the series of
+    the episodes are read in bulk."""
+    if not fromAka: Table = Title
+    else: Table = AkaTitle
+    rowsByID = dict([(m.id, m) for m in rows])
+    seriesRows = _getRowsByID(Table, [m.episodeOfID for m in rows
+                                    if m.episodeOfID not in rowsByID])
+    seriesRows.update(rowsByID)
+    seriesData = {}
+    res = {}
+    for m in rows:
+        series = None
+        seriesID = m.episodeOfID
+        if seriesID in seriesRows:
+            if seriesID not in seriesData:
+                seriesData[seriesID] = _buildMovieData(seriesRows[seriesID],
+                                                        kindDict, fromAka)
+            series = Movie(data=dict(seriesData[seriesID]),
+                            movieID=seriesID, accessSystem='sql')
+            if fromAka and seriesRows[seriesID].note:
+                series.notes = seriesRows[seriesID].note
+        res[m.id] = _buildMovieData(m, kindDict, fromAka, series=series)
+    return res
+
+
+def _getRowsByID(table, ids, chunkSize=500):
+    """Return a dictionary {id: row} with the rows of the given table
+    having one of the given IDs; a query is issued for every
+    chunkSize IDs."""
+    rows = {}
+    ids = list(set([x for x in ids if x is not None]))
+    for idx in xrange(0, len(ids), chunkSize):
+        for row in table.select(IN(table.q.id, ids[idx:idx+chunkSize])):
+            rows[row.id] = row
+    return rows
+
+
 def _iterKeywords(results):
     """Iterate over (key.id, key.keyword) columns of a selection of
     the Keyword table."""
@@ -493,6 +599,15 @@ def _iterKeywords(results):
         yield key.id, key.keyword
 
 
+def _infoWithNote(row):
+    """Return the info of a row of the MovieInfo or MovieInfoIdx table,
+    followed by its note (if any)."""
+    info = row.info
+    if row.note:
+        info += u'::%s' % row.note
+    return info
+
+
 def getSingleInfo(table, movieID, infoType, notAList=False):
     """Return a dictionary in the form {infoType: infoListOrString},
     retrieving a single set of information about a given movie, from
@@ -638,6 +753,8 @@ class IMDbSqlAccessSystem(IMDbBase):
             self._moviesubs[vinfo] = ('laserdisc', vinfo[3:])
         self._moviesubs.update(_litd)
         self._moviesubs.update(_busd)
+        # Trigrams tables known to be filled (see _hasTrigrams).
+        self._trigrams = {}
         self.do_adult_search(adultSearch)
 
     def _findRefs(self, o, trefs, nrefs):
@@ -894,6 +1011,103 @@ class IMDbSqlAccessSystem(IMDbBase):
         shown in the results of a search."""
         self.doAdult = doAdult
 
+    def _queryAll(self, query, maxRows=None):
+        """Run a SQL query, returning every row (or the first maxRows)."""
+        dbConn = self._connection.getConnection()
+        try:
+            curs = dbConn.cursor()
+            try:
+                curs.execute(query)
+                if maxRows is None:
+                    return curs.fetchall()
+                return curs.fetchmany(maxRows)
+            finally:
+                curs.close()
+        finally:
+            release = getattr(self._connection, 'releaseConnection', None)
+            if release is not None:
+                release(dbConn)
+
+    def _hasTrigrams(self, trgTable):
+        """Return True if the given trigrams table was filled
+        by imdbpy2sql.py."""
+        name = trgTable._imdbpyName
+        if name not in self._trigrams:
+            try:
+                res = self._queryAll('SELECT MIN(%s) FROM %s' %
+                            (trgTable.sqlmeta.idName, trgTable.sqlmeta.table))
+                self._trigrams[name] = res[0][0] is not None
+            except self.Error, e:
+                # A database created by an older version of imdbpy2sql.py.
+                self._sql_logger.debug('no trigrams in %s: %s', name, e)
+                self._trigrams[name] = False
+        return self._trigrams[name]
+
+    def _trigramCandidates(self, trgTable, fkCol, table, joinCol, pcodeCols,
+                            soundexCode, s, restrict=None):
+        """Return the IDs of the movies or persons (the fkCol column of
+        the trgTable trigrams table) referenced by the joinCol column of
+        the rows of table with one of the pcodeCols phonetic codes equal
+        to soundexCode, and matching the restrict list of (column,
+        operator, value) conditions (values are integers or lists of
+        integers); the IDs are sorted by the ratio of trigrams shared
+        with the s string, and at most TRIGRAM_CANDIDATES are returned.
+        None is returned if the trigrams are not available, or if there
+        are not so many candidates."""
+        if soundexCode is None or not self._hasTrigrams(trgTable):
+            return None
+        trgs = trigrams(s)
+        if not trgs:
+            return None
+        cols = table.sqlmeta.columns
+        trgCols = trgTable.sqlmeta.columns
+        fk = 'g.%s' % trgCols[fkCol].dbName
+        trg = 'g.%s' % trgCols['trigram'].dbName
+        nrTrgs = 'g.%s' % trgCols['nrTrigrams'].dbName
+        if joinCol == 'id':
+            join = 't.%s' % table.sqlmeta.idName
+        else:
+            join = 't.%s' % cols[joinCol].dbName
+        # Trigrams and phonetic codes contain only letters, digits
+        # and '$' characters: it's safe to quote them.
+        where = ['(%s)' % ' OR '.join(["t.%s = '%s'" %
+                            (cols[col].dbName, soundexCode)
+                            for col in pcodeCols])]
+        for col, op, value in restrict or ():
+            if isinstance(value, (list, tuple)):
+                if not value:
+                    return None
+                value = '(%s)' % ', '.join([str(int(x)) for x in value])
+            else:
+                value = int(value)
+            where.append('t.%s %s %s' % (cols[col].dbName, op, value))
+        where = ' AND '.join(where)
+        count = self._queryAll('SELECT COUNT(*) FROM %s t WHERE %s' %
+                                (table.sqlmeta.table, where))
+        if count[0][0] <= TRIGRAM_CANDIDATES:
+            return None
+        # Only the trigrams of the candidates are read, and they are
+        # ranked by the Jaccard index of the two sets of trigrams; ties
+        # are broken by ID, so that the same candidates are always
+        # selected.
+        shared = 'COUNT(*)'
+        query = 'SELECT %s FROM %s g WHERE %s IN (SELECT %s FROM %s t ' \
+                'WHERE %s) AND %s IN (%s) GROUP BY %s ORDER BY ' \
+                '%s * 1.0 / (%d + MAX(%s) - %s) DESC, %s' % (fk,
+                    trgTable.sqlmeta.table, fk, join, table.sqlmeta.table,
+                    where, trg, ', '.join(["'%s'" % x for x in sorted(trgs)]),
+                    fk, shared, len(trgs), nrTrgs, shared, fk)
+        return [x[0] for x in self._queryAll(query, TRIGRAM_CANDIDATES)]
+
+    def _selectCandidates(self, table, condition, column, ids):
+        """Return the rows of table matching the condition; if ids is
+        not None, only the rows with the given column in ids."""
+        if ids is None:
+            return list(table.select(condition))
+        if not ids:
+            return []
+        return list(table.select(AND(condition, IN(column, ids))))
+
     def _search_movie(self, title, results, _episodes=False):
         title = title.strip()
         if not title: return []
@@ -926,12 +1140,15 @@ class IMDbSqlAccessSystem(IMDbBase):
 
         # XXX: improve the search restricting the kindID if the
         #      "kind" of the input differs from "movie"?
+        # restrict is the same condition (but the phonetic code), used
+        # to select the candidates with the trigrams.
         condition = conditionAka = None
         if _episodes:
             condition = AND(Title.q.phoneticCode == soundexCode,
                             Title.q.kindID == self._kindRev['episode'])
             conditionAka = AND(AkaTitle.q.phoneticCode == soundexCode,
                             AkaTitle.q.kindID == self._kindRev['episode'])
+            restrict = [('kindID', '=', self._kindRev['episode'])]
         elif title_dict['kind'] == 'episode' and episodeOf is not None:
             # set canonical=0 ?  Should not make much difference.
             series_title = build_title(episodeOf, canonical=1)
@@ -949,6 +1166,8 @@ class IMDbSqlAccessSystem(IMDbBase):
                 conditionAka = AND(AkaTitle.q.phoneticCode == soundexCode,
                                 IN(AkaTitle.q.episodeOfID, seriesIDs),
                                 AkaTitle.q.kindID == self._kindRev['episode'])
+                restrict = [('episodeOfID', 'IN', seriesIDs),
+                            ('kindID', '=', self._kindRev['episode'])]
             else:
                 # XXX: bad situation: we have found no matching series;
                 #      try searching everything (both episodes and
@@ -957,12 +1176,14 @@ class IMDbSqlAccessSystem(IMDbBase):
                                 IN(Title.q.episodeOfID, seriesIDs))
                 conditionAka = AND(AkaTitle.q.phoneticCode == soundexCode,
                                 IN(AkaTitle.q.episodeOfID, seriesIDs))
+                restrict = [('episodeOfID', 'IN', seriesIDs)]
         if condition is None:
             # XXX: excludes episodes?
             condition = AND(Title.q.kindID != self._kindRev['episode'],
                             Title.q.phoneticCode == soundexCode)
             conditionAka = AND(AkaTitle.q.kindID != self._kindRev['episode'],
                             AkaTitle.q.phoneticCode == soundexCode)
+            restrict = [('kindID', '<>', self._kindRev['episode'])]
 
         # Up to 3 variations of the title are searched, plus the
         # long imdb canonical title, if provided.
@@ -972,11 +1193,23 @@ class IMDbSqlAccessSystem(IMDbBase):
             title1 = title
             title2 = ''
             title3 = ''
+        # If imdbpy2sql.py stored the trigrams, only the candidates
+        # sharing more trigrams with the title are compared.
+        titleIDs = self._trigramCandidates(TitleTrigram, 'movieID', Title,
+                                'id', ['phoneticCode'], soundexCode, s_title,
+                                restrict)
+        akaIDs = self._trigramCandidates(TitleTrigram, 'movieID', AkaTitle,
+                                'movieID', ['phoneticCode'], soundexCode,
+                                s_title, restrict)
         try:
-            qr = [(q.id, get_movie_data(q.id, self._kind))
-                    for q in Title.select(condition)]
-            q2 = [(q.movieID, get_movie_data(q.id, self._kind, fromAka=1))
-                    for q in AkaTitle.select(conditionAka)]
+            titles = self._selectCandidates(Title, condition, Title.q.id,
+                                            titleIDs)
+            titlesData = _moviesDataFromRows(titles, self._kind)
+            qr = [(q.id, titlesData[q.id]) for q in titles]
+            akas = self._selectCandidates(AkaTitle, conditionAka,
+                                        AkaTitle.q.movieID, akaIDs)
+            akasData = _moviesDataFromRows(akas, self._kind, fromAka=1)
+            q2 = [(q.movieID, akasData[q.id]) for q in akas]
             qr += q2
         except NotFoundError, e:
             raise IMDbDataAccessError( \
@@ -1000,14 +1233,16 @@ class IMDbSqlAccessSystem(IMDbBase):
             res[:] = [x for x in res if x[0] not in adultlist]
 
         new_res = []
+        akaRes = [r for r in res if r in q2]
+        origData = get_movies_data([r[0] for r in akaRes], self._kind)
         # XXX: can there be duplicates?
         for r in res:
-            if r not in q2:
+            if r not in akaRes:
                 new_res.append(r)
                 continue
             mdict = r[1]
             aka_title = build_title(mdict, ptdf=1)
-            orig_dict = get_movie_data(r[0], self._kind)
+            orig_dict = dict(origData[r[0]])
             orig_title = build_title(orig_dict, ptdf=1)
             if aka_title == orig_title:
                 new_res.append(r)
@@ -1034,8 +1269,11 @@ class IMDbSqlAccessSystem(IMDbBase):
         castdata = [[cd.personID, cd.personRoleID, cd.note, cd.nrOrder,
                     self._role[cd.roleID]]
                     for cd in CastInfo.select(CastInfo.q.movieID == movieID)]
+        # People and characters are read with a few queries.
+        persons = _getRowsByID(Name, [p[0] for p in castdata])
+        characters = _getRowsByID(CharName, [p[1] for p in castdata])
         for p in castdata:
-            person = Name.get(p[0])
+            person = persons[p[0]]
             p += [person.name, person.imdbIndex]
             if p[4] in ('actor', 'actress'):
                 p[4] = 'cast'
@@ -1047,7 +1285,7 @@ class IMDbSqlAccessSystem(IMDbBase):
                 curRole = pdata[1]
                 curRoleID = None
                 if curRole is not None:
-                    robj = CharName.get(curRole)
+                    robj = characters[curRole]
                     curRole = robj.name
                     curRoleID = robj.id
                 p = Person(personID=pdata[0], name=pdata[5],
@@ -1066,8 +1304,11 @@ class IMDbSqlAccessSystem(IMDbBase):
                 for m in MovieInfo.select(MovieInfo.q.movieID == movieID)]
         minfo += [(self._info[m.infoTypeID], m.info, m.note)
                 for m in MovieInfoIdx.select(MovieInfoIdx.q.movieID == movieID)]
-        minfo += [('keywords', Keyword.get(m.keywordID).keyword, None)
-                for m in MovieKeyword.select(MovieKeyword.q.movieID == movieID)]
+        mkeywords = [m.keywordID for m in
+                    MovieKeyword.select(MovieKeyword.q.movieID == movieID)]
+        keywords = _getRowsByID(Keyword, mkeywords)
+        minfo += [('keywords', keywords[kID].keyword, None)
+                for kID in mkeywords]
         minfo = _groupListBy(minfo, 0)
         for group in minfo:
             sect = group[0][0]
@@ -1078,11 +1319,12 @@ class IMDbSqlAccessSystem(IMDbBase):
         # Companies info about a movie.
         cinfo = [(self._compType[m.companyTypeID], m.companyID, m.note) for m
                 in MovieCompanies.select(MovieCompanies.q.movieID == movieID)]
+        companies = _getRowsByID(CompanyName, [c[1] for c in cinfo])
         cinfo = _groupListBy(cinfo, 0)
         for group in cinfo:
             sect = group[0][0]
             for mdata in group:
-                cDb = CompanyName.get(mdata[1])
+                cDb = companies[mdata[1]]
                 cDbTxt = cDb.name
                 if cDb.countryCode:
                     cDbTxt += ' %s' % cDb.countryCode
@@ -1092,7 +1334,7 @@ class IMDbSqlAccessSystem(IMDbBase):
                                 accessSystem=self.accessSystem)
                 res.setdefault(sect, []).append(company)
         # AKA titles.
-        akat = [(get_movie_data(at.id, self._kind, fromAka=1), at.note)
+        akat = [(_buildMovieData(at, self._kind, fromAka=1), at.note)
                 for at in AkaTitle.select(AkaTitle.q.movieID == movieID)]
         if akat:
             res['akas'] = []
@@ -1114,8 +1356,9 @@ class IMDbSqlAccessSystem(IMDbBase):
         mlinks = [[ml.linkedMovieID, self._link[ml.linkTypeID]]
                     for ml in MovieLink.select(MovieLink.q.movieID == movieID)]
         if mlinks:
+            linkedMovies = _getRowsByID(Title, [ml[0] for ml in mlinks])
             for ml in mlinks:
-                lmovieData = get_movie_data(ml[0], self._kind)
+                lmovieData = _buildMovieData(linkedMovies[ml[0]], self._kind)
                 m = Movie(movieID=ml[0], data=lmovieData, accessSystem='sql')
                 ml[0] = m
             res['connections'] = {}
@@ -1135,7 +1378,8 @@ class IMDbSqlAccessSystem(IMDbBase):
                                 accessSystem='sql')
             for episode in eps_list:
                 episodeID = episode.id
-                episode_data = get_movie_data(episodeID, self._kind)
+                episode_data = _buildMovieData(episode, self._kind,
+                                                series=parentSeries)
                 m = Movie(movieID=episodeID, data=episode_data,
                             accessSystem='sql')
                 m['episode of'] = parentSeries
@@ -1230,12 +1474,21 @@ class IMDbSqlAccessSystem(IMDbBase):
             condition = ISNULL(Name.q.namePcodeCf)
             conditionAka = ISNULL(AkaName.q.namePcodeCf)
 
+        # If imdbpy2sql.py stored the trigrams, only the candidates
+        # sharing more trigrams with the name are compared.
+        pcodeCols = ['namePcodeCf', 'namePcodeNf', 'surnamePcode']
+        nameIDs = self._trigramCandidates(NameTrigram, 'personID', Name,
+                                'id', pcodeCols, soundexCode, s_name)
+        akaIDs = self._trigramCandidates(NameTrigram, 'personID', AkaName,
+                                'personID', pcodeCols, soundexCode, s_name)
         try:
             qr = [(q.id, {'name': q.name, 'imdbIndex': q.imdbIndex})
-                    for q in Name.select(condition)]
+                    for q in self._selectCandidates(Name, condition,
+                                                    Name.q.id, nameIDs)]
 
             q2 = [(q.personID, {'name': q.name, 'imdbIndex': q.imdbIndex})
-                    for q in AkaName.select(conditionAka)]
+                    for q in self._selectCandidates(AkaName, conditionAka,
+                                            AkaName.q.personID, akaIDs)]
             qr += q2
         except NotFoundError, e:
             raise IMDbDataAccessError( \
@@ -1286,10 +1539,12 @@ class IMDbSqlAccessSystem(IMDbBase):
         if not res:
             raise IMDbDataAccessError('unable to get personID "%s"' % personID)
         # Collect cast information.
+        items = list(CastInfo.select(CastInfo.q.personID == personID))
+        moviesData = get_movies_data([cd.movieID for cd in items],
+                                    self._kind)
         castdata = [(cd.movieID, cd.personRoleID, cd.note,
-                    self._role[cd.roleID],
-                    get_movie_data(cd.movieID, self._kind))
-                for cd in CastInfo.select(CastInfo.q.personID == personID)]
+                    self._role[cd.roleID], dict(moviesData[cd.movieID]))
+                for cd in items]
         # Regroup by role/duty (cast, writer, director, ...)
         castdata[:] =  _groupListBy(castdata, 3)
         episodes = {}
@@ -1445,9 +1700,12 @@ class IMDbSqlAccessSystem(IMDbBase):
         items = CastInfo.select(CastInfo.q.personRoleID == characterID)
         if results > 0:
             items = items[:results]
+        items = [cd for cd in items
+                if self._role[cd.roleID] in ('actor', 'actress')]
+        moviesData = get_movies_data([cd.movieID for cd in items],
+                                    self._kind)
         filmodata = [(cd.movieID, cd.personID, cd.note,
-                    get_movie_data(cd.movieID, self._kind)) for cd in items
-                    if self._role[cd.roleID] in ('actor', 'actress')]
+                    dict(moviesData[cd.movieID])) for cd in items]
         fdata = []
         for f in filmodata:
             curRole = None
@@ -1521,9 +1779,12 @@ class IMDbSqlAccessSystem(IMDbBase):
         items = MovieCompanies.select(MovieCompanies.q.companyID == companyID)
         if results > 0:
             items = items[:results]
+        items = list(items)
+        moviesData = get_movies_data([cd.movieID for cd in items],
+                                    self._kind)
         filmodata = [(cd.movieID, cd.companyID,
                     self._compType[cd.companyTypeID], cd.note,
-                    get_movie_data(cd.movieID, self._kind)) for cd in items]
+                    dict(moviesData[cd.movieID])) for cd in items]
         filmodata = _groupListBy(filmodata, 2)
         for group in filmodata:
             ctype = group[0][2]
@@ -1546,10 +1807,11 @@ class IMDbSqlAccessSystem(IMDbBase):
         if keyID.count() == 0:
             return []
         keyID = keyID[0].id
-        movies = MovieKeyword.select(MovieKeyword.q.keywordID ==
-                                    keyID)[:results]
-        return [(m.movieID, get_movie_data(m.movieID, self._kind))
-                for m in movies]
+        movies = list(MovieKeyword.select(MovieKeyword.q.keywordID ==
+                                    keyID)[:results])
+        moviesData = get_movies_data([m.movieID for m in movies],
+                                    self._kind)
+        return [(m.movieID, dict(moviesData[m.movieID])) for m in movies]
 
     def _get_top_bottom_movies(self, kind):
         if kind == 'top':
@@ -1560,22 +1822,36 @@ class IMDbSqlAccessSystem(IMDbBase):
             kind = 'bottom 10 rank'
         else:
             return []
-        infoID = InfoType.select(InfoType.q.info == kind)
-        if infoID.count() == 0:
+        infoID = self._infoRev.get(kind)
+        if infoID is None:
+            return []
+        movies = list(MovieInfoIdx.select(MovieInfoIdx.q.infoTypeID == infoID))
+        if not movies:
             return []
-        infoID = infoID[0].id
-        movies = MovieInfoIdx.select(MovieInfoIdx.q.infoTypeID == infoID)
+        movieIDs = [m.movieID for m in movies]
+        moviesData = get_movies_data(movieIDs, self._kind)
+        # Votes, rating and distribution of every ranked movie are read
+        # with a single query, and pivoted to a dictionary for each movie.
+        infoIDs = dict([(self._infoRev[k], k) for k in
+                        ('votes', 'rating', 'votes distribution')
+                        if k in self._infoRev])
+        infos = {}
+        if infoIDs:
+            for mi in MovieInfoIdx.select(AND(
+                                IN(MovieInfoIdx.q.movieID, movieIDs),
+                                IN(MovieInfoIdx.q.infoTypeID, infoIDs.keys()))):
+                infos.setdefault(mi.movieID, {}).setdefault(
+                                infoIDs[mi.infoTypeID], _infoWithNote(mi))
         ml = []
         for m in movies:
-            minfo = get_movie_data(m.movieID, self._kind)
-            for k in kind, 'votes', 'rating', 'votes distribution':
-                valueDict = getSingleInfo(MovieInfoIdx, m.movieID,
-                                            k, notAList=True)
-                if k in (kind, 'votes') and k in valueDict:
-                    valueDict[k] = int(valueDict[k])
-                elif k == 'rating' and k in valueDict:
-                    valueDict[k] = float(valueDict[k])
-                minfo.update(valueDict)
+            minfo = dict(moviesData[m.movieID])
+            minfo[kind] = _infoWithNote(m)
+            minfo.update(infos.get(m.movieID, {}))
+            for k in kind, 'votes':
+                if k in minfo:
+                    minfo[k] = int(minfo[k])
+            if 'rating' in minfo:
+                minfo['rating'] = float(minfo['rating'])
             ml.append((m.movieID, minfo))
         sorter = (_cmpBottom, _cmpTop)[kind == 'top 250 rank']
         ml.sort(sorter)
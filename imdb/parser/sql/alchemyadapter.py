@@ -331,7 +331,9 @@ class TableAdapter(object):
             for index in self.table.indexes:
                 if index.name == idx_name:
                     return
-        idx = Index(idx_name, getattr(self.table.c, self.colMap[col.name]))
+        idxCols = [getattr(self.table.c, self.colMap[name])
+                    for name in [col.name] + col.indexCols]
+        idx = Index(idx_name, *idxCols)
         # XXX: beware that exc.OperationalError can be raised, is some
         #      strange circumstances; that's why the index name doesn't
         #      follow the SQLObject convention, but includes the table name:
@@ -502,6 +504,8 @@ def setConnection(uri, tables, encoding='utf8', debug=False):
     connection.module = eng_conn.dialect.dbapi
     connection.paramstyle = paramstyle
     connection.getConnection = lambda: connection.connection
+    # Used by imdbpy2sql.py to get other connections from the pool.
+    connection.newConnection = engine.raw_connection
     connection.dbName = engine.url.drivername
     return connection
 
@@ -11,7 +11,13 @@
  * - pysoundex():
  *   Return a soundex code string, for the given string.
  *
- * Copyright 2004-2009 Davide Alberani <da@erlug.linux.it>
+ * - pysoundexes():
+ *   Return a list of soundex codes, for a sequence of strings.
+ *
+ * - pymd5sums():
+ *   Return a list of MD5 hex digests, for a sequence of strings.
+ *
+ * Copyright 2004-2012 Davide Alberani <da@erlug.linux.it>
  * Released under the GPL license.
  *
  * NOTE: The Ratcliff-Obershelp part was heavily based on code from the
@@ -204,23 +210,20 @@ static char soundTable[26] =
  '2' /* S */, '3' /* T */, 0 /* U */, '1' /* V */, 0 /* W */, '2' /* X */,
   0 /* Y */, '2' /* Z */};
 
-static PyObject*
-pysoundex(PyObject *self, PyObject *pArgs)
+/* Store in soundCode the soundex code of the string s; return its
+ * length (0 if s contains no ascii letters). */
+static int
+soundex_code(char const *s, char *soundCode)
 {
     int i, j, n;
-    char *s = NULL;
     char word[MXLINELEN+1];
-    char soundCode[SOUNDEX_LEN+1];
     char c;
 
-    if (!PyArg_ParseTuple(pArgs, "s", &s))
-        return NULL;
-
     j = 0;
     n = strlen(s);
 
     /* Convert to uppercase and exclude non-ascii chars. */
-    for (i = 0; i < n; i++) {
+    for (i = 0; i < n && j < MXLINELEN; i++) {
         c = toupper(s[i]);
         if (c < 91 && c > 64) {
             word[j] = c;
@@ -230,10 +233,8 @@ pysoundex(PyObject *self, PyObject *pArgs)
     word[j] = '\0';
 
     n = strlen(word);
-    if (n == 0) {
-        /* If the string is empty, returns None. */
-        return Py_BuildValue("");
-    }
+    if (n == 0)
+        return 0;
     soundCode[0] = word[0];
 
     /* Build the soundCode string. */
@@ -246,16 +247,225 @@ pysoundex(PyObject *self, PyObject *pArgs)
         }
     }
     soundCode[j] = '\0';
+    return j;
+}
 
+
+static PyObject*
+pysoundex(PyObject *self, PyObject *pArgs)
+{
+    char *s = NULL;
+    char soundCode[SOUNDEX_LEN+1];
+
+    if (!PyArg_ParseTuple(pArgs, "s", &s))
+        return NULL;
+
+    if (!soundex_code(s, soundCode)) {
+        /* If the string is empty, returns None. */
+        return Py_BuildValue("");
+    }
     return Py_BuildValue("s", soundCode);
 }
 
 
+/* Soundex codes for a sequence of strings; returns a list with
+ * a code (or None) for every string (or None). */
+static PyObject*
+pysoundexes(PyObject *self, PyObject *pArgs)
+{
+    Py_ssize_t i, n;
+    char *s = NULL;
+    char soundCode[SOUNDEX_LEN+1];
+    PyObject *seq, *items, *item, *code, *result;
+
+    if (!PyArg_ParseTuple(pArgs, "O", &seq))
+        return NULL;
+    items = PySequence_Fast(seq, "soundexes() requires a sequence");
+    if (items == NULL)
+        return NULL;
+    n = PySequence_Fast_GET_SIZE(items);
+    result = PyList_New(n);
+    if (result == NULL) {
+        Py_DECREF(items);
+        return NULL;
+    }
+    for (i = 0; i < n; i++) {
+        item = PySequence_Fast_GET_ITEM(items, i);
+        if (item == Py_None || !PyArg_Parse(item, "s", &s) ||
+                !soundex_code(s, soundCode)) {
+            if (PyErr_Occurred()) {
+                Py_DECREF(result);
+                Py_DECREF(items);
+                return NULL;
+            }
+            Py_INCREF(Py_None);
+            code = Py_None;
+        } else {
+            code = PyString_FromString(soundCode);
+            if (code == NULL) {
+                Py_DECREF(result);
+                Py_DECREF(items);
+                return NULL;
+            }
+        }
+        PyList_SET_ITEM(result, i, code);
+    }
+    Py_DECREF(items);
+    return result;
+}
+
+
+/*========== md5 ==========*/
+/* A compact implementation of the MD5 message-digest algorithm,
+ * as described in RFC 1321; 32 bits unsigned integers are assumed. */
+typedef unsigned int md5_word;
+
+static const md5_word md5K[64] = {
+    0xd76aa478, 0xe8c7b756, 0x242070db, 0xc1bdceee, 0xf57c0faf, 0x4787c62a,
+    0xa8304613, 0xfd469501, 0x698098d8, 0x8b44f7af, 0xffff5bb1, 0x895cd7be,
+    0x6b901122, 0xfd987193, 0xa679438e, 0x49b40821, 0xf61e2562, 0xc040b340,
+    0x265e5a51, 0xe9b6c7aa, 0xd62f105d, 0x02441453, 0xd8a1e681, 0xe7d3fbc8,
+    0x21e1cde6, 0xc33707d6, 0xf4d50d87, 0x455a14ed, 0xa9e3e905, 0xfcefa3f8,
+    0x676f02d9, 0x8d2a4c8a, 0xfffa3942, 0x8771f681, 0x6d9d6122, 0xfde5380c,
+    0xa4beea44, 0x4bdecfa9, 0xf6bb4b60, 0xbebfbc70, 0x289b7ec6, 0xeaa127fa,
+    0xd4ef3085, 0x04881d05, 0xd9d4d039, 0xe6db99e5, 0x1fa27cf8, 0xc4ac5665,
+    0xf4292244, 0x432aff97, 0xab9423a7, 0xfc93a039, 0x655b59c3, 0x8f0ccc92,
+    0xffeff47d, 0x85845dd1, 0x6fa87e4f, 0xfe2ce6e0, 0xa3014314, 0x4e0811a1,
+    0xf7537e82, 0xbd3af235, 0x2ad7d2bb, 0xeb86d391};
+
+static const int md5R[64] = {
+    7, 12, 17, 22, 7, 12, 17, 22, 7, 12, 17, 22, 7, 12, 17, 22,
+    5, 9, 14, 20, 5, 9, 14, 20, 5, 9, 14, 20, 5, 9, 14, 20,
+    4, 11, 16, 23, 4, 11, 16, 23, 4, 11, 16, 23, 4, 11, 16, 23,
+    6, 10, 15, 21, 6, 10, 15, 21, 6, 10, 15, 21, 6, 10, 15, 21};
+
+#define MD5_ROTATE(x, c) (((x) << (c)) | ((x) >> (32 - (c))))
+
+/* Process a 64 bytes block. */
+static void
+md5_block(md5_word *state, unsigned char const *block)
+{
+    md5_word a, b, c, d, f, tmp, w[16];
+    int i, g;
+
+    for (i = 0; i < 16; i++)
+        w[i] = (md5_word) block[i*4] | ((md5_word) block[i*4+1] << 8) |
+                ((md5_word) block[i*4+2] << 16) |
+                ((md5_word) block[i*4+3] << 24);
+    a = state[0];
+    b = state[1];
+    c = state[2];
+    d = state[3];
+    for (i = 0; i < 64; i++) {
+        if (i < 16) {
+            f = (b & c) | (~b & d);
+            g = i;
+        } else if (i < 32) {
+            f = (d & b) | (~d & c);
+            g = (5 * i + 1) % 16;
+        } else if (i < 48) {
+            f = b ^ c ^ d;
+            g = (3 * i + 5) % 16;
+        } else {
+            f = c ^ (b | ~d);
+            g = (7 * i) % 16;
+        }
+        tmp = d;
+        d = c;
+        c = b;
+        b = b + MD5_ROTATE(a + f + md5K[i] + w[g], md5R[i]);
+        a = tmp;
+    }
+    state[0] += a;
+    state[1] += b;
+    state[2] += c;
+    state[3] += d;
+}
+
+/* Store in hexDigest (33 chars) the MD5 hex digest of data. */
+static void
+md5_hexdigest(unsigned char const *data, Py_ssize_t len, char *hexDigest)
+{
+    static char const hexDigits[] = "0123456789abcdef";
+    md5_word state[4] = {0x67452301, 0xefcdab89, 0x98badcfe, 0x10325476};
+    unsigned char tail[128];
+    Py_ssize_t done, rest, tailLen;
+    unsigned long long bits = (unsigned long long) len * 8;
+    int i;
+
+    for (done = 0; done + 64 <= len; done += 64)
+        md5_block(state, data + done);
+    /* Padding: a 1 bit, zeroes and the length in bits. */
+    rest = len - done;
+    memcpy(tail, data + done, rest);
+    tail[rest] = 0x80;
+    tailLen = rest < 56 ? 64 : 128;
+    memset(tail + rest + 1, 0, tailLen - rest - 1);
+    for (i = 0; i < 8; i++)
+        tail[tailLen - 8 + i] = (unsigned char) (bits >> (8 * i));
+    md5_block(state, tail);
+    if (tailLen == 128)
+        md5_block(state, tail + 64);
+    for (i = 0; i < 16; i++) {
+        unsigned char byte = (unsigned char) (state[i / 4] >> (8 * (i % 4)));
+        hexDigest[i*2] = hexDigits[byte >> 4];
+        hexDigest[i*2+1] = hexDigits[byte & 0x0f];
+    }
+    hexDigest[32] = '\0';
+}
+
+
+/* MD5 hex digests for a sequence of strings; returns a list. */
+static PyObject*
+pymd5sums(PyObject *self, PyObject *pArgs)
+{
+    Py_ssize_t i, n;
+    char *s = NULL;
+    int len;
+    char hexDigest[33];
+    PyObject *seq, *items, *item, *digest, *result;
+
+    if (!PyArg_ParseTuple(pArgs, "O", &seq))
+        return NULL;
+    items = PySequence_Fast(seq, "md5sums() requires a sequence");
+    if (items == NULL)
+        return NULL;
+    n = PySequence_Fast_GET_SIZE(items);
+    result = PyList_New(n);
+    if (result == NULL) {
+        Py_DECREF(items);
+        return NULL;
+    }
+    for (i = 0; i < n; i++) {
+        item = PySequence_Fast_GET_ITEM(items, i);
+        if (!PyArg_Parse(item, "s#", &s, &len)) {
+            Py_DECREF(result);
+            Py_DECREF(items);
+            return NULL;
+        }
+        md5_hexdigest((unsigned char const *) s, len, hexDigest);
+        digest = PyString_FromStringAndSize(hexDigest, 32);
+        if (digest == NULL) {
+            Py_DECREF(result);
+            Py_DECREF(items);
+            return NULL;
+        }
+        PyList_SET_ITEM(result, i, digest);
+    }
+    Py_DECREF(items);
+    return result;
+}
+
+
 static PyMethodDef cutils_methods[] = {
     {"ratcliff", pyratcliff,
         METH_VARARGS, "Ratcliff-Obershelp similarity."},
     {"soundex", pysoundex,
         METH_VARARGS, "Soundex code for strings."},
+    {"soundexes", pysoundexes,
+        METH_VARARGS, "Soundex codes for a sequence of strings."},
+    {"md5sums", pymd5sums,
+        METH_VARARGS, "MD5 hex digests for a sequence of strings."},
     {NULL}
 };
 
@@ -25,6 +25,8 @@ Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 """
 
 import logging
+try: import threading, Queue
+except ImportError: threading = None
 
 _dbschema_logger = logging.getLogger('imdbpy.parser.sql.dbschema')
 
@@ -42,6 +44,8 @@ class DBCol(object):
         self.kind = kind
         self.index = None
         self.indexLen = None
+        # Other columns included, after this one, in the index.
+        self.indexCols = []
         # If not None, two notations are accepted: 'TableName'
         # and 'TableName.ColName'; in the first case, 'id' is assumed
         # as the name of the pointed column.
@@ -52,6 +56,9 @@ class DBCol(object):
         if 'indexLen' in params:
             self.indexLen = params['indexLen']
             del params['indexLen']
+        if 'indexCols' in params:
+            self.indexCols = params['indexCols']
+            del params['indexCols']
         if 'foreignKey' in params:
             self.foreignKey = params['foreignKey']
             del params['foreignKey']
@@ -64,6 +71,8 @@ class DBCol(object):
             s += ' INDEX'
             if self.indexLen:
                 s += '[:%d]' % self.indexLen
+            if self.indexCols:
+                s += '(+%s)' % ', '.join(self.indexCols)
         if self.foreignKey:
             s += ' FOREIGN'
         if 'default' in self.params:
@@ -84,6 +93,8 @@ class DBCol(object):
             s += ', index="%s"' % self.index
         if self.indexLen:
              s += ', indexLen=%d' % self.indexLen
+        if self.indexCols:
+            s += ', indexCols=%s' % self.indexCols
         if self.foreignKey:
             s += ', foreignKey="%s"' % self.foreignKey
         for param in self.params:
@@ -414,6 +425,28 @@ DB_SCHEMA = [
         DBCol('infoTypeID', INTCOL, notNone=True, foreignKey='InfoType'),
         DBCol('info', UNICODECOL, notNone=True),
         DBCol('note', UNICODECOL, default=None)
+    ),
+
+    # Trigrams of the title (and of the AKA titles) of every movie, and
+    # of the name (and AKA names) of every person, with the number of
+    # trigrams of the movie (or person); they're stored only using the
+    # --trigrams option of imdbpy2sql.py, and used to pre-rank the
+    # candidates of a search.  These tables are rebuilt from scratch,
+    # so there are no foreign keys.
+    DBTable('TitleTrigram',
+        DBCol('id', INTCOL, notNone=True, alternateID=True),
+        DBCol('movieID', INTCOL, notNone=True, index='idx_mid_trigram',
+                indexCols=['trigram']),
+        DBCol('trigram', STRINGCOL, length=3, notNone=True),
+        DBCol('nrTrigrams', INTCOL, notNone=True)
+    ),
+
+    DBTable('NameTrigram',
+        DBCol('id', INTCOL, notNone=True, alternateID=True),
+        DBCol('personID', INTCOL, notNone=True, index='idx_pid_trigram',
+                indexCols=['trigram']),
+        DBCol('trigram', STRINGCOL, length=3, notNone=True),
+        DBCol('nrTrigrams', INTCOL, notNone=True)
     )
 ]
 
@@ -442,34 +475,58 @@ def createTables(tables, ifNotExists=True):
                 for value in table._imdbpySchema.values[key]:
                     table(**{key: unicode(value)})
 
-def createIndexes(tables, ifNotExists=True):
-    """Create the indexes in the database.
+def _forEveryTable(funct, tables, jobs=1):
+    """Call funct(table) for every table; if jobs is greater than 1,
+    the tables are processed (in the given order) by jobs threads, and
+    the statements run over separate connections of the ORM.
     Return a list of errors, if any."""
     errors = []
+    if jobs <= 1 or threading is None:
+        for table in tables:
+            try:
+                funct(table)
+            except Exception, e:
+                errors.append(e)
+        return errors
+    queue = Queue.Queue()
     for table in tables:
+        queue.put(table)
+    def _worker():
+        while 1:
+            try:
+                table = queue.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                funct(table)
+            except Exception, e:
+                errors.append(e)
+    threads = [threading.Thread(target=_worker)
+                for x in xrange(min(jobs, len(tables)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+def createIndexes(tables, ifNotExists=True, jobs=1):
+    """Create the indexes in the database, using jobs threads.
+    Return a list of errors, if any."""
+    def _addIndexes(table):
         _dbschema_logger.info('creating indexes for table %s',
                                 table._imdbpyName)
-        try:
-            table.addIndexes(ifNotExists)
-        except Exception, e:
-            errors.append(e)
-            continue
-    return errors
+        table.addIndexes(ifNotExists)
+    return _forEveryTable(_addIndexes, tables, jobs)
 
-def createForeignKeys(tables, ifNotExists=True):
-    """Create Foreign Keys.
+def createForeignKeys(tables, ifNotExists=True, jobs=1):
+    """Create Foreign Keys, using jobs threads.
     Return a list of errors, if any."""
-    errors = []
     mapTables = {}
     for table in tables:
         mapTables[table._imdbpyName] = table
-    for table in tables:
+    def _addForeignKeys(table):
         _dbschema_logger.info('creating foreign keys for table %s',
                                 table._imdbpyName)
-        try:
-            table.addForeignKeys(mapTables, ifNotExists)
-        except Exception, e:
-            errors.append(e)
-            continue
-    return errors
+        table.addForeignKeys(mapTables, ifNotExists)
+    return _forEveryTable(_addForeignKeys, tables, jobs)
 
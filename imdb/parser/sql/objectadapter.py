@@ -55,7 +55,8 @@ def addIndexes(cls, ifNotExists=True):
             if idxName in [i.name for i in cls.sqlmeta.indexes]:
                 # Check if the index is already present.
                 continue
-            idx = DatabaseIndex(colToIdx, name=idxName)
+            idxCols = [colToIdx] + col.indexCols
+            idx = DatabaseIndex(name=idxName, *idxCols)
             cls.sqlmeta.addIndex(idx)
     try:
         cls.createIndexes(ifNotExists)
@@ -203,5 +204,7 @@ def setConnection(uri, tables, encoding='utf8', debug=False):
         table._cacheValue = False
     # Required by imdbpy2sql.py.
     conn.paramstyle = conn.module.paramstyle
+    # Return a new connection from the pool (see imdbpy2sql.py).
+    conn.newConnection = conn.getConnection
     return conn
 